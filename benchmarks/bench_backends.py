@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Parity and throughput benchmark for the streaming highlighter backends.
+
+Renders a corpus of model-style responses through every available backend
+of ds.ds_highlighter.stream_renderer ("python" always, "rust" when the
+ds-highlighter extension is built), both whole and in streaming-sized
+chunks, and reports per backend:
+
+  MB/s       input throughput, best of --repeat runs
+  py peak    peak Python heap above the starting point (tracemalloc); this
+             counts every str handed back to Python, including the Rust
+             backend's output
+  rss peak   peak resident memory growth, measured in a forked child so that
+             allocations made inside the Rust extension are included
+
+Every backend's output must be byte-identical to the Python backend's, for
+plain and dim prose styles. The whole-text functions ds.ds_highlighter
+exports (strip_ansi, highlight, highlight_code; strip_ansi comes from the
+Rust extension when it is built) are checked against ds.highlighter on every
+response too.
+
+Exits non-zero if any output diverges, or, with --baseline, if throughput
+drops or Python peak memory grows by more than --tolerance against a file
+written earlier with --save.
+
+Corpus:
+  short      a one-line answer with a small code block
+  answer     a few KB of mixed prose (including CJK) and Python, shell,
+             JSON, untagged and inline code blocks
+  huge       the answer repeated to --huge-kb KB, plus a minified
+             JavaScript line
+  truncated  the answer cut off inside a code block
+
+Usage: python benchmarks/bench_backends.py [--chunks N ...] [--save FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ds import ds_highlighter, highlighter
+
+SHORT = "Use `sorted()` with a key:\n```python\nnames = sorted(users, key=lambda u: u.age)\n```\nThat's it."
+
+ANSWER = '''The cache misses because the key includes the timestamp. Here is a fixed version:
+
+```python
+@lru_cache(maxsize=1024)
+class Loader(Base):
+    """Load rows by id."""
+
+    def fetch(self, row_id: int, retries=3):
+        # The timestamp is no longer part of the key
+        for attempt in range(retries):
+            if self.client.ready():
+                return self.client.get("rows/%d" % row_id) or None
+        raise TimeoutError(f"gave up after {retries} attempts")
+```
+
+然后重新运行测试，确认缓存命中率上升：
+
+```bash
+export CACHE_DIR=/tmp/cache && pytest -q tests/ || echo "failed: $?"
+ls -la ${CACHE_DIR} # should not be empty
+```
+
+The response should now look like this:
+
+```json
+{"id": 42, "hits": [1, 2, 3], "ratio": 0.75, "stale": false, "owner": null}
+```
+
+An untagged block is guessed from its contents:
+
+```
+SELECT id, count(*) FROM rows WHERE owner IS NULL GROUP BY id;
+```
+
+Inline fences such as ```x = 1``` and stray ``backticks`` stay in the prose.
+
+'''
+
+MINIFIED = "```js\n" + "function f(a,b){return a.map(x=>x*2).filter(Boolean)};const g=(n)=>`v${n}`;" * 2500 + "\n```\n"
+
+
+def build_corpus(huge_kb):
+    """
+    Return the benchmark responses by name.
+    """
+    huge = ANSWER * (huge_kb * 1024 // len(ANSWER.encode("utf-8")) + 1) + MINIFIED
+    cut = ANSWER.index("retries=3")
+    return {
+        "short": SHORT,
+        "answer": ANSWER,
+        "huge": huge,
+        "truncated": ANSWER[:cut],
+    }
+
+
+def split(text, chunk):
+    """
+    Split text into chunks of the given size (None: one chunk).
+    """
+    if chunk is None:
+        return [text]
+    return [text[i:i + chunk] for i in range(0, len(text), chunk)]
+
+
+def render(backend, style, chunks):
+    renderer = ds_highlighter.stream_renderer(True, "dracula", style, backend=backend)
+    parts = [renderer.feed(chunk) for chunk in chunks]
+    parts.append(renderer.close())
+    return "".join(parts)
+
+
+def measure_time(backend, style, chunks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(backend, style, chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_python_peak(backend, style, chunks):
+    tracemalloc.start()
+    try:
+        render(backend, style, chunks)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_rss_peak(backend, style, chunks):
+    """
+    Return the peak RSS growth of one render in a forked child, in bytes (None without fork).
+    """
+    if not hasattr(os, "fork"):
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        render(backend, style, chunks)
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, str((after - before) * scale).encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        result = pipe.read()
+    os.waitpid(pid, 0)
+    return int(result) if result else None
+
+
+def first_difference(expected, actual):
+    index = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+    return f"at char {index}: expected {expected[index:index + 40]!r}, got {actual[index:index + 40]!r}"
+
+
+def check_exports(name, text):
+    """
+    Compare ds.ds_highlighter's whole-text functions with ds.highlighter's.
+    """
+    failures = []
+    rendered = highlighter.highlight(text, "dracula")
+    cases = [
+        ("strip_ansi", ds_highlighter.strip_ansi(rendered), highlighter.strip_ansi(rendered)),
+        ("highlight", ds_highlighter.highlight(text, "dracula"), rendered),
+        ("highlight_code", ds_highlighter.highlight_code(text, "monokai"), highlighter.highlight_code(text, "monokai")),
+    ]
+    for function, actual, expected in cases:
+        if actual != expected:
+            failures.append(f"{name}: ds_highlighter.{function} differs from ds.highlighter "
+                            f"{first_difference(expected, actual)}")
+    return failures
+
+
+def available_backends(requested):
+    backends = requested or list(ds_highlighter.STREAM_BACKENDS)
+    usable = []
+    for backend in backends:
+        try:
+            ds_highlighter.stream_renderer(backend=backend)
+        except ImportError as e:
+            if requested:
+                raise SystemExit(f"error: {e}")
+            print(f"note: skipping {backend} backend ({e})", file=sys.stderr)
+            continue
+        usable.append(backend)
+    return usable
+
+
+def check_regressions(results, baseline, tolerance):
+    failures = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if result["mb_s"] < base["mb_s"] * (1 - tolerance):
+            failures.append(f"{key}: {result['mb_s']:.2f} MB/s, baseline {base['mb_s']:.2f} MB/s")
+        # Small heaps are noisy; only growth beyond 64 KB counts
+        if result["py_peak"] > max(base["py_peak"] * (1 + tolerance), base["py_peak"] + 64 * 1024):
+            failures.append(f"{key}: Python peak {result['py_peak'] // 1024} KB, baseline {base['py_peak'] // 1024} KB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", choices=ds_highlighter.STREAM_BACKENDS,
+                        help="Backends to run (default: all available)")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[8, 256],
+                        help="Streamed chunk sizes in characters (the whole response is always run too)")
+    parser.add_argument("--huge-kb", type=int, default=1024, help="Size of the huge response in KB")
+    parser.add_argument("--style", default="plain", help="Prose style for the timed runs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--save", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Fail on regressions against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed throughput drop and peak memory growth against the baseline")
+    args = parser.parse_args()
+
+    backends = available_backends(args.backends)
+    reference = "python"
+    failures = []
+    results = {}
+
+    print(f"{'corpus':<10} {'chunk':>6} {'backend':<8} {'MB/s':>8} {'py peak KB':>11} {'rss peak KB':>12} {'expansion':>10}")
+    for name, text in build_corpus(args.huge_kb).items():
+        size = len(text.encode("utf-8"))
+        failures.extend(check_exports(name, text))
+        for chunk in [None] + args.chunks:
+            chunks = split(text, chunk)
+            mode = "whole" if chunk is None else str(chunk)
+            for style in ("plain", "dim"):
+                expected = render(reference, style, chunks)
+                for backend in backends:
+                    if backend == reference:
+                        continue
+                    actual = render(backend, style, chunks)
+                    if actual != expected:
+                        failures.append(f"{name}/{mode}/{style}: {backend} differs from {reference} "
+                                        f"{first_difference(expected, actual)}")
+            output_size = len(render(reference, args.style, chunks).encode("utf-8"))
+            for backend in backends:
+                seconds = measure_time(backend, args.style, chunks, args.repeat)
+                py_peak = measure_python_peak(backend, args.style, chunks)
+                rss_peak = measure_rss_peak(backend, args.style, chunks)
+                results[f"{name}/{mode}/{backend}"] = {
+                    "mb_s": size / 1e6 / seconds,
+                    "py_peak": py_peak,
+                    "rss_peak": rss_peak,
+                }
+                rss = "-" if rss_peak is None else str(rss_peak // 1024)
+                print(f"{name:<10} {mode:>6} {backend:<8} {size / 1e6 / seconds:>8.2f} {py_peak // 1024:>11} "
+                      f"{rss:>12} {output_size / size:>9.2f}x")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    if args.baseline:
+        failures.extend(check_regressions(results, json.loads(Path(args.baseline).read_text()), args.tolerance))
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Worst-case benchmark for incremental rendering of streamed responses.
+
+Streams adversarial inputs in tiny chunks through the FenceParser-based
+StreamRenderer and reports seconds and MB/s at doubling sizes. The previous
+buffer-rescanning render_incremental is included for comparison on the
+smaller sizes. With --check, exits non-zero if the renderer's time per
+byte grows by more than --max-growth from the smallest to the largest size,
+which is what a quadratic rescan looks like.
+
+Inputs:
+  code       one long code block, so every chunk arrives while a block is open
+  backticks  "``x" repeated: every chunk ends in backticks that might start a fence
+  fences     many tiny inline blocks ("```a```") opened and closed in every few chunks
+  info       a fence whose language line never ends
+
+Usage: python benchmarks/bench_fences.py [--sizes KB ...] [--chunk N] [--check]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ds.highlighter import COLORS, NON_CODE_STYLES, SyntaxHighlighter
+
+LINE = "    result[i] = sum(row[k] * other[k] for k in range(3))  # `x`\n"
+INPUTS = {
+    "code": lambda size: "```python\n" + LINE * (size // len(LINE)) + "```",
+    "backticks": lambda size: "``x" * (size // 3),
+    "fences": lambda size: "```a``` " * (size // 8),
+    "info": lambda size: "```" + "a" * size,
+}
+
+
+def legacy_render_incremental(highlighter, content, buffer, non_code_style="plain"):
+    """
+    The render_incremental used before FenceParser: rescans the whole buffer per chunk.
+    """
+    buffer += content
+    rendered = ""
+    style_code = NON_CODE_STYLES.get(non_code_style, "")
+    while True:
+        code_start = buffer.find("```")
+        if code_start == -1:
+            pending = len(buffer) - len(buffer.rstrip("`"))
+            text = buffer[:len(buffer) - pending]
+            if text:
+                if highlighter.enable_color and style_code:
+                    rendered += f"{style_code}{text}{COLORS['reset']}"
+                else:
+                    rendered += text
+            buffer = buffer[len(buffer) - pending:]
+            break
+        if code_start > 0:
+            rendered += buffer[:code_start]
+            buffer = buffer[code_start:]
+        code_end = buffer.find("```", 3)
+        if code_end == -1:
+            break
+        rendered += highlighter.render_content(buffer[:code_end + 3], non_code_style)
+        buffer = buffer[code_end + 3:]
+    return rendered, buffer
+
+
+def stream_parser(highlighter, chunks):
+    renderer = highlighter.stream_renderer()
+    for chunk in chunks:
+        renderer.feed(chunk)
+    renderer.close()
+
+
+def stream_legacy(highlighter, chunks):
+    buffer = ""
+    for chunk in chunks:
+        _, buffer = legacy_render_incremental(highlighter, chunk, buffer)
+    if buffer:
+        highlighter.render_content(buffer)
+
+
+def measure(func, highlighter, chunks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(highlighter, chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256, 512], help="Input sizes in KB")
+    parser.add_argument("--chunk", type=int, default=4, help="Characters per streamed chunk")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--legacy-max", type=int, default=128, help="Largest size (KB) to run the legacy renderer on")
+    parser.add_argument("--check", action="store_true", help="Fail if time per byte grows super-linearly")
+    parser.add_argument("--max-growth", type=float, default=3.0, help="Allowed growth of time per byte for --check")
+    args = parser.parse_args()
+
+    highlighter = SyntaxHighlighter("dracula", True)
+    failures = []
+    print(f"{'input':<10} {'KB':>6} {'impl':<8} {'seconds':>9} {'MB/s':>8}")
+    for name, build in INPUTS.items():
+        per_byte = []
+        for size_kb in args.sizes:
+            text = build(size_kb * 1024)
+            chunks = [text[i:i + args.chunk] for i in range(0, len(text), args.chunk)]
+            size_mb = len(text.encode("utf-8")) / 1e6
+            seconds = measure(stream_parser, highlighter, chunks, args.repeat)
+            per_byte.append(seconds / len(text))
+            print(f"{name:<10} {size_kb:>6} {'parser':<8} {seconds:>9.4f} {size_mb / seconds:>8.2f}")
+            if size_kb <= args.legacy_max:
+                seconds = measure(stream_legacy, highlighter, chunks, 1)
+                print(f"{name:<10} {size_kb:>6} {'legacy':<8} {seconds:>9.4f} {size_mb / seconds:>8.2f}")
+        growth = per_byte[-1] / per_byte[0]
+        if growth > args.max_growth:
+            failures.append(f"{name}: time per byte grew {growth:.1f}x from {args.sizes[0]} KB to {args.sizes[-1]} KB")
+
+    if args.check and failures:
+        for failure in failures:
+            print(f"FAIL {failure}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
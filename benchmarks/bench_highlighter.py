@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for SyntaxHighlighter.apply_syntax_highlighting.
+
+Highlights multi-thousand-line Python blocks and reports MB/s of input
+processed and the output expansion ratio. The previous eight-pass
+``re.sub`` implementation is included for comparison.
+
+Usage: python benchmarks/bench_highlighter.py [--lines N] [--repeat N]
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ds.highlighter import (
+    COLORS,
+    COMMENT_RE,
+    KEYWORD_RE,
+    OPERATOR_RE,
+    STRING_RE,
+    SyntaxHighlighter,
+)
+
+SNIPPET = '''@cached
+class Matrix{n}(Base):
+    """Matrix number {n}."""
+
+    def multiply(self, other, scale=1.5):
+        # combine rows and columns
+        result = [[0] * {n} for _ in range(len(self.rows))]
+        for i, row in enumerate(self.rows):
+            for j in range(len(other[0])):
+                result[i][j] = sum(row[k] * other[k][j] for k in range(3)) + {n}
+        return result if result != [] else None
+'''
+
+
+def legacy_highlight(highlighter, code):
+    """
+    The eight sequential re.sub passes used before the single-pass tokenizer.
+    """
+    theme_ansi = highlighter.theme_ansi
+    reset = COLORS["reset"]
+    code = STRING_RE.sub(lambda m: f"{theme_ansi['string']}{m.group(1)}{reset}", code)
+    code = COMMENT_RE.sub(lambda m: f"{theme_ansi['comment']}{m.group(1)}{reset}", code)
+    code = re.sub(r'@\w+', lambda m: f"{theme_ansi['keyword']}{m.group(0)}{reset}", code)
+    code = re.sub(r'class\s+(\w+)', lambda m: f"class {theme_ansi['keyword']}{m.group(1)}{reset}", code)
+    code = KEYWORD_RE.sub(lambda m: f"{theme_ansi['keyword']}{m.group(1)}{reset}", code)
+    code = re.sub(r'\b(\w+)\s*\(', lambda m: f"{theme_ansi['function']}{m.group(1)}{reset}(", code)
+    code = re.sub(r'\b(\d+(\.\d+)?)\b', lambda m: f"{theme_ansi['number']}{m.group(1)}{reset}", code)
+    return OPERATOR_RE.sub(lambda m: f"{theme_ansi['operator']}{m.group(1)}{reset}", code)
+
+
+def build_block(lines):
+    """
+    Build a Python code block with at least the requested number of lines.
+    """
+    parts = []
+    count = 0
+    n = 0
+    while count < lines:
+        snippet = SNIPPET.format(n=n)
+        parts.append(snippet)
+        count += snippet.count("\n")
+        n += 1
+    return "".join(parts)
+
+
+def measure(func, code, repeat):
+    best = float("inf")
+    output = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(code)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 5000, 20000], help="Block sizes in lines")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    highlighter = SyntaxHighlighter("dracula", True)
+    implementations = (
+        ("single-pass", highlighter.apply_syntax_highlighting),
+        ("eight-pass", lambda code: legacy_highlight(highlighter, code)),
+    )
+
+    print(f"{'lines':>7} {'impl':<12} {'seconds':>9} {'MB/s':>8} {'expansion':>10}")
+    for lines in args.lines:
+        code = build_block(lines)
+        size_mb = len(code.encode("utf-8")) / 1e6
+        for label, func in implementations:
+            seconds, output = measure(func, code, args.repeat)
+            print(f"{lines:>7} {label:<12} {seconds:>9.4f} {size_mb / seconds:>8.2f} {len(output) / len(code):>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the ds and ds-nvim entry points.
+
+For each entry point, measures wall-clock time of a fresh interpreter:
+
+- cold: first run against an empty bytecode cache (PYTHONPYCACHEPREFIX
+  points at a new temporary directory, so every module is compiled).
+- warm: median of repeated runs once the bytecode cache is populated.
+
+Budgets apply to the overhead above a bare interpreter (``python -c pass``)
+measured the same way, so they hold on slow and fast machines alike. Exits
+with status 1 if any measurement exceeds its budget.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--cold-budget MS] [--warm-budget MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+ENTRY_POINTS = {
+    "ds --version": ["-m", "ds", "--version"],
+    "ds --help": ["-m", "ds", "--help"],
+    "ds-nvim --help": ["-m", "ds.nvim", "--help"],
+    "import ds": ["-c", "import ds"],
+}
+
+
+def run_once(args, env):
+    """
+    Time a single interpreter run in milliseconds.
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=REPO_ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10, help="Warm runs per entry point")
+    parser.add_argument("--cold-budget", type=float, default=400.0, help="Cold start overhead budget in ms")
+    parser.add_argument("--warm-budget", type=float, default=150.0, help="Warm start overhead budget in ms")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'entry point':<16} {'cold ms':>9} {'warm ms':>9} {'cold +ms':>9} {'warm +ms':>9}")
+    for label, entry_args in [("python -c pass", ["-c", "pass"])] + list(ENTRY_POINTS.items()):
+        with tempfile.TemporaryDirectory() as prefix:
+            env = dict(os.environ, PYTHONPYCACHEPREFIX=prefix)
+            cold = run_once(entry_args, env)
+            warm = statistics.median(run_once(entry_args, env) for _ in range(args.runs))
+        if label == "python -c pass":
+            bare_cold, bare_warm = cold, warm
+        cold_overhead = cold - bare_cold
+        warm_overhead = warm - bare_warm
+        print(f"{label:<16} {cold:>9.1f} {warm:>9.1f} {cold_overhead:>9.1f} {warm_overhead:>9.1f}")
+        if cold_overhead > args.cold_budget:
+            failures.append(f"{label}: cold start overhead {cold_overhead:.1f} ms exceeds {args.cold_budget:.0f} ms")
+        if warm_overhead > args.warm_budget:
+            failures.append(f"{label}: warm start overhead {warm_overhead:.1f} ms exceeds {args.warm_budget:.0f} ms")
+
+    for failure in failures:
+        print(f"BUDGET EXCEEDED {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-visible-token benchmark for streaming chat output.
+
+Replays a simulated streaming response with a fixed inter-chunk delay and
+measures when the first rendered text reaches the output stream:
+
+- buffered: the pre-streaming behaviour, where nothing is shown until
+  ``DeepSeekChat.chat`` returns.
+- incremental: ``chat(..., output=stream)``, which writes prose as it arrives.
+
+Usage: python benchmarks/bench_ttft.py [--chunks N] [--delay SECONDS]
+"""
+
+import argparse
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ds.chat import DeepSeekChat
+
+
+def simulated_pieces(chunks: int):
+    """
+    Build a response made of prose with a code block in the middle.
+    """
+    prose = ["Word{} ".format(i) for i in range(chunks // 2)]
+    code = ["```python\n"] + ["x{} = {}\n".format(i, i) for i in range(chunks // 4)] + ["```\n"]
+    tail = ["More{} ".format(i) for i in range(chunks - len(prose) - len(code))]
+    return prose + code + tail
+
+
+class DelayedClient:
+    """
+    Fake client yielding chunks with a fixed delay between them.
+    """
+
+    def __init__(self, pieces, delay):
+        self.pieces = pieces
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        for piece in self.pieces:
+            time.sleep(self.delay)
+            delta = SimpleNamespace(content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FirstWriteOutput(io.StringIO):
+    """
+    Output stream that records the time of its first non-empty write.
+    """
+
+    first_write = None
+
+    def write(self, s):
+        if s and self.first_write is None:
+            self.first_write = time.perf_counter()
+        return super().write(s)
+
+
+def run(pieces, delay, incremental, log_file):
+    instance = DeepSeekChat(api_key="sk-bench", base_url="http://localhost", log_file=log_file)
+    instance.client = DelayedClient(pieces, delay)
+    output = FirstWriteOutput()
+    start = time.perf_counter()
+    response = instance.chat("bench", stream=True, output=output if incremental else None)
+    end = time.perf_counter()
+    if not incremental:
+        output.write(response)
+    return (output.first_write - start) * 1000, (end - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=200, help="Number of streamed chunks")
+    parser.add_argument("--delay", type=float, default=0.01, help="Delay between chunks in seconds")
+    args = parser.parse_args()
+
+    pieces = simulated_pieces(args.chunks)
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = Path(tmp) / "chat_history.jsonl"
+        for label, incremental in (("buffered", False), ("incremental", True)):
+            ttft, total = run(pieces, args.delay, incremental, log_file)
+            print(f"{label:<12} first visible text: {ttft:8.1f} ms   total: {total:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
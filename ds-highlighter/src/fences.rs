@@ -0,0 +1,265 @@
+// 流式代码围栏解析器，与 ds/fences.py 的 FenceParser 行为一致
+//
+// 按块喂入响应文本，返回已完整的部分：普通文本立即返回，代码块在收到
+// 结束围栏后整体返回。两次调用之间只保留未结束代码块的内容和最多两个
+// 未决的反引号，已分类的文本不会被重新扫描，因此总耗时与响应长度成线性。
+
+use lazy_static::lazy_static;
+use regex::Regex;
+
+pub const FENCE: &str = "```";
+
+lazy_static! {
+    // 语言标记："python"、"c++"、"objective-c"、"c#"、"file.ext"
+    static ref LANGUAGE_REGEX: Regex = Regex::new(r"^[\w+#.-]+$").unwrap();
+}
+
+#[derive(Debug, Clone, PartialEq, Eq)]
+pub struct Block {
+    pub content: String,
+    pub is_code: bool,
+    pub language: String,
+}
+
+impl Block {
+    fn prose(content: &str) -> Block {
+        Block { content: content.to_string(), is_code: false, language: String::new() }
+    }
+
+    fn code(content: String, language: String) -> Block {
+        Block { content, is_code: true, language }
+    }
+}
+
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+enum State {
+    Prose,
+    Info,
+    Code,
+}
+
+// 与 Python 的 str.isspace 一致（包括 \x1c-\x1f）
+pub fn is_py_space(c: char) -> bool {
+    c.is_whitespace() || ('\x1c'..='\x1f').contains(&c)
+}
+
+// 与 Python 的 str.strip() 一致
+pub fn py_strip(text: &str) -> &str {
+    text.trim_matches(is_py_space)
+}
+
+// 结尾处最多保留两个反引号，它们可能是被拆到下一块的围栏开头
+fn held_back(data: &str, pos: usize) -> usize {
+    let trimmed = data.trim_end_matches('`').len();
+    trimmed.max(data.len().saturating_sub(2)).max(pos)
+}
+
+#[derive(Debug)]
+pub struct FenceParser {
+    state: State,
+    carry: String,
+    info: String,
+    opening: String,
+    language: String,
+    code: String,
+}
+
+impl Default for FenceParser {
+    fn default() -> Self {
+        FenceParser::new()
+    }
+}
+
+impl FenceParser {
+    pub fn new() -> FenceParser {
+        FenceParser {
+            state: State::Prose,
+            carry: String::new(),
+            info: String::new(),
+            opening: String::new(),
+            language: String::new(),
+            code: String::new(),
+        }
+    }
+
+    // 处理一个文本块，返回本块完成的所有部分
+    pub fn feed(&mut self, text: &str) -> Vec<Block> {
+        let joined;
+        let data: &str = if self.carry.is_empty() {
+            text
+        } else {
+            joined = std::mem::take(&mut self.carry) + text;
+            &joined
+        };
+        let mut blocks = Vec::new();
+        let mut pos = 0;
+        while pos < data.len() {
+            match self.state {
+                State::Prose => match data[pos..].find(FENCE) {
+                    None => {
+                        let end = held_back(data, pos);
+                        if end > pos {
+                            blocks.push(Block::prose(&data[pos..end]));
+                        }
+                        self.carry.push_str(&data[end..]);
+                        break;
+                    }
+                    Some(offset) => {
+                        let index = pos + offset;
+                        if index > pos {
+                            blocks.push(Block::prose(&data[pos..index]));
+                        }
+                        self.state = State::Info;
+                        pos = index + FENCE.len();
+                    }
+                },
+                State::Info => {
+                    let newline = data[pos..].find('\n').map(|offset| pos + offset);
+                    let line_end = newline.unwrap_or(data.len());
+                    if let Some(offset) = data[pos..line_end].find(FENCE) {
+                        // 同一行内开始并结束（"```x = 1```"）
+                        let index = pos + offset;
+                        self.info.push_str(&data[pos..index]);
+                        let content = std::mem::take(&mut self.info);
+                        blocks.push(Block::code(content, String::new()));
+                        self.reset();
+                        pos = index + FENCE.len();
+                    } else if let Some(newline) = newline {
+                        self.info.push_str(&data[pos..newline]);
+                        let info = std::mem::take(&mut self.info);
+                        self.opening = format!("{}{}\n", FENCE, info);
+                        let tag = py_strip(&info);
+                        if LANGUAGE_REGEX.is_match(tag) {
+                            self.language = tag.to_string();
+                        } else {
+                            // 不是语言标记：这一行属于代码
+                            self.code.push_str(&info);
+                            self.code.push('\n');
+                        }
+                        self.state = State::Code;
+                        pos = newline + 1;
+                    } else {
+                        let end = held_back(data, pos);
+                        self.info.push_str(&data[pos..end]);
+                        self.carry.push_str(&data[end..]);
+                        break;
+                    }
+                }
+                State::Code => match data[pos..].find(FENCE) {
+                    None => {
+                        let end = held_back(data, pos);
+                        self.code.push_str(&data[pos..end]);
+                        self.carry.push_str(&data[end..]);
+                        break;
+                    }
+                    Some(offset) => {
+                        let index = pos + offset;
+                        self.code.push_str(&data[pos..index]);
+                        let content = std::mem::take(&mut self.code);
+                        let language = std::mem::take(&mut self.language);
+                        blocks.push(Block::code(content, language));
+                        self.reset();
+                        pos = index + FENCE.len();
+                    }
+                },
+            }
+        }
+        blocks
+    }
+
+    // 已接收但尚未返回的原始文本
+    pub fn pending(&self) -> String {
+        match self.state {
+            State::Prose => self.carry.clone(),
+            State::Info => format!("{}{}{}", FENCE, self.info, self.carry),
+            State::Code => {
+                let opening = if self.language.is_empty() { FENCE } else { self.opening.as_str() };
+                format!("{}{}{}", opening, self.code, self.carry)
+            }
+        }
+    }
+
+    // 结束响应：剩余内容（包括未结束的代码块及其围栏）作为普通文本返回
+    pub fn close(&mut self) -> Vec<Block> {
+        let text = self.pending();
+        self.reset();
+        self.carry.clear();
+        if text.is_empty() {
+            Vec::new()
+        } else {
+            vec![Block::prose(&text)]
+        }
+    }
+
+    fn reset(&mut self) {
+        self.state = State::Prose;
+        self.info.clear();
+        self.opening.clear();
+        self.language.clear();
+        self.code.clear();
+    }
+}
+
+// 将完整响应拆分为普通文本和代码块
+pub fn parse_fences(text: &str) -> Vec<Block> {
+    let mut parser = FenceParser::new();
+    let mut blocks = parser.feed(text);
+    blocks.extend(parser.close());
+    blocks
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn merge(blocks: Vec<Block>) -> Vec<Block> {
+        let mut merged: Vec<Block> = Vec::new();
+        for block in blocks {
+            match merged.last_mut() {
+                Some(last) if !last.is_code && !block.is_code => last.content.push_str(&block.content),
+                _ if !block.is_code && block.content.is_empty() => {}
+                _ => merged.push(block),
+            }
+        }
+        merged
+    }
+
+    #[test]
+    fn test_language_tags() {
+        let blocks = parse_fences("```bash\necho `date`\n```\n``` not a tag\nx = 1\n```");
+        assert_eq!(blocks[0], Block::code("echo `date`\n".to_string(), "bash".to_string()));
+        assert_eq!(blocks[2], Block::code(" not a tag\nx = 1\n".to_string(), String::new()));
+        assert_eq!(parse_fences("```x = 1```"), vec![Block::code("x = 1".to_string(), String::new())]);
+    }
+
+    #[test]
+    fn test_chunk_boundaries() {
+        let text = "Here é code:\n```python\ndef f():\n    return 1\n```\n``x`` ```a``` ````\n`````";
+        let expected = merge(parse_fences(text));
+        let chars: Vec<(usize, char)> = text.char_indices().collect();
+        for &(cut, _) in &chars {
+            let mut parser = FenceParser::new();
+            let mut blocks = parser.feed(&text[..cut]);
+            blocks.extend(parser.feed(&text[cut..]));
+            blocks.extend(parser.close());
+            assert_eq!(merge(blocks), expected, "cut at {}", cut);
+        }
+        let mut parser = FenceParser::new();
+        let mut blocks = Vec::new();
+        for (_, c) in chars {
+            blocks.extend(parser.feed(&c.to_string()));
+        }
+        blocks.extend(parser.close());
+        assert_eq!(merge(blocks), expected);
+    }
+
+    #[test]
+    fn test_pending_and_close() {
+        let mut parser = FenceParser::new();
+        assert_eq!(parser.feed("prose``"), vec![Block::prose("prose")]);
+        assert_eq!(parser.pending(), "``");
+        assert!(parser.feed("`python\nx = 1\n").is_empty());
+        assert_eq!(parser.pending(), "```python\nx = 1\n");
+        assert_eq!(parser.close(), vec![Block::prose("```python\nx = 1\n")]);
+    }
+}
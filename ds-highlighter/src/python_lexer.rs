@@ -0,0 +1,185 @@
+// Python 词法高亮，与 ds/highlighter.py 的单遍 TOKEN_RE 输出逐字节一致
+//
+// regex crate 不支持前瞻断言，因此函数调用 (?=\s*\() 在匹配后手动判断；
+// Python 版本中跳过普通标识符的最后一个分支只是性能优化，这里不需要。
+
+use lazy_static::lazy_static;
+use regex::Regex;
+
+use crate::fences::is_py_space;
+
+lazy_static! {
+    static ref TOKEN_REGEX: Regex = Regex::new(concat!(
+        r#"(?P<string>"[^"]*"|'[^']*')"#,
+        r#"|(?P<comment>#[^\n]*)"#,
+        r#"|(?P<decorator>@\w+)"#,
+        r#"|(?P<classdef>\bclass\b)(?P<classgap>[\s\x1c-\x1f]+)(?P<classname>\w+)"#,
+        r#"|\b(?P<number>\d+(?:\.\d+)?)\b"#,
+        r#"|(?P<word>\w+)"#,
+        r#"|(?P<operator>[-+*/%=!<>^&|])"#,
+    ))
+    .unwrap();
+}
+
+const KEYWORDS: &[&str] = &[
+    "def", "class", "if", "elif", "else", "for", "while", "try", "except", "finally", "return", "import",
+    "from", "as", "with", "yield", "raise", "pass", "break", "continue", "lambda", "and", "or", "not", "is",
+    "in", "None", "True", "False",
+];
+
+pub const RESET: &str = "\x1b[0m";
+
+// 主题颜色（由 Python 端的 SyntaxHighlighter.theme_ansi 传入）
+#[derive(Debug, Clone, Default)]
+pub struct Palette {
+    pub string: String,
+    pub comment: String,
+    pub keyword: String,
+    pub function: String,
+    pub number: String,
+    pub operator: String,
+    pub class: String,
+}
+
+impl Palette {
+    pub fn get(&self, style: &str) -> &str {
+        match style {
+            "string" => &self.string,
+            "comment" => &self.comment,
+            "keyword" => &self.keyword,
+            "function" => &self.function,
+            "number" => &self.number,
+            "operator" => &self.operator,
+            "class" => &self.class,
+            _ => "",
+        }
+    }
+
+    pub fn set(&mut self, style: &str, escape: String) {
+        match style {
+            "string" => self.string = escape,
+            "comment" => self.comment = escape,
+            "keyword" => self.keyword = escape,
+            "function" => self.function = escape,
+            "number" => self.number = escape,
+            "operator" => self.operator = escape,
+            "class" => self.class = escape,
+            _ => {}
+        }
+    }
+}
+
+pub fn is_keyword(word: &str) -> bool {
+    KEYWORDS.contains(&word)
+}
+
+// 标识符后面（跳过空白）是否紧跟左括号
+fn is_call(code: &str, end: usize) -> bool {
+    code[end..].trim_start_matches(is_py_space).starts_with('(')
+}
+
+// 高亮 Python 代码
+pub fn highlight_python(code: &str, palette: &Palette) -> String {
+    let mut out = String::with_capacity(code.len() * 2);
+    let mut last = 0;
+    for caps in TOKEN_REGEX.captures_iter(code) {
+        let whole = caps.get(0).unwrap();
+        let start = whole.start();
+        let (color, token): (&str, std::borrow::Cow<str>) = if let Some(word) = caps.name("word") {
+            if is_keyword(word.as_str()) {
+                (&palette.keyword, word.as_str().into())
+            } else if is_call(code, word.end()) {
+                (&palette.function, word.as_str().into())
+            } else {
+                continue;
+            }
+        } else if let Some(name) = caps.name("classname") {
+            let gap = caps.name("classgap").unwrap().as_str();
+            (&palette.keyword, format!("class{}{}{}{}", RESET, gap, palette.keyword, name.as_str()).into())
+        } else if let Some(m) = caps.name("string") {
+            (&palette.string, m.as_str().into())
+        } else if let Some(m) = caps.name("comment") {
+            (&palette.comment, m.as_str().into())
+        } else if let Some(m) = caps.name("decorator") {
+            (&palette.keyword, m.as_str().into())
+        } else if let Some(m) = caps.name("number") {
+            (&palette.number, m.as_str().into())
+        } else if let Some(m) = caps.name("operator") {
+            (&palette.operator, m.as_str().into())
+        } else {
+            continue;
+        };
+        out.push_str(&code[last..start]);
+        out.push_str(color);
+        out.push_str(&token);
+        out.push_str(RESET);
+        last = whole.end();
+    }
+    out.push_str(&code[last..]);
+    out
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use crate::strip_ansi;
+
+    fn palette() -> Palette {
+        let mut palette = Palette::default();
+        for (i, style) in ["string", "comment", "keyword", "function", "number", "operator", "class"].iter().enumerate() {
+            palette.set(style, format!("\x1b[{}m", 31 + i));
+        }
+        palette
+    }
+
+    #[test]
+    fn test_tokens() {
+        let out = highlight_python("class A(B):\n    def f(x): return g (1.5) # c", &palette());
+        assert_eq!(
+            out,
+            "\x1b[33mclass\x1b[0m \x1b[33mA\x1b[0m(B):\n    \x1b[33mdef\x1b[0m \x1b[34mf\x1b[0m(x): \
+             \x1b[33mreturn\x1b[0m \x1b[34mg\x1b[0m (\x1b[35m1.5\x1b[0m) \x1b[32m# c\x1b[0m"
+        );
+    }
+
+    #[test]
+    fn test_strings_and_operators() {
+        let out = highlight_python("x = 'a' + \"b\"", &palette());
+        assert_eq!(out, "x \x1b[36m=\x1b[0m \x1b[31m'a'\x1b[0m \x1b[36m+\x1b[0m \x1b[31m\"b\"\x1b[0m");
+    }
+
+    // 每个颜色码之后紧跟的下一个转义必须是重置码：颜色不会嵌套
+    fn assert_flat(highlighted: &str) {
+        let escapes: Vec<&str> = highlighted.match_indices('\x1b').map(|(i, _)| {
+            let end = highlighted[i..].find('m').unwrap();
+            &highlighted[i..=i + end]
+        }).collect();
+        for pair in escapes.chunks(2) {
+            assert_eq!(pair.len(), 2, "{:?}", highlighted);
+            assert_ne!(pair[0], RESET, "{:?}", highlighted);
+            assert_eq!(pair[1], RESET, "{:?}", highlighted);
+        }
+    }
+
+    #[test]
+    fn test_overlapping_tokens() {
+        let line = r#"class Foo(Bar): if (x): s = "a # 1" # it's 2 "q""#;
+        let out = highlight_python(line, &palette());
+        assert_flat(&out);
+        assert_eq!(strip_ansi(&out), line);
+        // 类名后跟括号时只按类名着色一次
+        assert!(out.starts_with("\x1b[33mclass\x1b[0m \x1b[33mFoo\x1b[0m(Bar)"));
+        assert!(out.contains("\x1b[33mif\x1b[0m ("));
+        // 字符串中的 # 不是注释，注释中的引号不是字符串
+        assert!(out.contains("\x1b[31m\"a # 1\"\x1b[0m"));
+        assert!(out.ends_with("\x1b[32m# it's 2 \"q\"\x1b[0m"));
+    }
+
+    #[test]
+    fn test_long_line() {
+        let line = "f(1, 'x') + g(2) if y else None; ".repeat(2000);
+        let out = highlight_python(&line, &palette());
+        assert_flat(&out);
+        assert_eq!(strip_ansi(&out), line);
+    }
+}
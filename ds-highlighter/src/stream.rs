@@ -0,0 +1,147 @@
+// 流式渲染核心，与 ds/highlighter.py 的 StreamRenderer / render_blocks 输出一致
+//
+// 围栏状态和未结束的代码块保存在 Rust 端。Python 代码块在这里高亮；其它语言
+// 和未标记语言的代码块交给回退函数（Python 端的 SyntaxHighlighter.highlight_block），
+// 这样语言注册表只维护一份。
+
+use crate::fences::{py_strip, Block, FenceParser};
+use crate::python_lexer::{highlight_python, Palette, RESET};
+
+// 与 ds/lexers 的 ALIASES 中映射到 python 的标记一致
+const PYTHON_TAGS: &[&str] = &["python", "py", "python3", "py3"];
+
+// 回退高亮函数：(代码, 语言标记) -> 高亮后的代码
+pub type Fallback<'a, E> = &'a mut dyn FnMut(&str, &str) -> Result<String, E>;
+
+pub fn is_python_tag(tag: &str) -> bool {
+    let tag = py_strip(tag).to_lowercase();
+    PYTHON_TAGS.contains(&tag.as_str())
+}
+
+#[derive(Debug)]
+pub struct StreamCore {
+    parser: FenceParser,
+    palette: Palette,
+    enable_color: bool,
+    non_code_prefix: String,
+}
+
+impl StreamCore {
+    pub fn new(palette: Palette, enable_color: bool, non_code_prefix: &str) -> StreamCore {
+        StreamCore {
+            parser: FenceParser::new(),
+            palette,
+            enable_color,
+            non_code_prefix: if enable_color { non_code_prefix.to_string() } else { String::new() },
+        }
+    }
+
+    // 处理一个文本块，返回现在可以显示的内容
+    pub fn feed<E>(&mut self, chunk: &str, fallback: Option<Fallback<E>>) -> Result<String, E> {
+        let blocks = self.parser.feed(chunk);
+        self.render_blocks(&blocks, fallback)
+    }
+
+    // 结束响应：未结束的代码块和保留的反引号作为普通文本返回
+    pub fn close<E>(&mut self, fallback: Option<Fallback<E>>) -> Result<String, E> {
+        let blocks = self.parser.close();
+        self.render_blocks(&blocks, fallback)
+    }
+
+    pub fn pending(&self) -> String {
+        self.parser.pending()
+    }
+
+    fn highlight_block<E>(&self, code: &str, language: &str, fallback: &mut Option<Fallback<E>>) -> Result<String, E> {
+        if !self.enable_color {
+            return Ok(code.to_string());
+        }
+        if is_python_tag(language) {
+            return Ok(highlight_python(code, &self.palette));
+        }
+        match fallback {
+            Some(fallback) => fallback(code, language),
+            // 没有回退函数：未标记语言按 Python 高亮，其它语言原样输出
+            None if language.is_empty() => Ok(highlight_python(code, &self.palette)),
+            None => Ok(code.to_string()),
+        }
+    }
+
+    pub fn render_blocks<E>(&self, blocks: &[Block], mut fallback: Option<Fallback<E>>) -> Result<String, E> {
+        let prefix = self.non_code_prefix.as_str();
+        if let [block] = blocks {
+            if !block.is_code && prefix.is_empty() {
+                // 最常见的流式情况：一段普通文本
+                return Ok(block.content.clone());
+            }
+        }
+        let size: usize = blocks.iter().map(|block| block.content.len()).sum();
+        let mut out = String::with_capacity(size + blocks.len() * (prefix.len() + RESET.len() + 2));
+        for block in blocks {
+            if block.is_code {
+                let code = self.highlight_block(py_strip(&block.content), &block.language, &mut fallback)?;
+                out.push('\n');
+                out.push_str(&code);
+                out.push('\n');
+            } else if !prefix.is_empty() {
+                out.push_str(prefix);
+                out.push_str(&block.content);
+                out.push_str(RESET);
+            } else {
+                out.push_str(&block.content);
+            }
+        }
+        Ok(out)
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+    use std::convert::Infallible;
+
+    fn palette() -> Palette {
+        let mut palette = Palette::default();
+        palette.set("keyword", "\x1b[35m".to_string());
+        palette.set("number", "\x1b[32m".to_string());
+        palette.set("operator", "\x1b[31m".to_string());
+        palette
+    }
+
+    #[test]
+    fn test_python_blocks_render_in_rust() {
+        let mut core = StreamCore::new(palette(), true, "");
+        let mut out = core.feed::<Infallible>("Text ```py", None).unwrap();
+        assert_eq!(out, "Text ");
+        out = core.feed::<Infallible>("thon\nx = 1\n``", None).unwrap();
+        assert_eq!(out, "");
+        assert_eq!(core.pending(), "```python\nx = 1\n``");
+        out = core.feed::<Infallible>("` done", None).unwrap();
+        assert_eq!(out, "\nx \x1b[31m=\x1b[0m \x1b[32m1\x1b[0m\n done");
+        assert_eq!(core.close::<Infallible>(None).unwrap(), "");
+    }
+
+    #[test]
+    fn test_other_languages_use_fallback() {
+        let mut core = StreamCore::new(palette(), true, "\x1b[2m");
+        let mut seen = Vec::new();
+        let mut fallback = |code: &str, language: &str| -> Result<String, String> {
+            seen.push(language.to_string());
+            Ok(code.to_uppercase())
+        };
+        let out = core.feed("a```bash\necho hi\n```b", Some(&mut fallback)).unwrap();
+        assert_eq!(out, "\x1b[2ma\x1b[0m\nECHO HI\n\x1b[2mb\x1b[0m");
+        let mut failing = |_: &str, _: &str| -> Result<String, String> { Err("boom".to_string()) };
+        assert_eq!(core.feed("```\nx\n```", Some(&mut failing)), Err("boom".to_string()));
+        assert_eq!(seen, vec!["bash"]);
+    }
+
+    #[test]
+    fn test_color_disabled() {
+        let mut core = StreamCore::new(palette(), false, "\x1b[2m");
+        let out = core.feed::<Infallible>("a```python\nx = 1\n```", None).unwrap();
+        assert_eq!(out, "a\nx = 1\n");
+        assert_eq!(core.feed::<Infallible>("```\nopen", None).unwrap(), "");
+        assert_eq!(core.close::<Infallible>(None).unwrap(), "```\nopen");
+    }
+}
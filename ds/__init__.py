@@ -13,16 +13,65 @@ This package provides a modular implementation of the DeepSeek CLI with:
 Version: 1.0.2
 """
 
+import sys
+import types
+
 from .version import __version__
 from .config import load_config
-from .chat import chat
 from .utils import render_content, strip_ansi
-from .nvim import ds_ask, ds_review_code, ds_generate_doctest
+
+# Attributes resolved on first access, so `import ds` and `ds --version` do not
+# load the chat client, response cache, history or retry modules; the OpenAI
+# SDK itself is only imported when a DeepSeekChat is created.
+_LAZY_ATTRIBUTES = {
+    "chat": ".chat",
+    "ChatResult": ".chat",
+    "DeepSeekChat": ".chat",
+    "AsyncDeepSeekChat": ".async_chat",
+    "achat": ".async_chat",
+    "ds_ask": ".nvim",
+    "ds_review_code": ".nvim",
+    "ds_generate_doctest": ".nvim",
+}
+
+
+def __getattr__(name):
+    """
+    Import heavy submodules only when one of their exports is first used.
+    """
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _Package(types.ModuleType):
+    """
+    Keeps the lazy exports when a submodule of the same name is imported.
+
+    Importing ds.chat sets the attribute ``ds.chat`` to the submodule, which
+    would hide the chat() function; the submodule stays in sys.modules.
+    """
+
+    def __setattr__(self, name, value):
+        if name in _LAZY_ATTRIBUTES and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
 
 __all__ = [
     "__version__",
     "load_config",
     "chat",
+    "ChatResult",
+    "DeepSeekChat",
+    "achat",
+    "AsyncDeepSeekChat",
     "render_content",
     "strip_ansi",
     "ds_ask",
@@ -2,6 +2,7 @@
 import argparse
 import sys
 import os
+import time
 from pathlib import Path
 
 # Allow running as a standalone script (e.g., `python ds/__main__.py`)
@@ -9,20 +10,79 @@ if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent.parent))
     __package__ = "ds"
 
+from ds import config
 from ds.version import __version__
-from ds.chat import chat
-from ds.config import ENABLE_COLOR
-from ds.utils import format_error_message
+from ds.utils import format_error_message, resolve_language
 
 
-def main():
+def _serve(argv):
+    """
+    Run the `ds serve` subcommand.
+    """
+    from ds.daemon import main as serve_main
+    serve_main(argv)
+
+
+def _cache(argv):
+    """
+    Run the `ds cache` subcommand.
+    """
+    from ds.cache import main as cache_main
+    cache_main(argv)
+
+
+def _history(argv):
+    """
+    Run the `ds history` subcommand.
+    """
+    from ds.history import main as history_main
+    history_main(argv)
+
+
+def _stats(argv):
+    """
+    Run the `ds stats` subcommand.
+    """
+    from ds.stats import main as stats_main
+    stats_main(argv)
+
+
+def _spell(argv):
+    """
+    Run the `ds spell` subcommand.
+    """
+    from ds.spell import main as spell_main
+    spell_main(argv)
+
+
+# Subcommands recognised as the first argument. A query that starts with one
+# of these words can still be sent with `ds -- <query>`.
+SUBCOMMANDS = {
+    "serve": _serve,
+    "cache": _cache,
+    "history": _history,
+    "stats": _stats,
+    "spell": _spell,
+}
+
+
+def main(argv=None):
     """
     Main function for the ds CLI.
+    
+    Args:
+        argv (list, optional): Command-line arguments (defaults to sys.argv[1:]).
     """
+    imported_at = time.perf_counter()
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in SUBCOMMANDS:
+        return SUBCOMMANDS[argv[0]](argv[1:])
+
     # Create argument parser
     parser = argparse.ArgumentParser(
         prog="ds",
-        description="DeepSeek CLI - A command-line interface for DeepSeek API"
+        description="DeepSeek CLI - A command-line interface for DeepSeek API",
+        epilog="Subcommands: ds serve (run a persistent daemon), ds cache stats|clear (response cache), ds history search|last|show (past chats), ds stats (latency and token usage), ds spell stats|build (local spelling dictionary)"
     )
     
     # Define arguments
@@ -34,10 +94,32 @@ def main():
     parser.add_argument("-st", "--stream", action="store_true", help="Enable streaming output")
     parser.add_argument("--theme", choices=["dracula", "monokai", "default"], help="Code highlighting theme")
     parser.add_argument("--non-code-style", choices=["plain", "dim", "highlight"], help="Style for non-code text")
-    parser.add_argument("query", nargs="+", help="Query for DeepSeek API")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses but store the new one")
+    parser.add_argument("--batch", metavar="FILE", help="Run JSONL requests from FILE ('-' for stdin) and write JSONL results")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight in batch and document translation mode (default: 8)")
+    parser.add_argument("--order", choices=["input", "completion"], default="input", help="Order of batch results (default: input)")
+    parser.add_argument("-o", "--output", metavar="FILE", help="Write batch results to FILE instead of stdout")
+    parser.add_argument("--timings", action="store_const", const="text", help="Print a per-phase latency breakdown to stderr")
+    parser.add_argument("--timings-json", dest="timings", action="store_const", const="json", help="Print the latency breakdown as one JSON line")
+    parser.add_argument("-f", "--file", metavar="FILE", help="Read the query from FILE ('-' for stdin); long input is sent in ordered chunks")
+    parser.add_argument("query", nargs="*", help="Query for DeepSeek API ('-' reads it from stdin); with --file, an instruction applied to the input")
     
     # Parse arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    # `ds -` reads stdin; in `ds -t -` the dash is stdin rather than a target language
+    source = args.file
+    dashes = args.query.count("-") + (args.trans == "-")
+    if dashes:
+        if source is not None or dashes > 1:
+            parser.error("read input from one of '-' or --file")
+        source = "-"
+        args.query = [word for word in args.query if word != "-"]
+        if args.trans == "-":
+            args.trans = "Chinese"
+    if not args.query and args.batch is None and source is None:
+        parser.error("the following arguments are required: query")
     
     # Handle configuration options that affect environment variables
     config_changes = {
@@ -45,7 +127,8 @@ def main():
         "DS_NO_STREAM": "1" if args.no_stream else None,
         "DS_STREAM": "1" if args.stream else None,
         "DEEPSEEK_COLOR_SCHEME": args.theme,
-        "DEEPSEEK_NON_CODE_STYLE": args.non_code_style
+        "DEEPSEEK_NON_CODE_STYLE": args.non_code_style,
+        "DS_TIMINGS": args.timings
     }
     
     # Apply configuration changes to environment
@@ -60,32 +143,102 @@ def main():
         from .config import load_config
         load_config()
     
+    use_cache = not args.no_cache
+
+    # Batch mode: every line carries its own query, mode and language
+    if args.batch is not None:
+        try:
+            from ds.batch import run_batch
+            summary = run_batch(args.batch, args.output, args.concurrency, args.order == "input",
+                                use_cache=use_cache, refresh=args.refresh)
+        except Exception as e:
+            print(format_error_message("Error", str(e), config.ENABLE_COLOR), file=sys.stderr)
+            sys.exit(1)
+        sys.exit(1 if summary["failed"] else 0)
+
     # Determine operation mode
     mode = "normal"
-    language = "English"
     
     if args.spell:
         mode = "spell"
     elif args.trans is not None:
         mode = "trans"
-        # Simplify translation to only support English and Chinese
-        if args.trans.lower() in ['en', 'english']:
-            language = "English"
-        else:
-            # Default to Chinese for any other input or when no specific language is provided
-            language = "Chinese"
+    # Translation only supports English and Chinese
+    language = resolve_language(mode, args.trans)
     
-    # Join query arguments
+    # Translating stdin or a file runs the paragraph-level document pipeline
+    if mode == "trans" and source is not None:
+        if args.query:
+            parser.error("document translation takes no query words")
+        try:
+            from ds.inputs import open_input, read_blocks
+            from ds.translate import translate_document
+            with open_input(source) as stream:
+                text = "".join(read_blocks(stream))
+            summary = translate_document(text, language, output=sys.stdout, concurrency=args.concurrency,
+                                         use_memory=use_cache, refresh=args.refresh)
+        except Exception as e:
+            print(format_error_message("Error", str(e), config.ENABLE_COLOR), file=sys.stderr)
+            sys.exit(1)
+        for error in summary["errors"]:
+            print(format_error_message("Error", f"paragraph {error['segment']}: {error['error']}", config.ENABLE_COLOR),
+                  file=sys.stderr)
+        sys.exit(1 if summary["failed"] else 0)
+
+    # Join query arguments; streamed input becomes one query per chunk
     query = " ".join(args.query)
+    if source is None:
+        queries = [query]
+    else:
+        from ds.inputs import iter_input_queries
+        queries = iter_input_queries(source, instruction=query)
     
-    # Execute chat - no need to pass stream explicitly, it will use config
+    # Execute chat - no need to pass stream explicitly, it will use config.
+    # When streaming, the response is written to stdout as it arrives.
+    timings = None
+    if config.TIMINGS:
+        from ds.timings import Timings
+        timings = Timings()
+        timings.mark_process_start(imported_at)
+
     try:
-        response = chat(query, mode, language)
-        print(response)
+        output = sys.stdout if config.STREAM else None
+        # Pipes and files get the raw Markdown; only a terminal gets highlighting
+        render = sys.stdout.isatty()
+
+        from ds.daemon import daemon_chat
+
+        # Chunks are answered in input order; timings cover the first request
+        for index, query in enumerate(queries):
+            request_timings = timings if index == 0 else None
+
+            # Use a running `ds serve` daemon when there is one
+            result = daemon_chat(query, mode, language, output=output, use_cache=use_cache, refresh=args.refresh,
+                                 timings=request_timings, render=render)
+
+            if result is None:
+                # Imported only once a query is actually sent (keeps --version/--help fast)
+                from ds.chat import chat
+                result = chat(query, mode, language, output=output, use_cache=use_cache, refresh=args.refresh,
+                              timings=request_timings, render=render)
+
+            # Streamed responses have already been written
+            if output is not None or not render:
+                print("" if output is not None else result.text)
+            else:
+                if request_timings is not None:
+                    request_timings.mark("render_start")
+                rendered = result.rendered
+                if request_timings is not None:
+                    request_timings.mark("render_end")
+                print(rendered)
     except Exception as e:
-        error_msg = format_error_message("Error", str(e), ENABLE_COLOR)
+        error_msg = format_error_message("Error", str(e), config.ENABLE_COLOR)
         print(error_msg, file=sys.stderr)
         sys.exit(1)
+    finally:
+        if timings is not None:
+            timings.report(config.TIMINGS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+"""
+Timeouts, retries and hedged requests for the async chat client.
+
+arequest() applies the policy of ds.retry.request() with attempts running
+as tasks on the event loop instead of threads. It lives apart from ds.retry
+so that the sync entry points never import asyncio.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, List, Optional
+
+from . import config
+from .retry import (
+    MAX_RETRY_AFTER,
+    FirstTokenTimeout,
+    TotalTimeout,
+    _has_content,
+    backoff_delay,
+    is_retryable,
+    retry_after,
+)
+
+
+class _AsyncAttempt:
+    """
+    One async API request running as a task.
+    """
+
+    def __init__(self, create: Callable[[], Any], stream: bool):
+        self.stream = stream
+        self.response = None
+        self.created_at = None
+        self.prefetched: List[Any] = []
+        self.iterator = None
+        self.task = asyncio.ensure_future(self._run(create))
+
+    async def _run(self, create: Callable[[], Any]) -> "_AsyncAttempt":
+        self.response = await create()
+        self.created_at = time.perf_counter()
+        if self.stream:
+            self.iterator = self.response.__aiter__()
+            # Read ahead to the first content chunk (or the end of the stream)
+            while True:
+                try:
+                    chunk = await self.iterator.__anext__()
+                except StopAsyncIteration:
+                    self.iterator = None
+                    break
+                self.prefetched.append(chunk)
+                if _has_content(chunk):
+                    break
+        return self
+
+    async def abandon(self):
+        """
+        Give up on this attempt and release its connection.
+        """
+        if not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        elif not self.task.cancelled():
+            # Retrieve the error so it is not reported as unhandled
+            self.task.exception()
+        if self.response is not None:
+            await _aclose(self.response)
+
+
+async def _aclose(response: Any):
+    close = getattr(response, "close", None) or getattr(response, "aclose", None)
+    if close is not None:
+        try:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            pass
+
+
+class AsyncRequestResult:
+    """
+    The winning attempt of an async request; see RequestResult.
+    """
+
+    def __init__(self, attempt: _AsyncAttempt, hedged: bool, retries: int, deadline: float):
+        self.response = attempt.response
+        self.created_at = attempt.created_at
+        self.hedged = hedged
+        self.retries = retries
+        self.deadline = deadline
+        self._prefetched = attempt.prefetched
+        self._iterator = attempt.iterator
+
+    async def iter_chunks(self):
+        """
+        Iterate over a streamed response, enforcing the total timeout.
+
+        Raises:
+            TotalTimeout: If the stream is still open when the deadline passes.
+        """
+        for chunk in self._prefetched:
+            yield chunk
+        if self._iterator is None:
+            return
+        while True:
+            try:
+                chunk = await asyncio.wait_for(self._iterator.__anext__(), max(0.0, self.deadline - time.monotonic()))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                await _aclose(self.response)
+                raise TotalTimeout("Response did not complete within the total timeout") from None
+            yield chunk
+
+
+async def _arace(create: Callable[[], Any], stream: bool, first_token_timeout: float,
+                 hedge_after: Optional[float]) -> tuple:
+    """
+    Run one async attempt, plus a hedge if it is slow, and return the first to answer.
+    """
+    attempts = [_AsyncAttempt(create, stream)]
+    pending = {attempts[0].task}
+    started = time.monotonic()
+    deadline = started + first_token_timeout
+    hedge_at = started + hedge_after if hedge_after is not None else None
+    winner = None
+    failed = 0
+    try:
+        while True:
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, wake - time.monotonic()),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if hedge_at is not None and time.monotonic() < deadline:
+                    attempts.append(_AsyncAttempt(create, stream))
+                    pending.add(attempts[-1].task)
+                    hedge_at = None
+                    continue
+                raise FirstTokenTimeout(f"No response within the first-token timeout of {first_token_timeout:g}s")
+
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    winner = task.result()
+                    return winner, len(attempts) > 1
+                failed += 1
+            if failed == len(attempts):
+                raise error
+    finally:
+        for attempt in attempts:
+            if attempt is not winner:
+                await attempt.abandon()
+
+
+async def arequest(create: Callable[[], Any], stream: bool, hedge_after: Optional[float] = None,
+                   max_retries: int = None, first_token_timeout: float = None,
+                   total_timeout: float = None) -> AsyncRequestResult:
+    """
+    Send an async request with first-token timeout, retries and optional hedging.
+
+    Takes the same arguments as request(), with create returning an awaitable.
+    """
+    max_retries = config.MAX_RETRIES if max_retries is None else max_retries
+    if first_token_timeout is None:
+        first_token_timeout = config.FIRST_TOKEN_TIMEOUT if stream else config.TIMEOUT
+    total_timeout = config.TIMEOUT if total_timeout is None else total_timeout
+    deadline = time.monotonic() + total_timeout
+
+    for retry in range(max_retries + 1):
+        remaining = deadline - time.monotonic()
+        try:
+            attempt, hedged = await _arace(create, stream, min(first_token_timeout, remaining),
+                                           hedge_after if stream else None)
+            return AsyncRequestResult(attempt, hedged, retry, deadline)
+        except Exception as e:
+            if retry == max_retries or not is_retryable(e):
+                raise
+            server_delay = retry_after(e)
+            if server_delay is not None and server_delay > MAX_RETRY_AFTER:
+                raise
+            delay = backoff_delay(retry, server_delay=server_delay)
+            if time.monotonic() + delay >= deadline:
+                raise
+            await asyncio.sleep(delay)
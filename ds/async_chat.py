@@ -0,0 +1,256 @@
+"""
+Asynchronous DeepSeek chat API.
+
+AsyncDeepSeekChat mirrors DeepSeekChat (same modes, prompts, response cache,
+chat history, spell fast path, and the timeouts, retries and hedging of
+ds.retry) on top of the SDK's async client, so many requests can run
+concurrently in one event loop without a thread each.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional
+
+from . import config
+from .cache import get_response_cache
+from .chat import ChatResult, DeepSeekChat, usage_fields, wrap_api_error
+from .ds_highlighter import stream_renderer
+from .aretry import arequest
+from .retry import hedge_threshold
+
+
+class StreamChunk(NamedTuple):
+    """
+    A piece of a streamed response.
+
+    Attributes:
+        raw: Text received from the API (empty for the final flush of buffered output).
+        rendered: Rendered text that can be displayed now. Code blocks are held back
+            until they close, so this may be empty while raw is not.
+    """
+    raw: str
+    rendered: str
+
+
+def _metrics(stream: bool, sent_at: float, first_token_at: Optional[float], finished_at: float,
+             usage: Any, attempt: Any) -> Dict[str, Any]:
+    """
+    Build the history metrics for a request, as DeepSeekChat.chat records them.
+    """
+    metrics = {"stream": stream, "latency_ms": round((finished_at - sent_at) * 1000, 1)}
+    if first_token_at is not None:
+        metrics["ttft_ms"] = round((first_token_at - sent_at) * 1000, 1)
+    if usage is not None:
+        metrics["usage"] = usage_fields(usage)
+    if attempt.retries:
+        metrics["retries"] = attempt.retries
+    if attempt.hedged:
+        metrics["hedged"] = True
+    return metrics
+
+
+class AsyncDeepSeekChat(DeepSeekChat):
+    """
+    Asynchronous counterpart of DeepSeekChat.
+
+    Cancelling a task that awaits achat() or iterates astream() closes the
+    underlying HTTP stream; cancelled requests are neither logged nor cached.
+    """
+
+    @property
+    def client(self):
+        """
+        OpenAI async client shared by every AsyncDeepSeekChat in the running event loop.
+
+        Async clients are bound to an event loop, so they come from the per-loop
+        registry in ds.clients (see get_async_client) rather than the sync one,
+        with the same pool, keep-alive, HTTP/2 and timeout settings. SDK
+        retries are disabled; ds.aretry.arequest retries instead. Call
+        ds.clients.aclose_clients() before the loop ends to close the pool.
+        """
+        if self._client is not None:
+            return self._client
+        from .clients import get_async_client
+        return get_async_client(self.base_url, self.api_key)
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    async def _run_blocking(self, func, *args):
+        """
+        Run disk I/O (cache, history log) off the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _spell_locally(self, query: str, messages, mode: str, language: str, use_cache: bool,
+                             refresh: bool) -> Optional[str]:
+        """
+        Answer a spell-mode query through the spell fast path, as DeepSeekChat.chat does.
+
+        Returns:
+            The corrected text, or None when the query should go to the API whole.
+        """
+        if mode != "spell" or not config.SPELL_FAST_PATH:
+            return None
+        from .spell import acorrect_locally
+        local = await acorrect_locally(self, query, language, use_cache, refresh)
+        if local is None:
+            return None
+        corrected, _, api_sentences = local
+        if not api_sentences:
+            await self._run_blocking(self.log_chat, messages, corrected, mode, {"local": True})
+        return corrected
+
+    async def _request(self, messages, stream: bool):
+        """
+        Send the API request through ds.aretry.arequest.
+        """
+        hedge_after = None
+        if stream and config.HEDGE_PERCENTILE:
+            hedge_after = await self._run_blocking(hedge_threshold, self.log_file, self.model,
+                                                   config.HEDGE_PERCENTILE, config.HEDGE_MIN_DELAY)
+        kwargs = {"model": self.model, "messages": messages, "stream": stream}
+        if stream:
+            # Ask for the usage block, which streamed responses only send on request
+            kwargs["stream_options"] = {"include_usage": True}
+        kwargs.update(self.params)
+        client = self.client
+        try:
+            return await arequest(lambda: client.chat.completions.create(**kwargs), stream, hedge_after)
+        except Exception as e:
+            raise wrap_api_error(e) from e
+
+    async def astream(self, query: str, mode: str = "normal", language: str = "English",
+                      use_cache: bool = True, refresh: bool = False) -> AsyncIterator[StreamChunk]:
+        """
+        Stream a response as it arrives.
+
+        Args:
+            query: User query.
+            mode: Operation mode ("normal", "spell", "trans").
+            language: Target language for translation.
+            use_cache: Whether to use the response cache for modes with a cache TTL.
+            refresh: Skip the cache lookup but store the fresh response.
+
+        Yields:
+            StreamChunk objects holding the raw delta and the text renderable so far.
+        """
+        messages, cache_key, ttl = self._prepare(query, mode, language, use_cache)
+
+        corrected = await self._spell_locally(query, messages, mode, language, use_cache, refresh)
+        if corrected is not None:
+            yield StreamChunk(corrected, self.render(corrected))
+            return
+
+        if cache_key is not None and not refresh:
+            cached = await self._run_blocking(get_response_cache().get, cache_key, ttl)
+            if cached is not None:
+                yield StreamChunk(cached, self.render(cached))
+                await self._run_blocking(self.log_chat, messages, cached, mode, {"cached": True})
+                return
+
+        sent_at = time.perf_counter()
+        attempt = await self._request(messages, True)
+
+        response_text = ""
+        renderer = stream_renderer(self.enable_color, self.theme_name, self.non_code_style)
+        first_token_at = None
+        usage = None
+        completed = False
+        try:
+            try:
+                async for chunk in attempt.iter_chunks():
+                    if hasattr(chunk, 'choices') and chunk.choices:
+                        delta = chunk.choices[0].delta
+                        if hasattr(delta, 'content') and delta.content:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                            response_text += delta.content
+                            yield StreamChunk(delta.content, renderer.feed(delta.content))
+                    elif getattr(chunk, 'usage', None) is not None:
+                        usage = chunk.usage
+            except Exception as e:
+                raise wrap_api_error(e) from e
+            completed = True
+        finally:
+            if not completed:
+                # Cancelled, abandoned by the consumer or failed: release the connection
+                await attempt.response.close()
+
+        metrics = _metrics(True, sent_at, first_token_at, time.perf_counter(), usage, attempt)
+
+        # Flush an unterminated code block or held-back backticks
+        rendered = renderer.close()
+        if rendered:
+            yield StreamChunk("", rendered)
+
+        await self._run_blocking(self.log_chat, messages, response_text, mode, metrics)
+        if cache_key is not None:
+            await self._run_blocking(get_response_cache().put, cache_key, response_text)
+
+    async def achat(self, query: str, mode: str = "normal", language: str = "English", stream: bool = False,
+                    use_cache: bool = True, refresh: bool = False) -> ChatResult:
+        """
+        Send a query and return the response.
+
+        Args:
+            query: User query.
+            mode: Operation mode ("normal", "spell", "trans").
+            language: Target language for translation.
+            stream: Whether to request a streamed response (useful for long answers
+                behind proxies with idle timeouts); the result is the same.
+            use_cache: Whether to use the response cache for modes with a cache TTL.
+            refresh: Skip the cache lookup but store the fresh response.
+
+        Returns:
+            ChatResult, as returned by DeepSeekChat.chat.
+        """
+        if stream:
+            raw = "".join([chunk.raw async for chunk in self.astream(query, mode, language, use_cache, refresh)])
+            return self.result(raw)
+
+        messages, cache_key, ttl = self._prepare(query, mode, language, use_cache)
+        corrected = await self._spell_locally(query, messages, mode, language, use_cache, refresh)
+        if corrected is not None:
+            return self.result(corrected)
+
+        if cache_key is not None and not refresh:
+            cached = await self._run_blocking(get_response_cache().get, cache_key, ttl)
+            if cached is not None:
+                await self._run_blocking(self.log_chat, messages, cached, mode, {"cached": True})
+                return self.result(cached)
+
+        sent_at = time.perf_counter()
+        attempt = await self._request(messages, False)
+        response = attempt.response
+        finished_at = time.perf_counter()
+
+        response_text = ""
+        if hasattr(response, 'choices') and response.choices:
+            response_text = response.choices[0].message.content or ""
+
+        metrics = _metrics(False, sent_at, finished_at, finished_at, getattr(response, "usage", None), attempt)
+        await self._run_blocking(self.log_chat, messages, response_text, mode, metrics)
+        if cache_key is not None:
+            await self._run_blocking(get_response_cache().put, cache_key, response_text)
+        return self.result(response_text)
+
+
+async def achat(query: str, mode: str = "normal", language: str = "English", stream: bool = False) -> ChatResult:
+    """
+    A convenience coroutine to create an AsyncDeepSeekChat instance and send a query.
+
+    Every call in an event loop shares that loop's client and connection pool.
+
+    Args:
+        query: User query.
+        mode: Operation mode ("normal", "spell", "trans").
+        language: Target language for translation.
+        stream: Whether to request a streamed response.
+
+    Returns:
+        ChatResult with the raw text and a lazily computed rendering.
+    """
+    return await AsyncDeepSeekChat().achat(query, mode, language, stream)
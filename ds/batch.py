@@ -0,0 +1,212 @@
+"""
+Concurrent batch mode for ds.
+
+`ds --batch FILE` reads one JSON object per line ({"query", "mode",
+"language", optional "id"}), sends the requests with bounded concurrency over
+a single shared DeepSeekChat, and writes one JSON result per line either in
+input order or as requests complete. A failing item produces an error record
+instead of aborting the batch, and a throughput summary goes to stderr.
+"""
+
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple
+
+from . import config
+from .utils import format_info_message, resolve_language
+
+DEFAULT_CONCURRENCY = 8
+MODES = ("normal", "spell", "trans")
+
+
+def _parse_items(lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (index, item) pairs, where item is a dict or the exception raised while parsing.
+    """
+    index = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict) or not isinstance(item.get("query"), str):
+                raise ValueError('each line must be a JSON object with a string "query"')
+            if item.get("mode", "normal") not in MODES:
+                raise ValueError(f"unknown mode {item.get('mode')!r}")
+            if not isinstance(item.get("language"), (str, type(None))):
+                raise ValueError('"language" must be a string')
+        except ValueError as e:
+            item = e
+        yield index, item
+        index += 1
+
+
+class BatchRunner:
+    """
+    Run JSONL chat requests concurrently over one DeepSeekChat.
+    """
+
+    def __init__(self, chat_instance, concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = True,
+                 use_cache: bool = True, refresh: bool = False):
+        """
+        Initialize the runner.
+
+        Args:
+            chat_instance: DeepSeekChat shared by all worker threads.
+            concurrency: Maximum number of requests in flight.
+            ordered: Write results in input order (True) or completion order (False).
+            use_cache: Whether items may be answered from the response cache.
+            refresh: Skip cache lookups but store fresh responses.
+        """
+        self.chat = chat_instance
+        self.concurrency = max(1, concurrency)
+        self.ordered = ordered
+        self.use_cache = use_cache
+        self.refresh = refresh
+        self._write_lock = threading.Lock()
+
+    def _run_item(self, index: int, item: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = {"index": index}
+        if isinstance(item, dict):
+            if "id" in item:
+                result["id"] = item["id"]
+            mode = item.get("mode", "normal")
+            try:
+                language = resolve_language(mode, item.get("language"))
+                result["response"] = self.chat.chat(item["query"], mode, language, stream=False,
+                                                    use_cache=self.use_cache, refresh=self.refresh).text
+                result["error"] = None
+            except Exception as e:
+                result["response"] = None
+                result["error"] = str(e)
+        else:
+            result["response"] = None
+            result["error"] = f"Invalid input line: {item}"
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def _write(self, output: TextIO, result: Dict[str, Any]):
+        with self._write_lock:
+            output.write(json.dumps(result, ensure_ascii=False))
+            output.write("\n")
+            output.flush()
+
+    def run(self, lines: Iterable[str], output: TextIO) -> Dict[str, Any]:
+        """
+        Process every input line and write the results.
+
+        Input is consumed lazily: at most twice the concurrency is read ahead,
+        counting results held back behind a slow item in ordered mode, so
+        arbitrarily large inputs run in bounded memory.
+
+        Args:
+            lines: JSONL input lines.
+            output: Text stream receiving JSONL results.
+
+        Returns:
+            Summary with item counts, wall time and latency figures.
+        """
+        start = time.perf_counter()
+        latencies = []
+        failed = 0
+        pending_results = {}
+        next_index = 0
+        items = _parse_items(lines)
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = set()
+            while True:
+                # Held-back results count against the window; the item they
+                # wait for is still in flight, so this cannot stall
+                while not exhausted and len(in_flight) + len(pending_results) < self.concurrency * 2:
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight.add(executor.submit(self._run_item, index, item))
+                if not in_flight:
+                    break
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    latencies.append(result["elapsed_ms"])
+                    failed += result["error"] is not None
+                    if not self.ordered:
+                        self._write(output, result)
+                        continue
+                    pending_results[result["index"]] = result
+                    while next_index in pending_results:
+                        self._write(output, pending_results.pop(next_index))
+                        next_index += 1
+
+        elapsed = time.perf_counter() - start
+        total = len(latencies)
+        return {
+            "items": total,
+            "succeeded": total - failed,
+            "failed": failed,
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": statistics.median(latencies) if latencies else 0.0,
+            "max_ms": max(latencies) if latencies else 0.0,
+        }
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """
+    Render a batch summary as one human-readable line.
+    """
+    return (
+        f"batch: {summary['items']} items ({summary['succeeded']} ok, {summary['failed']} failed) "
+        f"in {summary['seconds']:.2f}s, {summary['items_per_second']:.2f} items/s, "
+        f"p50 {summary['p50_ms']:.0f} ms, max {summary['max_ms']:.0f} ms"
+    )
+
+
+def run_batch(source: str, destination: str = None, concurrency: int = DEFAULT_CONCURRENCY,
+              ordered: bool = True, use_cache: bool = True, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Run a batch from a file (or "-" for stdin) and write results to a file or stdout.
+
+    Args:
+        source: Path of the JSONL input, or "-" for stdin.
+        destination: Path of the JSONL output (defaults to stdout).
+        concurrency: Maximum number of requests in flight.
+        ordered: Write results in input order (True) or completion order (False).
+        use_cache: Whether items may be answered from the response cache.
+        refresh: Skip cache lookups but store fresh responses.
+
+    Returns:
+        The batch summary.
+    """
+    from .chat import DeepSeekChat
+
+    # Worker threads must not draw spinners, and results are plain text
+    config.SPINNER = False
+    chat_instance = DeepSeekChat(enable_color=False)
+    if not chat_instance.api_key:
+        raise ValueError("API key is missing. Please set the DEEPSEEK_API_KEY environment variable.")
+    # Create the shared client up front rather than racing to create it in the workers
+    chat_instance.client
+
+    runner = BatchRunner(chat_instance, concurrency, ordered, use_cache, refresh)
+    input_file = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    output_file = sys.stdout if destination is None else open(destination, "w", encoding="utf-8")
+    try:
+        summary = runner.run(input_file, output_file)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    print(format_info_message(format_summary(summary), config.ENABLE_COLOR and sys.stderr.isatty()), file=sys.stderr)
+    return summary
@@ -0,0 +1,266 @@
+"""
+Content-addressed on-disk response cache.
+
+Responses are stored as one JSON file per key under
+``<cache dir>/<key[:2]>/<key>.json``. Keys hash everything that determines
+the answer (model, base URL, system prompt, query and sampling parameters),
+entries expire after a per-mode TTL, and the least recently used entries are
+evicted once the cache exceeds its size bound. Writes go through a temporary
+file and ``os.replace`` and the shared counters are updated under a file lock,
+so several ds processes can use the same cache concurrently.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from . import config
+from .utils import file_lock
+
+# Fraction of the size bound to shrink to when evicting, so eviction is rare
+EVICT_TARGET = 0.8
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of raw response text on disk.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = config.DEFAULT_CACHE_MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory holding cache entries and counters.
+            max_bytes: Total size of entries above which LRU eviction runs.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._stats_file = self.directory / "stats.json"
+        self._lock_file = self.directory / ".lock"
+        self._thread_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, base_url: str, system_prompt: str, query: str, params: Dict[str, Any] = None) -> str:
+        """
+        Compute the content address of a request.
+
+        Args:
+            model: Model name.
+            base_url: API base URL.
+            system_prompt: System prompt from DeepSeekChat.build_system_prompt.
+            query: User query.
+            params: Sampling parameters sent with the request.
+
+        Returns:
+            Hex SHA-256 digest identifying the request.
+        """
+        material = json.dumps(
+            [model, base_url, system_prompt, query, params or {}],
+            ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold an exclusive lock shared by all processes using this cache.
+        """
+        with self._thread_lock, file_lock(self._lock_file):
+            yield
+
+    def _read_stats(self) -> Dict[str, int]:
+        try:
+            with open(self._stats_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0, "bytes": 0}
+
+    def _write_stats(self, stats: Dict[str, int]):
+        self._atomic_write(self._stats_file, json.dumps(stats))
+
+    def _update_stats(self, **deltas):
+        with self._locked():
+            stats = self._read_stats()
+            for name, delta in deltas.items():
+                stats[name] = stats.get(name, 0) + delta
+            self._write_stats(stats)
+        return stats
+
+    @staticmethod
+    def _atomic_write(path: Path, data: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+
+    def get(self, key: str, ttl: float) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Key from make_key.
+            ttl: Maximum age in seconds.
+
+        Returns:
+            The cached response text, or None on a miss or expired entry.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._update_stats(misses=1)
+            return None
+
+        if time.time() - entry.get("stored_at", 0) > ttl:
+            self._remove(path)
+            self._update_stats(misses=1)
+            return None
+
+        # Refresh the access time used for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._update_stats(hits=1)
+        return entry.get("response")
+
+    def put(self, key: str, response: str):
+        """
+        Store a response, evicting least recently used entries if over the size bound.
+
+        Args:
+            key: Key from make_key.
+            response: Raw response text.
+        """
+        path = self._path(key)
+        data = json.dumps({"stored_at": time.time(), "response": response}, ensure_ascii=False)
+        try:
+            old_size = path.stat().st_size
+        except OSError:
+            old_size = 0
+        self._atomic_write(path, data)
+
+        stats = self._update_stats(bytes=len(data.encode("utf-8")) - old_size)
+        if stats["bytes"] > self.max_bytes:
+            self.evict()
+
+    def _remove(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        self._update_stats(bytes=-size)
+
+    def _entries(self):
+        for bucket in self.directory.iterdir() if self.directory.exists() else ():
+            if bucket.is_dir():
+                for entry in os.scandir(bucket):
+                    if entry.name.endswith(".json"):
+                        yield entry
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache is below its target size.
+        """
+        with self._locked():
+            entries = []
+            for entry in self._entries():
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+            entries.sort()
+
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * EVICT_TARGET
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                except OSError:
+                    pass
+
+            stats = self._read_stats()
+            stats["bytes"] = total
+            self._write_stats(stats)
+
+    def clear(self):
+        """
+        Delete every entry and reset the counters.
+        """
+        with self._locked():
+            for entry in list(self._entries()):
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+            self._write_stats({"hits": 0, "misses": 0, "bytes": 0})
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the shared hit, miss and stored-bytes counters.
+        """
+        with self._locked():
+            return self._read_stats()
+
+
+_caches: Dict[Path, ResponseCache] = {}
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Return the process-wide response cache for the configured directory.
+    """
+    directory = config.CACHE_DIR / "responses"
+    if directory not in _caches:
+        _caches[directory] = ResponseCache(directory, config.CACHE_MAX_BYTES)
+    return _caches[directory]
+
+
+def main(argv=None):
+    """
+    Entry point for `ds cache stats|clear`.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="ds cache", description="Inspect or clear the response cache")
+    parser.add_argument("action", choices=["stats", "clear"], help="Show hit/miss counters or delete all entries")
+    args = parser.parse_args(argv)
+
+    cache = get_response_cache()
+    if args.action == "clear":
+        cache.clear()
+        print(f"Cleared {cache.directory}")
+        return
+
+    stats = cache.stats()
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    ratio = stats.get("hits", 0) / lookups if lookups else 0.0
+    print(f"directory: {cache.directory}")
+    print(f"hits:      {stats.get('hits', 0)}")
+    print(f"misses:    {stats.get('misses', 0)}")
+    print(f"hit ratio: {ratio:.1%}")
+    print(f"size:      {stats.get('bytes', 0) / 1024:.1f} KiB of {cache.max_bytes / 1024:.0f} KiB")
@@ -1,21 +1,84 @@
-import json
 import sys
 import time
-import threading
 from pathlib import Path
-from typing import List, Dict, Any
-import openai
-from .config import API_KEY, BASE_URL, MODEL, LOG_FILE, ENABLE_COLOR, SPINNER, STREAM, COLOR_SCHEME, NON_CODE_STYLE
+from typing import List, Dict, Any, Optional, TextIO, Tuple
+from . import config
 from .utils import format_error_message, format_info_message
-from .highlighter import render_content, render_incremental, strip_ansi
+from .timings import Timings
+from .ds_highlighter import stream_renderer
+from .highlighter import render_content, split_blocks
+
+
+class ChatResult:
+    """
+    A response from DeepSeekChat.chat.
+
+    The raw text is kept as received; the parsed blocks and the ANSI rendering
+    are computed on first access, so consumers that only need the text (logs,
+    pipes, editors) never pay for highlighting. ``str(result)`` is the
+    rendering, so printing a result looks as before.
+
+    Attributes:
+        text: Raw response text (Markdown, without escape codes).
+    """
+
+    def __init__(self, text: str, enable_color: bool = True, theme_name: str = "dracula",
+                 non_code_style: str = "plain"):
+        """
+        Initialize the result.
+
+        Args:
+            text: Raw response text.
+            enable_color: Whether the rendering uses ANSI colors.
+            theme_name: Code highlighting theme of the rendering.
+            non_code_style: Style for non-code text in the rendering.
+        """
+        self.text = text
+        self.enable_color = enable_color
+        self.theme_name = theme_name
+        self.non_code_style = non_code_style
+        self._blocks = None
+        self._rendered = None
+
+    @property
+    def blocks(self) -> List[Tuple[str, bool]]:
+        """
+        (content, is_code) pairs from split_blocks, without the fence markers.
+        """
+        if self._blocks is None:
+            self._blocks = split_blocks(self.text)
+        return self._blocks
+
+    @property
+    def rendered(self) -> str:
+        """
+        The text rendered with syntax highlighting, as render_content produces it.
+        """
+        if self._rendered is None:
+            self._rendered = render_content(self.text, enable_color=self.enable_color, theme_name=self.theme_name,
+                                            non_code_style=self.non_code_style)
+        return self._rendered
+
+    def __str__(self) -> str:
+        return self.rendered
+
+    def __repr__(self) -> str:
+        return f"ChatResult({self.text!r})"
 
 
 class DeepSeekChat:
     """
     A class to handle DeepSeek API communication with streaming support.
+
+    Instances are thread-safe: chat() keeps no per-request state on the
+    instance, and the OpenAI client comes from a process-wide registry
+    (ds.clients), so any number of threads and DeepSeekChat objects for the
+    same endpoint and key share one pooled, keep-alive connection set.
     """
     
-    def __init__(self, api_key: str = None, base_url: str = None, model: str = None, log_file: Path = None):
+    def __init__(self, api_key: str = None, base_url: str = None, model: str = None, log_file: Path = None,
+                 client: Any = None, enable_color: bool = None, theme_name: str = None, non_code_style: str = None,
+                 params: Dict[str, Any] = None):
         """
         Initialize the DeepSeekChat instance.
         
@@ -24,17 +87,39 @@ class DeepSeekChat:
             base_url: DeepSeek API base URL.
             model: DeepSeek model name.
             log_file: Path to log file for chat history.
+            client: OpenAI client to use instead of the shared one from ds.clients.
+            enable_color: Whether to render ANSI colors (defaults to config).
+            theme_name: Code highlighting theme (defaults to config).
+            non_code_style: Style for non-code text (defaults to config).
+            params: Extra sampling parameters (e.g. temperature) sent with every request.
         """
-        self.api_key = api_key or API_KEY
-        self.base_url = base_url or BASE_URL
-        self.model = model or MODEL
-        self.log_file = log_file or LOG_FILE
-        
-        # Initialize OpenAI client
-        self.client = openai.OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
+        self.api_key = api_key or config.API_KEY
+        self.base_url = base_url or config.BASE_URL
+        self.model = model or config.MODEL
+        self.log_file = log_file or config.LOG_FILE
+        self.enable_color = config.ENABLE_COLOR if enable_color is None else enable_color
+        self.theme_name = theme_name or config.COLOR_SCHEME
+        self.non_code_style = non_code_style or config.NON_CODE_STYLE
+        self.params = dict(params or {})
+        self._client = client
+
+    @property
+    def client(self):
+        """
+        OpenAI client, looked up on first use.
+
+        The SDK dominates startup time, so it is not imported until a request
+        actually needs the network (cache hits never do). The client is shared
+        with every other instance using the same base URL and API key.
+        """
+        if self._client is None:
+            from .clients import get_client
+            self._client = get_client(self.base_url, self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
     
     def build_system_prompt(self, mode: str, language: str) -> str:
         """
@@ -54,33 +139,120 @@ class DeepSeekChat:
         }
         return prompts.get(mode, prompts["normal"])
     
-    def log_chat(self, messages: List[Dict[str, str]], response: str):
+    def render(self, text: str) -> str:
+        """
+        Render response text with this instance's color and theme settings.
+        
+        Args:
+            text: Raw response text.
+            
+        Returns:
+            Rendered text.
+        """
+        return render_content(text, enable_color=self.enable_color, theme_name=self.theme_name, non_code_style=self.non_code_style)
+
+    def result(self, text: str) -> ChatResult:
+        """
+        Wrap raw response text in a ChatResult that renders with this instance's settings.
+        """
+        return ChatResult(text, enable_color=self.enable_color, theme_name=self.theme_name,
+                          non_code_style=self.non_code_style)
+
+    def _prepare(self, query: str, mode: str, language: str, use_cache: bool) -> Tuple[List[Dict[str, str]], Optional[str], int]:
+        """
+        Validate the request and build the API messages and response cache key.
+        
+        Args:
+            query: User query.
+            mode: Operation mode ("normal", "spell", "trans").
+            language: Target language for translation.
+            use_cache: Whether the response cache may be used.
+            
+        Returns:
+            A tuple of (messages, cache_key, ttl); cache_key is None when the
+            cache does not apply to this request.
+        """
+        # Validate API key presence (format may vary by provider/proxy)
+        if not self.api_key:
+            raise ValueError("API key is missing. Please set the DEEPSEEK_API_KEY environment variable.")
+        
+        # Build messages for API call
+        system_prompt = self.build_system_prompt(mode, language)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": query}
+        ]
+
+        cache_key = None
+        ttl = config.CACHE_TTLS.get(mode, 0)
+        if use_cache and config.CACHE_ENABLED and ttl > 0:
+            from .cache import get_response_cache
+            cache_key = get_response_cache().make_key(self.model, self.base_url, system_prompt, query, self.params)
+        return messages, cache_key, ttl
+
+    def log_chat(self, messages: List[Dict[str, str]], response: str, mode: str = None,
+                 metrics: Optional[Dict[str, Any]] = None):
         """
         Log chat history to the specified log file.
         
+        The entry is queued for a background writer (see ds.history), so this
+        returns without waiting for disk I/O.
+        
         Args:
             messages: List of chat messages.
-            response: Assistant response.
+            response: Raw assistant response text.
+            mode: Operation mode of the request, recorded for history search.
+            metrics: Request metrics stored with the entry ("usage", "ttft_ms",
+                "latency_ms", "cached"), as collected by chat().
         """
         try:
             chat_entry = {
                 "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
                 "messages": messages,
-                "response": strip_ansi(response),
-                "model": self.model
+                "response": response,
+                "model": self.model,
+                "mode": mode
             }
-
-            # Ensure log directory exists and append as NDJSON for safety
-            self.log_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(chat_entry, ensure_ascii=False))
-                f.write("\n")
+            if metrics:
+                chat_entry.update(metrics)
+            from .history import get_history_writer
+            get_history_writer(self.log_file).append(chat_entry)
 
         except Exception as e:
-            error_msg = format_error_message("Logging Error", f"Failed to log chat history: {e}", ENABLE_COLOR)
+            error_msg = format_error_message("Logging Error", f"Failed to log chat history: {e}", config.ENABLE_COLOR)
             print(error_msg, file=sys.stderr)
     
-    def chat(self, query: str, mode: str = "normal", language: str = "English", stream: bool = None):
+    def _log_timed(self, messages: List[Dict[str, str]], response: str, mode: str, timings: Optional[Timings],
+                   metrics: Optional[Dict[str, Any]] = None):
+        """
+        Call log_chat, recording how long it took when timings are collected.
+        """
+        if timings is None:
+            self.log_chat(messages, response, mode, metrics)
+            return
+        timings.mark("log_start")
+        self.log_chat(messages, response, mode, metrics)
+        timings.mark("log_end")
+
+    def _write_whole(self, output: Optional[TextIO], result: ChatResult, render: bool, timings: Optional[Timings]):
+        """
+        Write a response that is available all at once (cache or local answer) to output.
+        """
+        if output is None:
+            return
+        if not render:
+            output.write(result.text)
+        else:
+            if timings is not None:
+                timings.mark("render_start")
+            output.write(result.rendered)
+            if timings is not None:
+                timings.mark("render_end")
+        output.flush()
+
+    def chat(self, query: str, mode: str = "normal", language: str = "English", stream: bool = None, output: TextIO = None,
+             use_cache: bool = True, refresh: bool = False, timings: Optional[Timings] = None,
+             render: bool = True) -> ChatResult:
         """
         Send a query to the DeepSeek API and return the response.
         
@@ -89,124 +261,233 @@ class DeepSeekChat:
             mode: Operation mode ("normal", "spell", "trans").
             language: Target language for translation.
             stream: Whether to stream the response.
+            output: Optional text stream. When streaming, rendered text is written
+                to it as soon as it can be displayed: prose immediately, fenced
+                code blocks once they are closed.
+            use_cache: Whether to use the response cache for modes with a cache TTL.
+            refresh: Skip the cache lookup but store the fresh response.
+            timings: Optional Timings that receives per-phase marks for this request.
+            render: Whether text written to output is rendered; False writes the
+                raw text as it arrives (for pipes and files).
             
         Returns:
-            Assistant response string.
+            ChatResult with the raw text; rendering happens only if it is asked for.
         """
+        # Imported here so that `import ds` and the CLI's fast paths stay cheap
+        from .cache import get_response_cache
+        from .retry import hedge_threshold, request
+        from .spinner import Spinner
+
+        if timings is not None:
+            timings.mark("chat_start")
         # Use global config if stream is not specified
         if stream is None:
-            stream = STREAM
-        # Validate API key presence (format may vary by provider/proxy)
-        if not self.api_key:
-            raise ValueError("API key is missing. Please set the DEEPSEEK_API_KEY environment variable.")
-        
-        # Build messages for API call
-        system_prompt = self.build_system_prompt(mode, language)
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query}
-        ]
-        
+            stream = config.STREAM
+        messages, cache_key, ttl = self._prepare(query, mode, language, use_cache)
+
+        # Spell mode answers correctly spelled text locally and only sends the sentences with unknown words
+        if mode == "spell" and config.SPELL_FAST_PATH:
+            from .spell import correct_locally
+            local = correct_locally(self, query, language, use_cache, refresh)
+            if local is not None:
+                corrected, local_sentences, api_sentences = local
+                if timings is not None:
+                    timings.values["spell_local_sentences"] = local_sentences
+                    timings.values["spell_api_sentences"] = api_sentences
+                result = self.result(corrected)
+                self._write_whole(output, result, render, timings)
+                if not api_sentences:
+                    self._log_timed(messages, corrected, mode, timings, {"local": True})
+                return result
+
+        # Deterministic modes are answered from the response cache when possible
+        if cache_key is not None and not refresh:
+            cached = get_response_cache().get(cache_key, ttl)
+            if cached is not None:
+                if timings is not None:
+                    timings.values["cached"] = True
+                result = self.result(cached)
+                self._write_whole(output, result, render, timings)
+                self._log_timed(messages, cached, mode, timings, {"cached": True})
+                return result
+
+        # Spinner on stderr until the first delta (or the full response) arrives
+        spinner = Spinner(enabled=bool(config.SPINNER))
         try:
             response_text = ""
+            spinner.start()
 
-            # Function to display loading animation
-            def loading_animation():
-                animation_chars = ["|", "/", "-", "\\"]
-                idx = 0
-                while loading:
-                    print(f"\r{animation_chars[idx]} Thinking...", end="", flush=True)
-                    idx = (idx + 1) % len(animation_chars)
-                    time.sleep(0.1)
-
-            loading = False
-            animation_thread = None
-
-            def stop_loading():
-                nonlocal loading
-                if loading and animation_thread is not None:
-                    loading = False
-                    animation_thread.join()
-                    print("\r" + " " * 50, end="\r", flush=True)
-
-            if SPINNER:
-                loading = True
-                animation_thread = threading.Thread(target=loading_animation)
-                animation_thread.start()
-
-            # Make API call with appropriate streaming setting
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                stream=stream
-            )
+            if timings is not None:
+                timings.mark("client_start")
+                self.client
+                timings.mark("client_ready")
+
+            kwargs = {"model": self.model, "messages": messages, "stream": stream}
+            if stream:
+                # Ask for the usage block, which streamed responses only send on request
+                kwargs["stream_options"] = {"include_usage": True}
+            # User params (e.g. their own stream_options) override the defaults above
+            kwargs.update(self.params)
+            client = self.client
+            hedge_after = None
+            if stream and config.HEDGE_PERCENTILE:
+                hedge_after = hedge_threshold(self.log_file, self.model, config.HEDGE_PERCENTILE, config.HEDGE_MIN_DELAY)
+            sent_at = time.perf_counter()
+            if timings is not None:
+                timings.mark("request_sent", sent_at)
+
+            # Make API call with appropriate streaming setting; retries and hedging happen in ds.retry
+            attempt = request(lambda: client.chat.completions.create(**kwargs), stream, hedge_after)
+            response = attempt.response
+            # Streaming calls return once the response headers arrive
+            if timings is not None:
+                timings.mark("first_byte", attempt.created_at)
+                if attempt.retries:
+                    timings.values["retries"] = attempt.retries
+                if attempt.hedged:
+                    timings.values["hedged"] = True
 
             # Process and print the response
             if stream:
-                buffer = ""
+                renderer = stream_renderer(self.enable_color, self.theme_name, self.non_code_style)
                 first_chunk = True
-                for chunk in response:
+                first_token_at = None
+                usage = None
+                content_chunks = 0
+                for chunk in attempt.iter_chunks():
                     if hasattr(chunk, 'choices') and chunk.choices:
                         delta = chunk.choices[0].delta
                         if hasattr(delta, 'content') and delta.content:
                             if first_chunk:
-                                stop_loading()
+                                spinner.stop()
                                 first_chunk = False
+                                first_token_at = time.perf_counter()
+                                if timings is not None:
+                                    timings.mark("first_token", first_token_at)
+                            content_chunks += 1
                             content_chunk = delta.content
                             response_text += content_chunk
+                            if output is not None and not render:
+                                output.write(content_chunk)
+                                output.flush()
+                            elif output is not None:
+                                # Display whatever is complete; open code blocks stay buffered
+                                rendered = renderer.feed(content_chunk)
+                                if rendered:
+                                    output.write(rendered)
+                                    output.flush()
+                    elif getattr(chunk, 'usage', None) is not None:
+                        # Final chunk sent because of stream_options.include_usage
+                        usage = chunk.usage
+                finished_at = time.perf_counter()
                 # Ensure loading indicator stops even if no content is streamed
-                stop_loading()
-                
-                # Render the response with syntax highlighting
-                from .utils import render_content
-                rendered_response = render_content(response_text, enable_color=ENABLE_COLOR, theme_name=COLOR_SCHEME, non_code_style=NON_CODE_STYLE)
-                return rendered_response
+                spinner.stop()
+                if timings is not None:
+                    timings.mark("last_token", finished_at)
+                    # Without a usage block, DeepSeek streams about one token per content chunk
+                    timings.values["tokens"] = usage.completion_tokens if usage is not None else content_chunks
+
+                # Flush an unterminated code block or held-back backticks
+                if output is not None and render:
+                    if timings is not None:
+                        timings.mark("render_start")
+                    rendered = renderer.close()
+                    if rendered:
+                        output.write(rendered)
+                        output.flush()
+                    if timings is not None:
+                        timings.mark("render_end")
             else:
+                finished_at = first_token_at = time.perf_counter()
+                usage = getattr(response, "usage", None)
                 # Get content from non-streaming response
                 if hasattr(response, 'choices') and response.choices:
                     response_text = response.choices[0].message.content or ""
                     
                     # Stop loading once we have the full response
-                    stop_loading()
+                    spinner.stop()
+                    if timings is not None:
+                        timings.mark("first_token", finished_at)
+                        timings.mark("last_token", finished_at)
+                        if usage is not None:
+                            timings.values["tokens"] = usage.completion_tokens
                     
                     # Just return the response text, don't print it here
                     # The caller will handle printing
                 else:
-                    stop_loading()
+                    spinner.stop()
 
-            # Render the response with syntax highlighting
-            from .utils import render_content
-            rendered_response = render_content(response_text, enable_color=ENABLE_COLOR, theme_name=COLOR_SCHEME, non_code_style=NON_CODE_STYLE)
-            
-            # Log chat history
-            self.log_chat(messages, rendered_response)
+            # Log chat history with usage and latency for `ds stats`
+            metrics = {"stream": stream, "latency_ms": round((finished_at - sent_at) * 1000, 1)}
+            if first_token_at is not None:
+                metrics["ttft_ms"] = round((first_token_at - sent_at) * 1000, 1)
+            if usage is not None:
+                metrics["usage"] = usage_fields(usage)
+            if attempt.retries:
+                metrics["retries"] = attempt.retries
+            if attempt.hedged:
+                metrics["hedged"] = True
+            self._log_timed(messages, response_text, mode, timings, metrics)
+
+            if cache_key is not None:
+                get_response_cache().put(cache_key, response_text)
             
-            return rendered_response
-        
-        except openai.APIError as e:
-            raise RuntimeError(f"DeepSeek API error occurred: {e}") from e
-        
-        except openai.APIConnectionError as e:
-            raise RuntimeError(f"Failed to connect to DeepSeek API: {e}") from e
-        
-        except openai.RateLimitError as e:
-            raise RuntimeError(f"DeepSeek API rate limit exceeded: {e}") from e
-        
-        except openai.AuthenticationError as e:
-            raise RuntimeError(f"DeepSeek API authentication failed: {e}") from e
+            return self.result(response_text)
         
         except Exception as e:
-            raise RuntimeError(f"An unexpected error occurred: {e}") from e
+            raise wrap_api_error(e) from e
         
         finally:
             # Ensure spinner is stopped on any early exit
-            try:
-                stop_loading()
-            except Exception:
-                pass
+            spinner.stop()
+
+
+def usage_fields(usage: Any) -> Dict[str, int]:
+    """
+    Extract the token counts worth keeping from an API usage block.
+    
+    Args:
+        usage: Usage object from a completion or the final streamed chunk.
+        
+    Returns:
+        Dict with prompt_tokens, completion_tokens and, when reported,
+        cache_hit_tokens (prompt tokens served from DeepSeek's context cache).
+    """
+    fields = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+    }
+    # DeepSeek reports prompt_cache_hit_tokens; OpenAI-style servers use prompt_tokens_details
+    cache_hit = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cache_hit is None:
+        cache_hit = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    if cache_hit is not None:
+        fields["cache_hit_tokens"] = cache_hit
+    return fields
+
+
+def wrap_api_error(e: Exception) -> RuntimeError:
+    """
+    Convert an exception raised while talking to the API into a RuntimeError with a user-facing message.
+    
+    Args:
+        e: The original exception.
+        
+    Returns:
+        RuntimeError to raise in its place.
+    """
+    import openai
+
+    if isinstance(e, openai.APIError):
+        return RuntimeError(f"DeepSeek API error occurred: {e}")
+    if isinstance(e, TimeoutError):
+        return RuntimeError(f"DeepSeek API request timed out: {e}")
+    return RuntimeError(f"An unexpected error occurred: {e}")
 
 
-def chat(query: str, mode: str = "normal", language: str = "English", stream: bool = None):
+def chat(query: str, mode: str = "normal", language: str = "English", stream: bool = None, output: TextIO = None,
+         use_cache: bool = True, refresh: bool = False, timings: Optional[Timings] = None,
+         render: bool = True) -> ChatResult:
     """
     A convenience function to create a DeepSeekChat instance and send a query.
     
@@ -215,9 +496,14 @@ def chat(query: str, mode: str = "normal", language: str = "English", stream: bo
         mode: Operation mode ("normal", "spell", "trans").
         language: Target language for translation.
         stream: Whether to stream the response.
+        output: Optional text stream that receives rendered text while streaming.
+        use_cache: Whether to use the response cache for modes with a cache TTL.
+        refresh: Skip the cache lookup but store the fresh response.
+        timings: Optional Timings that receives per-phase marks for this request.
+        render: Whether text written to output is rendered (False writes raw text).
         
     Returns:
-        Assistant response string.
+        ChatResult with the raw text and a lazily computed rendering.
     """
     chat_instance = DeepSeekChat()
-    return chat_instance.chat(query, mode, language, stream)
+    return chat_instance.chat(query, mode, language, stream, output, use_cache, refresh, timings, render)
@@ -0,0 +1,149 @@
+"""
+Process-wide registry of pooled OpenAI clients.
+
+Every DeepSeekChat for the same (base_url, api_key) shares one OpenAI client
+and therefore one httpx connection pool, so repeated requests from the nvim
+helpers, the top-level chat() helper or many threads reuse warm keep-alive
+connections instead of paying a TLS handshake each. Pool size, keep-alive
+expiry and HTTP/2 come from config when a client is first created.
+
+Async clients are bound to the event loop they were first used in, so the
+async registry keeps one client per (event loop, base_url, api_key).
+"""
+
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Any, Dict, Tuple
+
+from . import config
+
+_clients: Dict[Tuple[str, str], Any] = {}
+_lock = threading.Lock()
+_pid = os.getpid()
+# Event loop -> {(base_url, api_key): AsyncOpenAI}; entries go away with their loop
+_async_clients: "weakref.WeakKeyDictionary[Any, Dict[Tuple[str, str], Any]]" = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    """
+    Check whether httpx can speak HTTP/2 (the optional ``h2`` package is installed).
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+def http_client_options() -> Dict[str, Any]:
+    """
+    Return the httpx client settings shared by the sync and async clients.
+
+    HTTP/2 is only requested when enabled in config and ``h2`` is importable;
+    otherwise connections fall back to HTTP/1.1 keep-alive.
+    """
+    import httpx
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.POOL_SIZE,
+            max_keepalive_connections=config.POOL_SIZE,
+            keepalive_expiry=config.KEEPALIVE,
+        ),
+        "timeout": httpx.Timeout(config.TIMEOUT, connect=config.CONNECT_TIMEOUT),
+        "http2": bool(config.HTTP2) and http2_available(),
+    }
+
+
+def get_client(base_url: str, api_key: str):
+    """
+    Return the shared OpenAI client for an endpoint and key, creating it on first use.
+
+    The client is thread-safe; its SDK-level retries are disabled because
+    DeepSeekChat retries through ds.retry. A forked child starts with an empty
+    registry rather than sharing the parent's sockets.
+
+    Args:
+        base_url: API base URL.
+        api_key: API key.
+
+    Returns:
+        An ``openai.OpenAI`` instance.
+    """
+    global _pid
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is not None and _pid == os.getpid():
+        return client
+    with _lock:
+        if _pid != os.getpid():
+            _clients.clear()
+            _pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            import openai
+
+            options = http_client_options()
+            client = openai.OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=options.pop("timeout"),
+                max_retries=0,
+                http_client=openai.DefaultHttpxClient(**options),
+            )
+            _clients[key] = client
+        return client
+
+
+def close_clients():
+    """
+    Close every registered client and empty the registry.
+    """
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+def get_async_client(base_url: str, api_key: str):
+    """
+    Return the shared async OpenAI client for the running event loop, endpoint and key.
+
+    Must be called from a coroutine. SDK-level retries are disabled because
+    AsyncDeepSeekChat retries through ds.aretry.
+
+    Args:
+        base_url: API base URL.
+        api_key: API key.
+
+    Returns:
+        An ``openai.AsyncOpenAI`` instance.
+    """
+    import asyncio
+
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = (base_url, api_key)
+    client = clients.get(key)
+    if client is None:
+        import openai
+
+        options = http_client_options()
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=options.pop("timeout"),
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(**options),
+        )
+        clients[key] = client
+    return client
+
+
+async def aclose_clients():
+    """
+    Close the async clients of the running event loop and forget them.
+    """
+    import asyncio
+
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
@@ -16,6 +16,34 @@ def _default_log_file() -> Path:
     return state_home / "deepseek-cli" / "chat_history.jsonl"
 
 
+def _default_socket_path() -> Path:
+    """
+    Determine the Unix socket used by the `ds serve` daemon.
+    Prefer the per-user runtime directory; otherwise fall back to XDG state.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "deepseek-cli" / "ds.sock"
+    state_home = Path(os.environ.get("XDG_STATE_HOME", Path.home() / ".local/state"))
+    return state_home / "deepseek-cli" / "ds.sock"
+
+
+def _default_cache_dir() -> Path:
+    """
+    Determine the response cache directory under XDG cache.
+    """
+    cache_home = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return cache_home / "deepseek-cli"
+
+
+def _default_user_dictionary() -> Path:
+    """
+    Determine the spell-check user dictionary under XDG config.
+    """
+    config_home = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"))
+    return config_home / "deepseek-cli" / "words.txt"
+
+
 # Default configuration values
 DEFAULT_BASE_URL = "https://api.deepseek.com"
 DEFAULT_MODEL = "deepseek-chat"
@@ -24,12 +52,46 @@ DEFAULT_ENABLE_COLOR = True  # Enable color by default
 DEFAULT_ENABLE_SPINNER = sys.stdout.isatty()
 DEFAULT_STREAM = True  # Enable streaming by default
 DEFAULT_VERSION = "1.0.2"
+DEFAULT_SOCKET_PATH = _default_socket_path()
+DEFAULT_CACHE_DIR = _default_cache_dir()
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Response cache time-to-live per mode in seconds; 0 disables caching for that mode
+DEFAULT_CACHE_TTLS = {
+    "normal": 0,
+    "spell": 30 * 24 * 3600,
+    "trans": 30 * 24 * 3600,
+}
+# Chat history segments are sealed and compressed once they reach either bound
+DEFAULT_HISTORY_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_HISTORY_MAX_AGE_DAYS = 30
+# Network timeouts in seconds, retries of failed requests and backoff bounds
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_FIRST_TOKEN_TIMEOUT = 120.0
+DEFAULT_TIMEOUT = 600.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5
+DEFAULT_RETRY_BACKOFF_MAX = 8.0
+# Hedged requests never fire sooner than this many seconds
+DEFAULT_HEDGE_MIN_DELAY = 1.0
+
+# Connection pool of the shared HTTP client: size and idle keep-alive in seconds
+DEFAULT_POOL_SIZE = 20
+DEFAULT_KEEPALIVE = 60.0
+
+# Cap on `ds -` / `ds --file` input and the input characters sent per request
+DEFAULT_INPUT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_INPUT_CHUNK_CHARS = 32000
+
+# Word lists for the spell-mode fast path (one word per line)
+DEFAULT_SPELL_WORDLIST = Path("/usr/share/dict/words")
+DEFAULT_SPELL_USER_DICT = _default_user_dictionary()
 
 # Color scheme configuration
 # Available schemes: 'dracula', 'monokai', 'default'
 DEFAULT_COLOR_SCHEME = "dracula"
 # Available non-code color styles: 'plain', 'dim', 'highlight'
 DEFAULT_NON_CODE_STYLE = "plain"
+DEFAULT_STREAM_BACKEND = "python"
 
 # Global configuration variables
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -42,6 +104,32 @@ SPINNER = None
 STREAM = None
 COLOR_SCHEME = None
 NON_CODE_STYLE = None
+STREAM_BACKEND = None
+SOCKET_PATH = None
+USE_DAEMON = None
+CACHE_ENABLED = None
+CACHE_DIR = None
+CACHE_MAX_BYTES = None
+CACHE_TTLS = None
+HISTORY_MAX_BYTES = None
+HISTORY_MAX_AGE = None
+TIMINGS = None
+CONNECT_TIMEOUT = None
+FIRST_TOKEN_TIMEOUT = None
+TIMEOUT = None
+MAX_RETRIES = None
+RETRY_BACKOFF = None
+RETRY_BACKOFF_MAX = None
+HEDGE_PERCENTILE = None
+HEDGE_MIN_DELAY = None
+POOL_SIZE = None
+KEEPALIVE = None
+HTTP2 = None
+INPUT_MAX_BYTES = None
+INPUT_CHUNK_CHARS = None
+SPELL_FAST_PATH = None
+SPELL_WORDLIST = None
+SPELL_USER_DICT = None
 
 
 def load_config(env=None):
@@ -52,6 +140,11 @@ def load_config(env=None):
         env (dict, optional): Environment variables to use for testing purposes.
     """
     global API_KEY, BASE_URL, MODEL, LOG_FILE, ENABLE_COLOR, SPINNER, STREAM, COLOR_SCHEME, NON_CODE_STYLE
+    global SOCKET_PATH, USE_DAEMON, CACHE_ENABLED, CACHE_DIR, CACHE_MAX_BYTES, CACHE_TTLS
+    global HISTORY_MAX_BYTES, HISTORY_MAX_AGE, TIMINGS
+    global CONNECT_TIMEOUT, FIRST_TOKEN_TIMEOUT, TIMEOUT, MAX_RETRIES, RETRY_BACKOFF, RETRY_BACKOFF_MAX
+    global HEDGE_PERCENTILE, HEDGE_MIN_DELAY, POOL_SIZE, KEEPALIVE, HTTP2, INPUT_MAX_BYTES, INPUT_CHUNK_CHARS
+    global SPELL_FAST_PATH, SPELL_WORDLIST, SPELL_USER_DICT, STREAM_BACKEND
     
     # Use provided environment or system environment
     env_vars = env if env is not None else os.environ
@@ -88,6 +181,60 @@ def load_config(env=None):
     
     # Load non-code style from environment
     NON_CODE_STYLE = env_vars.get("DEEPSEEK_NON_CODE_STYLE", DEFAULT_NON_CODE_STYLE)
+    # The Rust stream renderer is opt-in until it is built and tested in CI
+    STREAM_BACKEND = env_vars.get("DS_STREAM_BACKEND", DEFAULT_STREAM_BACKEND).lower()
+
+    # Load daemon socket path; front-ends use a running daemon unless DS_NO_DAEMON is set
+    socket_path = env_vars.get("DS_SOCKET")
+    SOCKET_PATH = Path(socket_path).expanduser() if socket_path else DEFAULT_SOCKET_PATH
+    USE_DAEMON = not bool(env_vars.get("DS_NO_DAEMON"))
+
+    # Load response cache settings (DS_CACHE_TTL_<MODE> overrides a mode's TTL)
+    CACHE_ENABLED = not bool(env_vars.get("DS_NO_CACHE"))
+    cache_dir = env_vars.get("DS_CACHE_DIR")
+    CACHE_DIR = Path(cache_dir).expanduser() if cache_dir else DEFAULT_CACHE_DIR
+    CACHE_MAX_BYTES = int(env_vars.get("DS_CACHE_MAX_BYTES", DEFAULT_CACHE_MAX_BYTES))
+    CACHE_TTLS = {
+        mode: int(env_vars.get(f"DS_CACHE_TTL_{mode.upper()}", ttl))
+        for mode, ttl in DEFAULT_CACHE_TTLS.items()
+    }
+
+    # Load chat history rotation bounds (a value of 0 disables that bound)
+    HISTORY_MAX_BYTES = int(env_vars.get("DS_HISTORY_MAX_BYTES", DEFAULT_HISTORY_MAX_BYTES))
+    HISTORY_MAX_AGE = float(env_vars.get("DS_HISTORY_MAX_AGE_DAYS", DEFAULT_HISTORY_MAX_AGE_DAYS)) * 24 * 3600
+
+    # Load per-phase timings report format ("text" or "json"); unset or "0" disables it
+    timings = env_vars.get("DS_TIMINGS", "").lower()
+    TIMINGS = None if timings in ("", "0", "false", "no", "off") else ("json" if timings == "json" else "text")
+
+    # Load timeouts and retry policy
+    CONNECT_TIMEOUT = float(env_vars.get("DS_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT))
+    FIRST_TOKEN_TIMEOUT = float(env_vars.get("DS_FIRST_TOKEN_TIMEOUT", DEFAULT_FIRST_TOKEN_TIMEOUT))
+    TIMEOUT = float(env_vars.get("DS_TIMEOUT", DEFAULT_TIMEOUT))
+    MAX_RETRIES = int(env_vars.get("DS_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    RETRY_BACKOFF = float(env_vars.get("DS_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF))
+    RETRY_BACKOFF_MAX = float(env_vars.get("DS_RETRY_BACKOFF_MAX", DEFAULT_RETRY_BACKOFF_MAX))
+
+    # Hedged requests are off unless DS_HEDGE_PERCENTILE (e.g. 95) is set
+    hedge = float(env_vars.get("DS_HEDGE_PERCENTILE", 0) or 0)
+    HEDGE_PERCENTILE = hedge if hedge > 0 else None
+    HEDGE_MIN_DELAY = float(env_vars.get("DS_HEDGE_MIN_DELAY", DEFAULT_HEDGE_MIN_DELAY))
+
+    # Load connection pool settings (HTTP/2 needs the optional h2 package)
+    POOL_SIZE = max(1, int(env_vars.get("DS_POOL_SIZE", DEFAULT_POOL_SIZE)))
+    KEEPALIVE = float(env_vars.get("DS_KEEPALIVE", DEFAULT_KEEPALIVE))
+    HTTP2 = bool(env_vars.get("DS_HTTP2"))
+
+    # Load streamed input limits
+    INPUT_MAX_BYTES = int(env_vars.get("DS_INPUT_MAX_BYTES", DEFAULT_INPUT_MAX_BYTES))
+    INPUT_CHUNK_CHARS = max(1, int(env_vars.get("DS_INPUT_CHUNK_CHARS", DEFAULT_INPUT_CHUNK_CHARS)))
+
+    # Load spell-mode fast path settings
+    SPELL_FAST_PATH = not bool(env_vars.get("DS_NO_SPELL_FAST_PATH"))
+    wordlist = env_vars.get("DS_SPELL_WORDLIST")
+    SPELL_WORDLIST = Path(wordlist).expanduser() if wordlist else DEFAULT_SPELL_WORDLIST
+    user_dict = env_vars.get("DS_SPELL_USER_DICT")
+    SPELL_USER_DICT = Path(user_dict).expanduser() if user_dict else DEFAULT_SPELL_USER_DICT
 
 
 # Load configuration on import
@@ -0,0 +1,333 @@
+"""
+Persistent ds daemon over a Unix domain socket.
+
+`ds serve` keeps one warm DeepSeekChat, and with it the OpenAI client's
+keep-alive connection pool, for the lifetime of the process. The `ds` and
+`ds-nvim` front-ends send requests to it when it is running, so a query costs
+one socket round trip instead of a new client and TLS handshake.
+
+Protocol: newline-delimited JSON. The client sends one request object
+({"query", "mode", "language", "stream", "model", "enable_color", "theme",
+"non_code_style", "params", "use_cache", "refresh", "timings", "render", "credentials"}); the daemon answers
+with zero or more {"chunk": text} lines while streaming (rendered unless "render" is false), then a
+single {"response": raw text, "timings"?: {...}} or {"error": message}. Rendering a whole response is
+left to the client, so pipes and editors never pay for it.
+
+"credentials" is a fingerprint of the client's API key and base URL. A daemon
+started with different ones answers {"refused": reason} instead of using its
+own, and the client falls back to a local chat.
+"""
+
+import hashlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, TextIO
+
+from . import config
+from .timings import Timings
+from .utils import format_error_message, format_info_message
+
+
+class _ChunkWriter:
+    """
+    File-like object that forwards streamed chunks to a daemon client.
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str) -> int:
+        _send(self.wfile, {"chunk": text})
+        return len(text)
+
+    def flush(self):
+        self.wfile.flush()
+
+
+def credentials_fingerprint(base_url: Optional[str], api_key: Optional[str]) -> str:
+    """
+    Return a digest identifying an (API endpoint, key) pair without revealing the key.
+    """
+    return hashlib.sha256(f"{base_url or ''}\0{api_key or ''}".encode("utf-8")).hexdigest()
+
+
+def _send(wfile, message: dict):
+    """
+    Write one protocol message as a JSON line.
+    """
+    wfile.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+    wfile.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serve a single chat request over a client connection.
+    """
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+            if request.get("credentials") != self.server.credentials:
+                _send(self.wfile, {"refused": "the daemon runs with a different API key or base URL"})
+                return
+            chat_instance = self.server.chat_for(request)
+            stream = bool(request.get("stream", True))
+            timings = Timings() if request.get("timings") else None
+            result = chat_instance.chat(
+                request["query"],
+                request.get("mode", "normal"),
+                request.get("language", "English"),
+                stream=stream,
+                output=_ChunkWriter(self.wfile) if stream else None,
+                use_cache=request.get("use_cache", True),
+                refresh=request.get("refresh", False),
+                timings=timings,
+                render=request.get("render", True),
+            )
+            reply = {"response": result.text}
+            if timings is not None:
+                reply["timings"] = timings.as_dict()
+            _send(self.wfile, reply)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away (e.g. Ctrl-C); nothing left to report
+            pass
+        except Exception as e:
+            try:
+                _send(self.wfile, {"error": str(e)})
+            except OSError:
+                pass
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded Unix socket server holding a warm DeepSeekChat.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, chat_instance):
+        """
+        Bind the server socket.
+
+        Args:
+            socket_path: Path of the Unix domain socket to listen on.
+            chat_instance: Warm DeepSeekChat whose client is shared by all requests.
+        """
+        self.socket_path = Path(socket_path)
+        self.chat = chat_instance
+        self.credentials = credentials_fingerprint(chat_instance.base_url, chat_instance.api_key)
+        # Bind under a restrictive umask so the socket is never connectable by
+        # other users, not even between bind() and the chmod below
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(str(self.socket_path), _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+
+    def chat_for(self, request: dict):
+        """
+        Build a per-request DeepSeekChat sharing the warm client.
+
+        Render options, model and sampling parameters come from the request,
+        so concurrent clients with different settings do not interfere with
+        each other. Request parameters override the daemon's own.
+        """
+        from .chat import DeepSeekChat
+
+        return DeepSeekChat(
+            api_key=self.chat.api_key,
+            base_url=self.chat.base_url,
+            model=request.get("model") or self.chat.model,
+            log_file=self.chat.log_file,
+            client=self.chat.client,
+            enable_color=request.get("enable_color"),
+            theme_name=request.get("theme"),
+            non_code_style=request.get("non_code_style"),
+            params={**self.chat.params, **(request.get("params") or {})},
+        )
+
+    def server_close(self):
+        super().server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _connect(socket_path: Path) -> Optional[socket.socket]:
+    """
+    Connect to the daemon socket, returning None if no daemon is listening.
+    """
+    if not socket_path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def is_running(socket_path: Path = None) -> bool:
+    """
+    Check whether a daemon is accepting connections.
+
+    Args:
+        socket_path: Daemon socket (defaults to config).
+
+    Returns:
+        True if a daemon answered the connection attempt.
+    """
+    sock = _connect(Path(socket_path or config.SOCKET_PATH))
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def daemon_chat(query: str, mode: str = "normal", language: str = "English", stream: bool = None,
+                output: TextIO = None, use_cache: bool = True, refresh: bool = False,
+                socket_path: Path = None, timings: Timings = None, render: bool = True,
+                params: Dict[str, Any] = None):
+    """
+    Send a query through a running daemon.
+
+    Args:
+        query: User query.
+        mode: Operation mode ("normal", "spell", "trans").
+        language: Target language for translation.
+        stream: Whether to stream the response (defaults to config).
+        output: Optional text stream that receives chunks while streaming.
+        use_cache: Whether the daemon may answer from the response cache.
+        refresh: Skip the cache lookup but store the fresh response.
+        socket_path: Daemon socket (defaults to config).
+        timings: Optional Timings that receives the phases measured by the daemon.
+        render: Whether streamed chunks are rendered (False streams raw text).
+        params: Extra sampling parameters (e.g. temperature) sent with the request.
+
+    Returns:
+        A ChatResult, or None if no daemon is running (or DS_NO_DAEMON is set)
+        or it runs with a different API key or base URL, in which case the
+        caller should fall back to a local DeepSeekChat.
+
+    Raises:
+        RuntimeError: If the daemon reports an error for this request.
+    """
+    if socket_path is None:
+        if not config.USE_DAEMON:
+            return None
+        socket_path = config.SOCKET_PATH
+    sock = _connect(Path(socket_path))
+    if sock is None:
+        return None
+
+    if stream is None:
+        stream = config.STREAM
+    request = {
+        "query": query,
+        "mode": mode,
+        "language": language,
+        "stream": bool(stream and output is not None),
+        "model": config.MODEL,
+        "enable_color": config.ENABLE_COLOR,
+        "theme": config.COLOR_SCHEME,
+        "non_code_style": config.NON_CODE_STYLE,
+        "params": params or {},
+        "use_cache": use_cache,
+        "refresh": refresh,
+        "timings": timings is not None,
+        "render": render,
+        "credentials": credentials_fingerprint(config.BASE_URL, config.API_KEY),
+    }
+    with sock, sock.makefile("rwb") as stream_file:
+        _send(stream_file, request)
+        for line in stream_file:
+            message = json.loads(line.decode("utf-8"))
+            if "chunk" in message:
+                output.write(message["chunk"])
+                output.flush()
+            elif "response" in message:
+                if timings is not None and "timings" in message:
+                    timings.merge(message["timings"])
+                from .chat import ChatResult
+                return ChatResult(message["response"], enable_color=config.ENABLE_COLOR,
+                                  theme_name=config.COLOR_SCHEME, non_code_style=config.NON_CODE_STYLE)
+            elif "error" in message:
+                raise RuntimeError(message["error"])
+            elif "refused" in message:
+                return None
+    raise RuntimeError("ds daemon closed the connection without a response")
+
+
+def _warm_up(chat_instance):
+    """
+    Open a connection to the API ahead of the first request.
+    """
+    try:
+        chat_instance.client.models.list()
+    except Exception:
+        pass
+
+
+def serve(socket_path: Path = None, warm_up: bool = True):
+    """
+    Run the daemon in the foreground until interrupted.
+
+    Args:
+        socket_path: Socket to listen on (defaults to config).
+        warm_up: Whether to open an API connection before the first request.
+    """
+    from .chat import DeepSeekChat
+
+    socket_path = Path(socket_path or config.SOCKET_PATH)
+    if is_running(socket_path):
+        raise RuntimeError(f"A ds daemon is already listening on {socket_path}")
+    socket_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    if socket_path.exists():
+        # Stale socket left by a daemon that did not shut down cleanly
+        socket_path.unlink()
+
+    # The daemon has no terminal of its own to draw a spinner on
+    config.SPINNER = False
+    chat_instance = DeepSeekChat()
+    if not chat_instance.api_key:
+        raise ValueError("API key is missing. Please set the DEEPSEEK_API_KEY environment variable.")
+    if warm_up:
+        threading.Thread(target=_warm_up, args=(chat_instance,), daemon=True).start()
+
+    server = DaemonServer(socket_path, chat_instance)
+    # Turn SIGTERM into a normal exit so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(format_info_message(f"ds daemon listening on {socket_path}", config.ENABLE_COLOR), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    """
+    Entry point for `ds serve`.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="ds serve", description="Run a persistent ds daemon on a Unix socket")
+    parser.add_argument("--socket", type=Path, help=f"Socket path (default: {config.SOCKET_PATH})")
+    parser.add_argument("--no-warmup", action="store_true", help="Do not pre-connect to the API on startup")
+    args = parser.parse_args(argv)
+
+    try:
+        serve(args.socket, warm_up=not args.no_warmup)
+    except Exception as e:
+        print(format_error_message("Error", str(e), config.ENABLE_COLOR), file=sys.stderr)
+        sys.exit(1)
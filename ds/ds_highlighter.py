@@ -6,18 +6,17 @@ from typing import Optional, Dict, List, Any
 _using_rust = False
 _using_python_fallback = False
 
-# 尝试导入Rust实现
+# 尝试导入Rust实现。整段高亮 highlight/highlight_code 使用Python实现，
+# Rust扩展只提供 strip_ansi 和流式渲染
 try:
     from ._ds_highlighter import strip_ansi_py as strip_ansi
-    from ._ds_highlighter import highlight_py as highlight
-    from ._ds_highlighter import highlight_code_py as highlight_code
     _using_rust = True
     _using_python_fallback = False
     # print("使用Rust实现的高亮器")
 except ImportError:
     # 如果Rust实现不可用，回退到Python实现
     try:
-        from .highlighter import strip_ansi, highlight, highlight_code
+        from .highlighter import strip_ansi
         _using_rust = False
         _using_python_fallback = True
         # print("使用Python实现的高亮器")
@@ -26,8 +25,74 @@ except ImportError:
         print(f"无法导入任何高亮器实现: {e}")
         raise
 
+from .highlighter import highlight, highlight_code
+
+# 流式渲染：Rust实现的StreamHighlighter在Rust端保存围栏状态，处理时释放GIL
+try:
+    from ._ds_highlighter import StreamHighlighter as _StreamHighlighter
+    from ._ds_highlighter import render_incremental_py as _render_incremental_rust
+    _using_rust_stream = True
+except ImportError:
+    _StreamHighlighter = None
+    _render_incremental_rust = None
+    _using_rust_stream = False
+
+from . import config
+from .highlighter import NON_CODE_STYLES, get_highlighter
+
+STREAM_BACKENDS = ("python", "rust")
+
+
+def _stream_backend(backend: Optional[str]) -> str:
+    """
+    选择流式渲染后端：默认使用Python，设置DS_STREAM_BACKEND=rust后使用Rust扩展。
+    """
+    if backend is None:
+        backend = config.STREAM_BACKEND or "python"
+    if backend not in STREAM_BACKENDS:
+        raise ValueError(f"Unknown stream backend: {backend!r} (expected one of {', '.join(STREAM_BACKENDS)})")
+    if backend == "rust" and not _using_rust_stream:
+        raise ImportError("The Rust stream backend is not available; build ds-highlighter with maturin")
+    return backend
+
+
+def _rust_args(enable_color: bool, theme_name: str, non_code_style: str) -> tuple:
+    # Python代码块由Rust高亮，其它语言交给Python的词法分析器注册表
+    highlighter = get_highlighter(theme_name, enable_color)
+    prefix = NON_CODE_STYLES.get(non_code_style, "") if enable_color else ""
+    return highlighter.theme_ansi, enable_color, prefix, highlighter.highlight_block
+
+
+def stream_renderer(enable_color: bool = True, theme_name: str = "dracula", non_code_style: str = "plain",
+                    backend: Optional[str] = None):
+    """
+    Return a renderer for one streamed response, with feed(), close() and pending().
+
+    Args:
+        enable_color: Whether to emit ANSI colours.
+        theme_name: Highlighting theme.
+        non_code_style: Style for non-code text (plain, dim, highlight).
+        backend: "rust", "python", or None for config.STREAM_BACKEND (DS_STREAM_BACKEND,
+            default "python").
+    """
+    if _stream_backend(backend) == "rust":
+        return _StreamHighlighter(*_rust_args(enable_color, theme_name, non_code_style))
+    return get_highlighter(theme_name, enable_color).stream_renderer(non_code_style)
+
+
+def render_incremental(content: str, buffer: str, enable_color: bool = True, theme_name: str = "dracula",
+                       non_code_style: str = "plain", backend: Optional[str] = None) -> tuple:
+    """
+    Render content incrementally; returns (rendered_content, updated_buffer).
+    """
+    if _stream_backend(backend) == "rust":
+        return _render_incremental_rust(content, buffer, *_rust_args(enable_color, theme_name, non_code_style))
+    return get_highlighter(theme_name, enable_color).render_incremental(content, buffer, non_code_style)
+
+
 # 导出这些函数
-__all__ = ['strip_ansi', 'highlight', 'highlight_code', '_using_rust', '_using_python_fallback']
+__all__ = ['strip_ansi', 'highlight', 'highlight_code', 'stream_renderer', 'render_incremental',
+           'STREAM_BACKENDS', '_using_rust', '_using_python_fallback', '_using_rust_stream']
 
 # 如果直接运行此文件，执行测试
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""
+Streaming parser for Markdown code fences.
+
+The parser is fed a response chunk by chunk and hands back the pieces that are
+complete: prose as soon as it arrives, and each fenced code block once its
+closing fence has been seen. Between calls it keeps only the body of the open
+block and at most two undecided backticks, and it never rescans text it has
+already classified, so parsing a whole response takes time linear in its
+length however the chunks are cut.
+
+Fences follow the rules the renderer has always used: three backticks open a
+block and the next three close it, whether or not they start a line. A single
+word after the opening fence, up to the end of that line, is the block's
+language tag.
+"""
+
+import re
+from typing import List, NamedTuple
+
+FENCE = "```"
+# A language tag: "python", "c++", "objective-c", "c#", "file.ext"
+LANGUAGE_RE = re.compile(r"[\w+#.-]+")
+
+_PROSE, _INFO, _CODE = range(3)
+
+
+class Block(NamedTuple):
+    """
+    A complete piece of a response.
+
+    Attributes:
+        content: Prose text, or the code between the fences (without the language tag).
+        is_code: Whether this is a fenced code block.
+        language: Language tag of a code block ("" if there is none).
+    """
+    content: str
+    is_code: bool
+    language: str = ""
+
+
+class FenceParser:
+    """
+    Incremental splitter of streamed Markdown into prose and fenced code blocks.
+    """
+
+    def __init__(self):
+        self._state = _PROSE
+        # Trailing backticks that may be the start of a fence split across chunks
+        self._carry = ""
+        # Text of the opening fence line while it is being read
+        self._info: List[str] = []
+        self._opening = ""
+        self._language = ""
+        self._code: List[str] = []
+
+    def feed(self, text: str) -> List[Block]:
+        """
+        Consume a chunk of the response.
+
+        Args:
+            text: Next chunk, of any length.
+
+        Returns:
+            The blocks completed by this chunk, in order.
+        """
+        data = self._carry + text if self._carry else text
+        self._carry = ""
+        blocks = []
+        pos = 0
+        while pos < len(data):
+            if self._state == _PROSE:
+                index = data.find(FENCE, pos)
+                if index == -1:
+                    end = max(len(data.rstrip("`")), len(data) - 2, pos)
+                    if end > pos:
+                        blocks.append(Block(data[pos:end], False))
+                    self._carry = data[end:]
+                    break
+                if index > pos:
+                    blocks.append(Block(data[pos:index], False))
+                self._state = _INFO
+                pos = index + len(FENCE)
+
+            elif self._state == _INFO:
+                newline = data.find("\n", pos)
+                index = data.find(FENCE, pos, newline if newline != -1 else len(data))
+                if index != -1:
+                    # Opened and closed on one line ("```x = 1```")
+                    self._info.append(data[pos:index])
+                    blocks.append(Block("".join(self._info), True))
+                    self._reset()
+                    pos = index + len(FENCE)
+                elif newline != -1:
+                    self._info.append(data[pos:newline])
+                    info = "".join(self._info)
+                    self._info = []
+                    self._opening = FENCE + info + "\n"
+                    if LANGUAGE_RE.fullmatch(info.strip()):
+                        self._language = info.strip()
+                    else:
+                        # Not a tag: the line is part of the code
+                        self._code.append(info + "\n")
+                    self._state = _CODE
+                    pos = newline + 1
+                else:
+                    end = max(len(data.rstrip("`")), len(data) - 2, pos)
+                    self._info.append(data[pos:end])
+                    self._carry = data[end:]
+                    break
+
+            else:
+                index = data.find(FENCE, pos)
+                if index == -1:
+                    end = max(len(data.rstrip("`")), len(data) - 2, pos)
+                    self._code.append(data[pos:end])
+                    self._carry = data[end:]
+                    break
+                self._code.append(data[pos:index])
+                blocks.append(Block("".join(self._code), True, self._language))
+                self._reset()
+                pos = index + len(FENCE)
+        return blocks
+
+    def pending(self) -> str:
+        """
+        Return the text received but not yet handed back, exactly as it was received.
+        """
+        if self._state == _PROSE:
+            return self._carry
+        if self._state == _INFO:
+            return FENCE + "".join(self._info) + self._carry
+        body = "".join(self._code)
+        if self._language:
+            body = self._opening + body
+        else:
+            body = FENCE + body
+        return body + self._carry
+
+    def close(self) -> List[Block]:
+        """
+        End the response and return what is left as prose.
+
+        An unterminated code block is returned verbatim, fence included, and
+        the parser is ready for a new response.
+        """
+        text = self.pending()
+        self._reset()
+        self._carry = ""
+        return [Block(text, False)] if text else []
+
+    def _reset(self):
+        self._state = _PROSE
+        self._info = []
+        self._opening = ""
+        self._language = ""
+        self._code = []
+
+
+def parse_fences(text: str) -> List[Block]:
+    """
+    Split a complete response into prose and fenced code blocks.
+    """
+    parser = FenceParser()
+    return parser.feed(text) + parser.close()
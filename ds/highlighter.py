@@ -1,9 +1,15 @@
+import os
 import re
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+from .fences import Block, FenceParser, parse_fences
+from .lexers import get_lexer, guess_language, resolve_language
 
 # Precompiled regular expressions for better performance
 ANSI_ESCAPE_RE = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
-CODE_BLOCK_RE = re.compile(r'(```python|```)(.*?)(```)', re.DOTALL)
+# A fenced block; group 1 is the language tag, when the opening line holds nothing else
+CODE_BLOCK_RE = re.compile(r'```(?:[ \t]*([\w+#.-]+)[ \t]*(?=\n))?(.*?)```', re.DOTALL)
 STRING_RE = re.compile(r'(".*?"|\'.*?\')', re.DOTALL)
 COMMENT_RE = re.compile(r'(#.*$)', re.MULTILINE)
 KEYWORD_RE = re.compile(r'\b(def|class|if|elif|else|for|while|try|except|finally|return|import|from|as|with|yield|raise|pass|break|continue|lambda|and|or|not|is|in|None|True|False)\b')
@@ -11,6 +17,32 @@ NUMBER_RE = re.compile(r'\b(\d+)\b')
 OPERATOR_RE = re.compile(r'([-+*/%=!<>^&|])')
 INDENT_RE = re.compile(r'^(\s+)', re.MULTILINE)
 
+# Single-pass Python tokenizer. Alternatives are tried in priority order at each
+# position, so every character belongs to at most one token and no pattern ever
+# sees escape codes inserted for an earlier token. Words are matched whole and
+# classified afterwards (keyword, call or plain name) to avoid backtracking, and
+# runs of plain names, whitespace and punctuation are skipped as a single match.
+TOKEN_RE = re.compile(
+    r'(?P<string>"[^"]*"|\'[^\']*\')'
+    r'|(?P<comment>#[^\n]*)'
+    r'|(?P<decorator>@\w+)'
+    r'|(?P<classdef>\bclass\b)(?P<classgap>\s+)(?P<classname>\w+)'
+    r'|\b(?P<number>\d+(?:\.\d+)?)\b'
+    r'|(?P<word>\w+)(?P<call>(?=\s*\())?'
+    r'|(?P<operator>[-+*/%=!<>^&|])'
+    r'|(?:[^\w"\'#@\-+*/%=!<>^&|]+|(?!\d|' + KEYWORD_RE.pattern + r')\w+\b(?!\s*\())+'
+)
+PYTHON_KEYWORDS = frozenset(KEYWORD_RE.pattern[3:-3].split("|"))
+
+# Token groups mapped to the theme colour used to render them
+TOKEN_STYLES = {
+    "string": "string",
+    "comment": "comment",
+    "decorator": "keyword",
+    "number": "number",
+    "operator": "operator",
+}
+
 # Theme definitions
 DRACULA_THEME = {
     "background": "#282a36",
@@ -75,6 +107,112 @@ COLORS = {
     "bold": "\033[1m"
 }
 
+# Basic 16-colour mapping, used when the terminal supports nothing richer
+BASIC_PALETTE = {
+    "string": COLORS["yellow"],  # yellow matches string colors in most themes
+    "comment": COLORS["magenta"],  # magenta matches comment colors in most themes
+    "keyword": COLORS["cyan"],  # cyan matches keyword colors in most themes
+    "function": COLORS["green"],  # green matches function colors in most themes
+    "number": COLORS["blue"],  # blue matches number colors in most themes
+    "operator": COLORS["red"],  # red matches operator colors in most themes
+    "class": COLORS["cyan"]
+}
+
+# The terminal's own foreground colour
+DEFAULT_FOREGROUND = "\033[39m"
+
+# Levels of the xterm 256-colour 6x6x6 cube
+_CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+
+def _hex_to_rgb(value: str) -> Tuple[int, int, int]:
+    """
+    Convert a "#rrggbb" colour to an (r, g, b) tuple.
+    """
+    value = value.lstrip("#")
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
+def _truecolor_escape(value: str) -> str:
+    """
+    Build a 24-bit foreground escape for a hex colour.
+    """
+    r, g, b = _hex_to_rgb(value)
+    return f"\033[38;2;{r};{g};{b}m"
+
+
+def _xterm256_escape(value: str) -> str:
+    """
+    Build a 256-colour foreground escape for the closest xterm palette entry.
+    """
+    rgb = _hex_to_rgb(value)
+
+    # Nearest entry in the colour cube (indices 16-231)
+    cube = [min(range(6), key=lambda i: abs(_CUBE_LEVELS[i] - c)) for c in rgb]
+    cube_rgb = [_CUBE_LEVELS[i] for i in cube]
+    cube_index = 16 + 36 * cube[0] + 6 * cube[1] + cube[2]
+
+    # Nearest entry on the grayscale ramp (indices 232-255)
+    gray_step = min(23, max(0, round((sum(rgb) / 3 - 8) / 10)))
+    gray_level = 8 + 10 * gray_step
+
+    def distance(candidate):
+        return sum((a - b) ** 2 for a, b in zip(rgb, candidate))
+
+    if distance((gray_level,) * 3) < distance(cube_rgb):
+        return f"\033[38;5;{232 + gray_step}m"
+    return f"\033[38;5;{cube_index}m"
+
+
+def _build_palettes(theme: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+    """
+    Precompute the escape strings for every token type of a theme at each colour depth.
+
+    Tokens drawn in the theme's foreground colour use the terminal's default
+    foreground instead: the theme's foreground only reads against the theme's
+    own background, which the terminal does not share (the default theme's
+    black would be invisible on a dark terminal).
+    """
+    def escapes(build):
+        return {
+            token: DEFAULT_FOREGROUND if theme[token] == theme["foreground"] else build(theme[token])
+            for token in BASIC_PALETTE
+        }
+
+    return {
+        "truecolor": escapes(_truecolor_escape),
+        "256": escapes(_xterm256_escape),
+        "basic": BASIC_PALETTE
+    }
+
+
+# Escape tables per theme and colour depth, built once at import
+THEME_PALETTES = {name: _build_palettes(theme) for name, theme in THEMES.items()}
+
+
+def detect_color_depth(env=None) -> str:
+    """
+    Detect the colour depth supported by the terminal.
+    
+    Args:
+        env (dict, optional): Environment variables to inspect (defaults to os.environ).
+        
+    Returns:
+        "truecolor", "256" or "basic".
+    """
+    env_vars = env if env is not None else os.environ
+    forced = env_vars.get("DS_COLOR_DEPTH", "").lower()
+    if forced in THEME_PALETTES["dracula"]:
+        return forced
+    if env_vars.get("COLORTERM", "").lower() in ("truecolor", "24bit"):
+        return "truecolor"
+    if "256color" in env_vars.get("TERM", ""):
+        return "256"
+    return "basic"
+
+
+COLOR_DEPTH = detect_color_depth()
+
 # Non-code style configurations
 NON_CODE_STYLES = {
     "plain": "",  # No special formatting
@@ -88,27 +226,22 @@ class SyntaxHighlighter:
     Syntax highlighter for Python code with ANSI color support.
     """
     
-    def __init__(self, theme_name: str = "dracula", enable_color: bool = True):
+    def __init__(self, theme_name: str = "dracula", enable_color: bool = True, color_depth: str = None):
         """
         Initialize the syntax highlighter with a specific theme.
         
         Args:
             theme_name: Theme to use for syntax highlighting (dracula, monokai, default).
             enable_color: Whether to enable ANSI color codes.
+            color_depth: "truecolor", "256" or "basic"; detected from the terminal if omitted.
         """
         self.theme_name = theme_name
         self.enable_color = enable_color
         self.theme = THEMES.get(theme_name.lower(), DRACULA_THEME)
         
-        # Map theme colors to ANSI codes
-        self.theme_ansi = {
-            "string": COLORS["yellow"],  # yellow matches string colors in most themes
-            "comment": COLORS["magenta"],  # magenta matches comment colors in most themes
-            "keyword": COLORS["cyan"],  # cyan matches keyword colors in most themes
-            "function": COLORS["green"],  # green matches function colors in most themes
-            "number": COLORS["blue"],  # blue matches number colors in most themes
-            "operator": COLORS["red"]  # red matches operator colors in most themes
-        }
+        # Map theme colors to precomputed ANSI codes
+        palettes = THEME_PALETTES.get(theme_name.lower(), THEME_PALETTES["dracula"])
+        self.theme_ansi = palettes.get(color_depth or COLOR_DEPTH, BASIC_PALETTE)
     
     def strip_ansi(self, text: str) -> str:
         """
@@ -140,7 +273,7 @@ class SyntaxHighlighter:
             if match.start() > last_idx:
                 blocks.append((text[last_idx:match.start()], False))
             
-            # Add the code block content (without the triple backticks)
+            # Add the code block content (without the fences and language tag)
             code_content = match.group(2)
             blocks.append((code_content.strip(), True))
             
@@ -165,41 +298,70 @@ class SyntaxHighlighter:
         if not self.enable_color:
             return code
         
-        highlighted_code = code
-        
-        # Apply highlighting in order of priority
-        # 1. Strings (highest priority to prevent other patterns from matching inside strings)
-        highlighted_code = STRING_RE.sub(lambda m: f"{self.theme_ansi['string']}{m.group(1)}{COLORS['reset']}", highlighted_code)
-        
-        # 2. Comments
-        highlighted_code = COMMENT_RE.sub(lambda m: f"{self.theme_ansi['comment']}{m.group(1)}{COLORS['reset']}", highlighted_code)
-        
-        # 3. Decorators
-        highlighted_code = re.sub(r'@\w+', lambda m: f"{self.theme_ansi['keyword']}{m.group(0)}{COLORS['reset']}", highlighted_code)
-        
-        # 4. Classes
-        highlighted_code = re.sub(r'class\s+(\w+)', lambda m: f"class {self.theme_ansi['keyword']}{m.group(1)}{COLORS['reset']}", highlighted_code)
-        
-        # 5. Keywords
-        highlighted_code = KEYWORD_RE.sub(lambda m: f"{self.theme_ansi['keyword']}{m.group(1)}{COLORS['reset']}", highlighted_code)
-        
-        # 6. Function calls
-        highlighted_code = re.sub(r'\b(\w+)\s*\(', lambda m: f"{self.theme_ansi['function']}{m.group(1)}{COLORS['reset']}(", highlighted_code)
-        
-        # 7. Numbers
-        highlighted_code = re.sub(r'\b(\d+(\.\d+)?)\b', lambda m: f"{self.theme_ansi['number']}{m.group(1)}{COLORS['reset']}", highlighted_code)
-        
-        # 8. Operators
-        highlighted_code = OPERATOR_RE.sub(lambda m: f"{self.theme_ansi['operator']}{m.group(1)}{COLORS['reset']}", highlighted_code)
-        
-        return highlighted_code
+        theme_ansi = self.theme_ansi
+        keyword_color = theme_ansi["keyword"]
+        function_color = theme_ansi["function"]
+        reset = COLORS["reset"]
+        parts = []
+        append = parts.append
+        last_idx = 0
+
+        # One left-to-right scan; each span is written exactly once
+        for match in TOKEN_RE.finditer(code):
+            kind = match.lastgroup
+            if kind is None:
+                continue
+            if kind == "word" or kind == "call":
+                word = match.group("word")
+                if word in PYTHON_KEYWORDS:
+                    color = keyword_color
+                elif kind == "call":
+                    color = function_color
+                else:
+                    continue
+                token = word
+            elif kind == "classname":
+                token = f"class{reset}{match.group('classgap')}{keyword_color}{match.group('classname')}"
+                color = keyword_color
+            else:
+                token = match.group(kind)
+                color = theme_ansi[TOKEN_STYLES[kind]]
+            start = match.start()
+            if start > last_idx:
+                append(code[last_idx:start])
+            append(f"{color}{token}{reset}")
+            last_idx = match.end()
+
+        parts.append(code[last_idx:])
+        return "".join(parts)
     
+    def highlight_block(self, code: str, language: str = "") -> str:
+        """
+        Highlight a fenced code block with the lexer for its language.
+
+        Args:
+            code: Code block content.
+            language: Fence language tag; untagged blocks are guessed from the code.
+
+        Returns:
+            Highlighted code, or the code unchanged for languages without a lexer.
+        """
+        if not self.enable_color:
+            return code
+        name = resolve_language(language) if language else guess_language(code)
+        if name == "python":
+            return self.apply_syntax_highlighting(code)
+        lexer = get_lexer(name) if name else None
+        if lexer is None:
+            return code
+        return lexer.highlight(code, self.theme_ansi)
+
     def render_content(self, content: str, non_code_style: str = "plain") -> str:
         """
-        Render content with syntax highlighting for Python code blocks.
+        Render content with syntax highlighting for fenced code blocks.
         
         Args:
-            content: Content string that may contain Python code blocks.
+            content: Content string that may contain fenced code blocks.
             non_code_style: Style for non-code text (plain, dim, highlight).
             
         Returns:
@@ -207,25 +369,7 @@ class SyntaxHighlighter:
         """
         # Check if content contains code blocks with triple backticks
         if '```' in content:
-            blocks = self.split_blocks(content)
-            rendered_blocks = []
-            
-            # Get non-code style
-            style_code = NON_CODE_STYLES.get(non_code_style, "")
-            
-            for block, is_code in blocks:
-                if is_code:
-                    highlighted_code = self.apply_syntax_highlighting(block)
-                    # Remove code block markers and add blank lines
-                    rendered_blocks.append(f"\n{highlighted_code}\n")
-                else:
-                    # Apply style to non-code text
-                    if self.enable_color and style_code:
-                        rendered_blocks.append(f"{style_code}{block}{COLORS['reset']}")
-                    else:
-                        rendered_blocks.append(block)
-            
-            return "".join(rendered_blocks)
+            return self.render_blocks(parse_fences(content), non_code_style)
         else:
             # Check if the content looks like Python code (contains def, class, import, etc.)
             code_patterns = [r'def\s+\w+\s*\(', r'class\s+\w+', r'import\s+\w+', r'from\s+\w+\s+import']
@@ -242,9 +386,47 @@ class SyntaxHighlighter:
                 else:
                     return content
     
+    def render_blocks(self, blocks: Sequence[Block], non_code_style: str = "plain") -> str:
+        """
+        Render blocks from a FenceParser.
+
+        Args:
+            blocks: Complete prose and code blocks.
+            non_code_style: Style for non-code text (plain, dim, highlight).
+
+        Returns:
+            Rendered text, with code blocks highlighted and set off by line breaks.
+        """
+        style_code = NON_CODE_STYLES.get(non_code_style, "") if self.enable_color else ""
+        if len(blocks) == 1 and not blocks[0].is_code and not style_code:
+            # The common streaming case: one piece of plain prose
+            return blocks[0].content
+        reset = COLORS["reset"]
+        parts = []
+        for block in blocks:
+            if block.is_code:
+                parts.append(f"\n{self.highlight_block(block.content.strip(), block.language)}\n")
+            elif style_code:
+                parts.append(f"{style_code}{block.content}{reset}")
+            else:
+                parts.append(block.content)
+        return "".join(parts)
+
+    def stream_renderer(self, non_code_style: str = "plain") -> "StreamRenderer":
+        """
+        Return a renderer for one streamed response.
+
+        Args:
+            non_code_style: Style for non-code text (plain, dim, highlight).
+        """
+        return StreamRenderer(self, non_code_style)
+
     def render_incremental(self, content: str, buffer: str, non_code_style: str = "plain") -> tuple:
         """
         Render content incrementally, handling incomplete code blocks.
+
+        The buffer is parsed again on every call; streaming callers should keep
+        a stream_renderer() instead, which never rescans what it has seen.
         
         Args:
             content: New content received in the stream.
@@ -256,47 +438,59 @@ class SyntaxHighlighter:
             rendered_content: Content that can be safely rendered immediately.
             updated_buffer: Remaining buffer that may contain incomplete code blocks.
         """
-        # Add new content to buffer
-        buffer += content
-        
-        rendered = ""
-        
-        # Get non-code style
-        style_code = NON_CODE_STYLES.get(non_code_style, "")
-        
-        # Check if we have any code blocks
-        while True:
-            code_start = buffer.find("```")
-            if code_start == -1:
-                # No more code blocks - render remaining content as non-code
-                if buffer:
-                    if self.enable_color and style_code:
-                        rendered += f"{style_code}{buffer}{COLORS['reset']}"
-                    else:
-                        rendered += buffer
-                    buffer = ""
-                break
-            
-            # Render text before the code block
-            if code_start > 0:
-                if self.enable_color and style_code:
-                    rendered += f"{style_code}{buffer[:code_start]}{COLORS['reset']}"
-                else:
-                    rendered += buffer[:code_start]
-                buffer = buffer[code_start:]
-            
-            # Look for the end of this code block
-            code_end = buffer.find("```", 3)
-            if code_end == -1:
-                # Incomplete code block - can't render yet
-                break
-            
-            # Complete code block found
-            code_block = buffer[:code_end + 3]
-            rendered += self.render_content(code_block, non_code_style)
-            buffer = buffer[code_end + 3:]
-        
-        return rendered, buffer
+        parser = FenceParser()
+        rendered = self.render_blocks(parser.feed(buffer + content), non_code_style)
+        return rendered, parser.pending()
+
+
+class StreamRenderer:
+    """
+    Renders one streamed response chunk by chunk in linear time.
+
+    Prose is rendered as soon as it arrives; a code block is rendered whole
+    once its closing fence has been received.
+    """
+
+    def __init__(self, highlighter: SyntaxHighlighter, non_code_style: str = "plain"):
+        """
+        Initialize the renderer.
+
+        Args:
+            highlighter: Highlighter that renders the completed blocks.
+            non_code_style: Style for non-code text (plain, dim, highlight).
+        """
+        self.highlighter = highlighter
+        self.non_code_style = non_code_style
+        self.parser = FenceParser()
+
+    def feed(self, content: str) -> str:
+        """
+        Consume a chunk and return whatever can be displayed now.
+        """
+        return self.highlighter.render_blocks(self.parser.feed(content), self.non_code_style)
+
+    def close(self) -> str:
+        """
+        End the response, returning an unterminated code block or held-back backticks as prose.
+        """
+        return self.highlighter.render_blocks(self.parser.close(), self.non_code_style)
+
+    def pending(self) -> str:
+        """
+        Return the text received but not yet displayed, exactly as it was received.
+        """
+        return self.parser.pending()
+
+
+@lru_cache(maxsize=None)
+def get_highlighter(theme_name: str = "dracula", enable_color: bool = True) -> SyntaxHighlighter:
+    """
+    Return a shared SyntaxHighlighter for the given theme and colour setting.
+    
+    Highlighters hold no per-call state, so one instance per (theme, enable_color)
+    is reused by every module-level helper.
+    """
+    return SyntaxHighlighter(theme_name, enable_color)
 
 
 # Backward compatible functions for existing code
@@ -304,38 +498,42 @@ def strip_ansi(text: str) -> str:
     """
     Remove ANSI escape sequences from text for cleaner output.
     """
-    return SyntaxHighlighter().strip_ansi(text)
+    return ANSI_ESCAPE_RE.sub('', text)
 
 
 def split_blocks(text: str) -> List[Tuple[str, bool]]:
     """
     Split text into code blocks and non-code blocks for syntax highlighting.
     """
-    return SyntaxHighlighter().split_blocks(text)
+    return get_highlighter().split_blocks(text)
 
 
 def apply_syntax_highlighting(code: str, enable_color: bool = True, theme_name: str = "dracula") -> str:
     """
     Apply syntax highlighting to Python code using ANSI escape codes.
     """
-    highlighter = SyntaxHighlighter(theme_name, enable_color)
-    return highlighter.apply_syntax_highlighting(code)
+    return get_highlighter(theme_name, enable_color).apply_syntax_highlighting(code)
 
 
 def render_content(content: str, enable_color: bool = True, theme_name: str = "dracula", non_code_style: str = "plain") -> str:
     """
     Render content with syntax highlighting for Python code blocks.
     """
-    highlighter = SyntaxHighlighter(theme_name, enable_color)
-    return highlighter.render_content(content, non_code_style)
+    return get_highlighter(theme_name, enable_color).render_content(content, non_code_style)
 
 
 def render_incremental(content: str, buffer: str, enable_color: bool = True, theme_name: str = "dracula", non_code_style: str = "plain") -> tuple:
     """
     Render content incrementally, handling incomplete code blocks.
     """
-    highlighter = SyntaxHighlighter(theme_name, enable_color)
-    return highlighter.render_incremental(content, buffer, non_code_style)
+    return get_highlighter(theme_name, enable_color).render_incremental(content, buffer, non_code_style)
+
+
+def stream_renderer(enable_color: bool = True, theme_name: str = "dracula", non_code_style: str = "plain") -> StreamRenderer:
+    """
+    Return a StreamRenderer for one streamed response.
+    """
+    return get_highlighter(theme_name, enable_color).stream_renderer(non_code_style)
 
 
 # Aliases for backward compatibility with ds_highlighter.py
@@ -343,13 +541,11 @@ def highlight(content: str, theme_name: str = "dracula", enable_color: bool = Tr
     """
     Alias for render_content for backward compatibility.
     """
-    highlighter = SyntaxHighlighter(theme_name, enable_color)
-    return highlighter.render_content(content)
+    return get_highlighter(theme_name, enable_color).render_content(content)
 
 
 def highlight_code(code: str, theme_name: str = "dracula", enable_color: bool = True) -> str:
     """
     Alias for apply_syntax_highlighting for backward compatibility.
     """
-    highlighter = SyntaxHighlighter(theme_name, enable_color)
-    return highlighter.apply_syntax_highlighting(code)
+    return get_highlighter(theme_name, enable_color).apply_syntax_highlighting(code)
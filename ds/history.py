@@ -0,0 +1,484 @@
+"""
+Buffered chat history writer with rotation and compression.
+
+Chat history is an append-only JSONL file. Entries are handed to a background
+thread through a bounded queue, so logging never blocks the response path on
+disk I/O, and pending entries are flushed when the process exits. Appends and
+rotation happen under a file lock shared by every ds process writing the same
+history. Once the active file exceeds its size or age bound it is sealed as
+``<name>.<YYYYmmdd-HHMMSS>.jsonl`` and compressed to ``.jsonl.gz``.
+"""
+
+import atexit
+import gzip
+import json
+import mmap
+import os
+import queue
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import config
+from .highlighter import COLORS, render_content
+from .utils import file_lock, format_error_message
+
+# Entries buffered before append() blocks the caller
+DEFAULT_QUEUE_SIZE = 1024
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_STOP = object()
+
+
+def list_segments(path: Path) -> List[Path]:
+    """
+    List the sealed segments of a history file, oldest first.
+
+    Args:
+        path: Path of the active history file.
+
+    Returns:
+        Sealed segment paths (compressed or not yet compressed), ordered by the
+        time they were sealed. The active file itself is not included.
+    """
+    path = Path(path)
+    pattern = re.compile(re.escape(path.stem) + r"\.(\d{8}-\d{6})(?:-(\d+))?" + re.escape(path.suffix) + r"(\.gz)?$")
+    segments = {}
+    if path.parent.is_dir():
+        for entry in os.scandir(path.parent):
+            match = pattern.match(entry.name)
+            if match:
+                order = (match.group(1), int(match.group(2) or 0))
+                # Prefer the compressed copy if a crash left both behind
+                if order not in segments or match.group(3):
+                    segments[order] = Path(entry.path)
+    return [segments[order] for order in sorted(segments)]
+
+
+def open_segment(path: Path):
+    """
+    Open a history file or sealed segment for binary reading, decompressing if needed.
+
+    Args:
+        path: Active history file or segment from list_segments.
+    """
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _first_timestamp(path: Path) -> Optional[float]:
+    """
+    Return the timestamp of the first entry in a history file as epoch seconds.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            first = json.loads(f.readline())
+        return time.mktime(time.strptime(first["timestamp"], TIMESTAMP_FORMAT))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _compress(segment: Path):
+    """
+    Gzip a sealed segment and remove the uncompressed copy.
+    """
+    target = segment.with_name(segment.name + ".gz")
+    tmp = segment.with_name(f".{segment.name}.gz.{os.getpid()}.tmp")
+    try:
+        with open(segment, "rb") as src, gzip.open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, target)
+        segment.unlink()
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+class HistoryWriter:
+    """
+    Append chat history entries from a background thread.
+    """
+
+    def __init__(self, path: Path, max_bytes: int = config.DEFAULT_HISTORY_MAX_BYTES,
+                 max_age: float = config.DEFAULT_HISTORY_MAX_AGE_DAYS * 24 * 3600,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Initialize the writer.
+
+        Args:
+            path: Path of the active history file.
+            max_bytes: Size above which the active file is sealed (0 disables).
+            max_age: Age in seconds of the oldest entry above which the active file is sealed (0 disables).
+            queue_size: Entries buffered before append() blocks.
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.queue_size = queue_size
+        self._lock_file = self.path.with_name(self.path.name + ".lock")
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._segment_start = (None, None)  # (inode, first entry timestamp) of the active file
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        # A forked child inherits the queue but not the thread, so start afresh
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="ds-history", daemon=True)
+            self._thread.start()
+
+    def append(self, entry: Dict[str, Any]):
+        """
+        Queue an entry for writing.
+
+        The entry is serialized immediately, so later changes to it are not
+        recorded. Blocks only if the queue is full.
+
+        Args:
+            entry: JSON-serializable history entry.
+        """
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        self._ensure_started()
+        self._queue.put(line)
+
+    def flush(self):
+        """
+        Block until every queued entry has been written.
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self, timeout: float = 5.0):
+        """
+        Write pending entries and stop the background thread.
+
+        Args:
+            timeout: Maximum time in seconds to wait for pending writes.
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Coalesce whatever else is queued into one locked append
+            while batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [line for line in batch if line is not _STOP]
+            if lines:
+                try:
+                    self._write(lines)
+                except Exception as e:
+                    error_msg = format_error_message("Logging Error", f"Failed to log chat history: {e}", config.ENABLE_COLOR)
+                    print(error_msg, file=sys.stderr)
+            for _ in batch:
+                self._queue.task_done()
+            if batch[-1] is _STOP:
+                return
+
+    def _write(self, lines: List[str]):
+        sealed = None
+        with file_lock(self._lock_file):
+            if self._should_rotate():
+                sealed = self._seal()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        # Compress outside the lock so other writers are not held up
+        if sealed is not None:
+            _compress(sealed)
+
+    def _should_rotate(self) -> bool:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return False
+        if st.st_size == 0:
+            return False
+        if self.max_bytes and st.st_size >= self.max_bytes:
+            return True
+        if self.max_age:
+            inode, started = self._segment_start
+            if inode != st.st_ino:
+                started = _first_timestamp(self.path)
+                self._segment_start = (st.st_ino, started)
+            if started is not None and time.time() - started >= self.max_age:
+                return True
+        return False
+
+    def _seal(self) -> Path:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        sealed = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        counter = 1
+        while sealed.exists() or sealed.with_name(sealed.name + ".gz").exists():
+            sealed = self.path.with_name(f"{self.path.stem}.{stamp}-{counter}{self.path.suffix}")
+            counter += 1
+        os.rename(self.path, sealed)
+        return sealed
+
+
+_writers: Dict[Path, HistoryWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_history_writer(path: Path) -> HistoryWriter:
+    """
+    Return the process-wide writer for a history file.
+
+    Args:
+        path: Path of the active history file.
+    """
+    path = Path(path)
+    with _writers_lock:
+        if path not in _writers:
+            _writers[path] = HistoryWriter(path, config.HISTORY_MAX_BYTES, config.HISTORY_MAX_AGE)
+        return _writers[path]
+
+
+def flush_history():
+    """
+    Block until every queued history entry in this process has been written.
+    """
+    for writer in list(_writers.values()):
+        writer.flush()
+
+
+def iter_entries(log_file: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Yield history entries oldest first, starting with the oldest rotated segment.
+
+    Lines are decoded one at a time, so memory use does not depend on the size
+    of the history. Malformed lines are skipped.
+
+    Args:
+        log_file: Path of the active history file.
+    """
+    log_file = Path(log_file)
+    sources = list_segments(log_file) + ([log_file] if log_file.exists() else [])
+    for source in sources:
+        with open_segment(source) as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict):
+                    yield entry
+
+
+def entry_query(entry: Dict[str, Any]) -> str:
+    """
+    Return the user side of a history entry, without the system prompt.
+    """
+    messages = entry.get("messages") or []
+    return "\n".join(m.get("content", "") for m in messages if isinstance(m, dict) and m.get("role") == "user")
+
+
+def _reverse_lines(buf) -> Iterator[bytes]:
+    """
+    Yield the complete lines of a buffer from last to first.
+    """
+    end = len(buf)
+    if end and buf[end - 1:end] != b"\n":
+        # Skip a line still being written
+        end = buf.rfind(b"\n", 0, end) + 1
+    while end > 0:
+        start = buf.rfind(b"\n", 0, end - 1) + 1
+        yield buf[start:end]
+        end = start
+
+
+def reverse_lines(path: Path) -> Iterator[bytes]:
+    """
+    Yield the lines of a history file or segment from last to first.
+
+    Plain files are memory-mapped and scanned backwards for newlines, so only
+    the pages holding the lines actually consumed are read. Compressed segments
+    cannot be read backwards and are first inflated into an anonymous temporary
+    file, which is then mapped the same way.
+
+    Args:
+        path: Active history file or segment from list_segments.
+    """
+    path = Path(path)
+    with open_segment(path) as src:
+        if path.suffix == ".gz":
+            f = tempfile.TemporaryFile()
+            shutil.copyfileobj(src, f)
+            f.flush()
+        else:
+            f = src
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                yield from _reverse_lines(buf)
+        finally:
+            if f is not src:
+                f.close()
+
+
+def iter_recent(log_file: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Yield history entries newest first, continuing into rotated segments.
+
+    Only the lines consumed are decoded, so taking the first N entries costs
+    the same whatever the size of the history.
+
+    Args:
+        log_file: Path of the active history file.
+    """
+    log_file = Path(log_file)
+    sources = ([log_file] if log_file.exists() else []) + list_segments(log_file)[::-1]
+    for source in sources:
+        for line in reverse_lines(source):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                yield entry
+
+
+def recent_entries(log_file: Path, count: int) -> List[Dict[str, Any]]:
+    """
+    Return the most recent history entries, newest first.
+
+    Args:
+        log_file: Path of the active history file.
+        count: Maximum number of entries.
+    """
+    entries = []
+    if count <= 0:
+        return entries
+    for entry in iter_recent(log_file):
+        entries.append(entry)
+        if len(entries) == count:
+            break
+    return entries
+
+
+def _one_line(text: str, width: int = 160) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def _summary(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "timestamp": entry.get("timestamp"),
+        "model": entry.get("model"),
+        "mode": entry.get("mode"),
+        "query": entry_query(entry),
+        "response": entry.get("response") or "",
+    }
+
+
+def _header(entry: Dict[str, Any], use_color: bool) -> str:
+    header = f"{entry.get('timestamp') or '-'}  {entry.get('model') or '-'}  {entry.get('mode') or '-'}"
+    return f"{COLORS['dim']}{header}{COLORS['reset']}" if use_color else header
+
+
+def _print_entries(entries, as_json: bool):
+    use_color = config.ENABLE_COLOR and sys.stdout.isatty()
+    for entry in entries:
+        if as_json:
+            print(json.dumps(entry, ensure_ascii=False))
+            continue
+        print(_header(entry, use_color))
+        print(f"  > {_one_line(entry['query'])}")
+        print(f"  {_one_line(entry['response'])}")
+
+
+def _show_entry(entry: Dict[str, Any], as_json: bool):
+    if as_json:
+        print(json.dumps(entry, ensure_ascii=False))
+        return
+
+    use_color = config.ENABLE_COLOR and sys.stdout.isatty()
+    print(_header(entry, use_color))
+    print(f"> {entry_query(entry)}")
+    print()
+    print(render_content(entry.get("response") or "", enable_color=use_color, theme_name=config.COLOR_SCHEME,
+                         non_code_style=config.NON_CODE_STYLE))
+
+
+def main(argv=None):
+    """
+    Entry point for `ds history search|last|show`.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="ds history", description="Browse and search the chat history")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="Full-text search over queries and responses")
+    search.add_argument("text", nargs="*", help="Terms that must all appear (case-insensitive substrings)")
+    search.add_argument("--model", help="Only entries from this model")
+    search.add_argument("--mode", choices=["normal", "spell", "trans"], help="Only entries from this mode")
+    search.add_argument("--since", metavar="YYYY-MM-DD", help="Only entries on or after this date")
+    search.add_argument("--until", metavar="YYYY-MM-DD", help="Only entries on or before this date")
+    search.add_argument("-n", "--limit", type=int, default=20, help="Maximum number of results (default: 20)")
+    search.add_argument("--json", action="store_true", help="Print one JSON object per result")
+
+    last = commands.add_parser("last", help="List the most recent exchanges, newest first")
+    last.add_argument("count", nargs="?", type=int, default=10, help="Number of exchanges (default: 10)")
+    last.add_argument("--json", action="store_true", help="Print one JSON object per exchange")
+
+    show = commands.add_parser("show", help="Show one exchange in full")
+    show.add_argument("index", nargs="?", type=int, default=1, help="Which exchange, counting back from the newest (default: 1)")
+    show.add_argument("--json", action="store_true", help="Print the raw log entry")
+    args = parser.parse_args(argv)
+
+    # Entries this process may still have queued belong in the results
+    flush_history()
+
+    if args.command == "last":
+        _print_entries([_summary(entry) for entry in recent_entries(config.LOG_FILE, args.count)], args.json)
+        return
+
+    if args.command == "show":
+        entries = recent_entries(config.LOG_FILE, args.index) if args.index > 0 else []
+        if len(entries) < max(args.index, 1):
+            print(format_error_message("Error", f"No history entry #{args.index}", config.ENABLE_COLOR), file=sys.stderr)
+            sys.exit(1)
+        _show_entry(entries[-1], args.json)
+        return
+
+    from .history_index import HistoryIndex
+
+    index = HistoryIndex(config.LOG_FILE)
+    try:
+        entries = index.search(" ".join(args.text), model=args.model, mode=args.mode,
+                               since=args.since, until=args.until, limit=args.limit)
+    except ValueError as e:
+        print(format_error_message("Error", str(e), config.ENABLE_COLOR), file=sys.stderr)
+        sys.exit(1)
+    finally:
+        index.close()
+    _print_entries(entries, args.json)
@@ -0,0 +1,215 @@
+"""
+Incremental full-text index over the chat history.
+
+The index is a SQLite database (FTS5 with the trigram tokenizer, so substring
+search works for any script) kept in the cache directory. Each history file
+is identified by a fingerprint of its first line, which survives rotation and
+compression, together with the number of bytes already indexed; an update
+only reads lines appended since the previous one, so searching stays fast
+however large the history grows. The index is derived data and can be deleted
+at any time.
+"""
+
+import datetime
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List
+
+from . import config
+from .history import entry_query, list_segments, open_segment
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (fingerprint TEXT PRIMARY KEY, indexed_bytes INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS sealed (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS meta (
+    rowid INTEGER PRIMARY KEY,
+    timestamp TEXT,
+    model TEXT,
+    mode TEXT
+);
+CREATE INDEX IF NOT EXISTS meta_timestamp ON meta (timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries USING fts5(query, response, tokenize = 'trigram');
+"""
+
+# Terms shorter than a trigram cannot use the index and are matched with LIKE
+MIN_INDEXED_TERM = 3
+DEFAULT_LIMIT = 20
+
+
+def default_index_path(log_file: Path) -> Path:
+    """
+    Return the index location for a history file.
+
+    Args:
+        log_file: Path of the active history file.
+    """
+    digest = hashlib.sha1(str(Path(log_file).resolve()).encode("utf-8")).hexdigest()[:12]
+    return config.CACHE_DIR / f"history-{digest}.sqlite3"
+
+
+def _end_of_day(day: str) -> str:
+    return (datetime.date.fromisoformat(day) + datetime.timedelta(days=1)).isoformat()
+
+
+class HistoryIndex:
+    """
+    Full-text index over a history file and its sealed segments.
+    """
+
+    def __init__(self, log_file: Path, index_path: Path = None):
+        """
+        Initialize the index.
+
+        Args:
+            log_file: Path of the active history file.
+            index_path: SQLite database path (defaults to a file in the cache directory).
+        """
+        self.log_file = Path(log_file)
+        self.index_path = Path(index_path) if index_path else default_index_path(self.log_file)
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode, so update() controls its own transaction
+            self._conn = sqlite3.connect(self.index_path, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def update(self) -> int:
+        """
+        Index entries appended since the last update.
+
+        Returns:
+            Number of entries added to the index.
+        """
+        conn = self.conn
+        # An immediate transaction serializes concurrent updaters, so nothing is indexed twice
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            sealed = {row[0] for row in conn.execute("SELECT name FROM sealed")}
+            for segment in list_segments(self.log_file):
+                name = segment.name[:-3] if segment.suffix == ".gz" else segment.name
+                if name in sealed:
+                    continue
+                added += self._index_file(segment)
+                conn.execute("INSERT OR IGNORE INTO sealed (name) VALUES (?)", (name,))
+            if self.log_file.exists():
+                added += self._index_file(self.log_file)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def _index_file(self, path: Path) -> int:
+        with open_segment(path) as f:
+            first = f.readline()
+            if not first.endswith(b"\n"):
+                return 0
+            fingerprint = hashlib.sha1(first).hexdigest()
+            row = self.conn.execute("SELECT indexed_bytes FROM sources WHERE fingerprint = ?", (fingerprint,)).fetchone()
+            position = row[0] if row else 0
+            f.seek(position)
+
+            added = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A write in progress; pick it up next time
+                    break
+                position += len(line)
+                added += self._add(line)
+
+        self.conn.execute(
+            "INSERT INTO sources (fingerprint, indexed_bytes) VALUES (?, ?) "
+            "ON CONFLICT (fingerprint) DO UPDATE SET indexed_bytes = excluded.indexed_bytes",
+            (fingerprint, position),
+        )
+        return added
+
+    def _add(self, line: bytes) -> int:
+        try:
+            entry = json.loads(line)
+            query = entry_query(entry)
+        except (ValueError, AttributeError):
+            return 0
+        cursor = self.conn.execute("INSERT INTO entries (query, response) VALUES (?, ?)", (query, entry.get("response") or ""))
+        self.conn.execute(
+            "INSERT INTO meta (rowid, timestamp, model, mode) VALUES (?, ?, ?, ?)",
+            (cursor.lastrowid, entry.get("timestamp"), entry.get("model"), entry.get("mode")),
+        )
+        return 1
+
+    def search(self, text: str = "", model: str = None, mode: str = None, since: str = None,
+               until: str = None, limit: int = DEFAULT_LIMIT, update: bool = True) -> List[Dict[str, Any]]:
+        """
+        Find history entries, most recent first.
+
+        Args:
+            text: Whitespace-separated terms that must all occur in the query or response
+                (case-insensitive substrings).
+            model: Only entries from this model.
+            mode: Only entries from this mode ("normal", "spell", "trans").
+            since: Only entries on or after this date (YYYY-MM-DD).
+            until: Only entries on or before this date (YYYY-MM-DD).
+            limit: Maximum number of results.
+            update: Index newly appended entries first.
+
+        Returns:
+            Dicts with timestamp, model, mode, query and response.
+        """
+        if update:
+            self.update()
+
+        where = []
+        params = []
+        terms = text.split()
+        indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM]
+        if indexed:
+            where.append("entries MATCH ?")
+            params.append(" ".join('"' + term.replace('"', '""') + '"' for term in indexed))
+        for term in terms:
+            if len(term) < MIN_INDEXED_TERM:
+                where.append("(entries.query LIKE ? ESCAPE '\\' OR entries.response LIKE ? ESCAPE '\\')")
+                # % and _ in the term are literal characters, not wildcards
+                pattern = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                params.extend([f"%{pattern}%"] * 2)
+        if model:
+            where.append("meta.model = ?")
+            params.append(model)
+        if mode:
+            where.append("meta.mode = ?")
+            params.append(mode)
+        if since:
+            where.append("meta.timestamp >= ?")
+            params.append(datetime.date.fromisoformat(since).isoformat())
+        if until:
+            where.append("meta.timestamp < ?")
+            params.append(_end_of_day(until))
+
+        sql = (
+            "SELECT meta.timestamp, meta.model, meta.mode, entries.query, entries.response "
+            "FROM entries JOIN meta ON meta.rowid = entries.rowid"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Entries are indexed in log order, so rowid order is chronological and lets
+        # FTS5 stop after the first matches instead of sorting every hit
+        sql += " ORDER BY entries.rowid DESC LIMIT ?"
+        params.append(limit)
+
+        return [
+            {"timestamp": timestamp, "model": model_name, "mode": mode_name, "query": query, "response": response}
+            for timestamp, model_name, mode_name, query, response in self.conn.execute(sql, params)
+        ]
@@ -0,0 +1,167 @@
+"""
+Streamed query input for `ds -` and `ds --file`.
+
+Input is read in fixed-size binary blocks and decoded incrementally, so a
+large document never goes through argv and at most one request's worth of
+text is held in memory. Text longer than one request is cut into ordered
+chunks at paragraph, line or word boundaries, and each chunk is yielded as
+soon as it is complete so the first answer can arrive while the rest of the
+input is still being read.
+"""
+
+import codecs
+import os
+import stat
+import sys
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator
+
+from . import config
+
+# Bytes read per system call
+BLOCK_SIZE = 64 * 1024
+
+
+class InputTooLarge(ValueError):
+    """
+    The input is larger than the configured cap (DS_INPUT_MAX_BYTES).
+    """
+
+
+@contextmanager
+def open_input(source: str):
+    """
+    Open a query source for binary reading.
+
+    Args:
+        source: File path, or "-" for stdin (which is not closed afterwards).
+
+    Yields:
+        A binary file object.
+    """
+    if source == "-":
+        yield sys.stdin.buffer
+        return
+    with open(source, "rb") as f:
+        yield f
+
+
+def _remaining_size(stream: BinaryIO) -> int:
+    """
+    Return the unread size of a regular file, or 0 for pipes and terminals.
+    """
+    try:
+        info = os.fstat(stream.fileno())
+        if stat.S_ISREG(info.st_mode):
+            return info.st_size - stream.tell()
+    except (AttributeError, OSError, ValueError):
+        pass
+    return 0
+
+
+def read_blocks(stream: BinaryIO, max_bytes: int = None) -> Iterator[str]:
+    """
+    Read and decode a binary stream block by block.
+
+    Regular files larger than the cap are rejected before anything is read;
+    pipes are rejected as soon as the cap is exceeded.
+
+    Args:
+        stream: Binary file object.
+        max_bytes: Maximum input size in bytes; 0 disables the cap (defaults to config).
+
+    Yields:
+        Decoded text blocks (invalid UTF-8 is replaced).
+
+    Raises:
+        InputTooLarge: If the input exceeds max_bytes.
+    """
+    max_bytes = config.INPUT_MAX_BYTES if max_bytes is None else max_bytes
+    too_large = f"Input exceeds the {max_bytes}-byte limit (set DS_INPUT_MAX_BYTES to raise it)"
+    if max_bytes and _remaining_size(stream) > max_bytes:
+        raise InputTooLarge(too_large)
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    total = 0
+    while True:
+        block = stream.read(BLOCK_SIZE)
+        if not block:
+            break
+        total += len(block)
+        if max_bytes and total > max_bytes:
+            raise InputTooLarge(too_large)
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def split_point(text: str, limit: int) -> int:
+    """
+    Return where to cut text so the first piece is at most ``limit`` characters.
+
+    Prefers the last paragraph break, then line break, then space in the second
+    half of the window, and cuts hard only when there is none.
+    """
+    floor = limit // 2
+    for separator in ("\n\n", "\n", " "):
+        index = text.rfind(separator, floor, limit)
+        if index != -1:
+            return index + len(separator)
+    return limit
+
+
+def iter_chunks(blocks: Iterable[str], chunk_chars: int = None) -> Iterator[str]:
+    """
+    Regroup text blocks into request-sized chunks, in order.
+
+    Joining the chunks gives back the input exactly.
+
+    Args:
+        blocks: Text blocks, e.g. from read_blocks.
+        chunk_chars: Maximum characters per chunk (defaults to config).
+
+    Yields:
+        Chunks of at most chunk_chars characters.
+    """
+    chunk_chars = config.INPUT_CHUNK_CHARS if chunk_chars is None else chunk_chars
+    buffer = ""
+    for block in blocks:
+        buffer += block
+        while len(buffer) > chunk_chars:
+            cut = split_point(buffer, chunk_chars)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    if buffer:
+        yield buffer
+
+
+def iter_input_queries(source: str, instruction: str = "", max_bytes: int = None,
+                       chunk_chars: int = None) -> Iterator[str]:
+    """
+    Yield the queries to send for a streamed input, one per chunk.
+
+    Args:
+        source: File path, or "-" for stdin.
+        instruction: Query words given on the command line; prepended to every chunk.
+        max_bytes: Input size cap in bytes (defaults to config).
+        chunk_chars: Maximum input characters per request (defaults to config).
+
+    Yields:
+        Query strings, in input order.
+
+    Raises:
+        InputTooLarge: If the input exceeds the cap.
+        ValueError: If the input is empty.
+    """
+    sent = False
+    with open_input(source) as stream:
+        for chunk in iter_chunks(read_blocks(stream, max_bytes), chunk_chars):
+            if not chunk.strip():
+                continue
+            sent = True
+            yield f"{instruction}\n\n{chunk}" if instruction else chunk
+    if not sent:
+        raise ValueError("No input to send: " + ("stdin was empty" if source == "-" else f"{source} is empty"))
@@ -0,0 +1,185 @@
+"""
+Registry of syntax highlighters for fenced code blocks, keyed by fence language.
+
+A fence tag such as ``bash`` or ``rs`` is resolved through ALIASES to a
+language name. Python is built into ds.highlighter; every other language
+lives in its own module here and is imported the first time a block in
+that language is rendered, so startup costs the same however many
+languages are registered. Untagged blocks are assigned a language by
+guess_language, which looks only at the start of the block.
+"""
+
+import importlib
+# Aliased: importing the ds.lexers.json submodule rebinds "json" in this namespace
+import json as _json
+import re
+import threading
+from typing import Dict, FrozenSet, Mapping, Optional
+
+RESET = "\033[0m"
+
+# Language name -> module under ds.lexers (None: built into ds.highlighter)
+LANGUAGES: Dict[str, Optional[str]] = {
+    "python": None,
+    "shell": "shell",
+    "json": "json",
+    "rust": "rust",
+    "javascript": "javascript",
+    "sql": "sql",
+}
+
+# Fence tags (lower-cased) -> language name
+ALIASES = {
+    "python": "python", "py": "python", "python3": "python", "py3": "python",
+    "shell": "shell", "sh": "shell", "bash": "shell", "zsh": "shell", "ksh": "shell",
+    "console": "shell", "shell-session": "shell",
+    "json": "json", "jsonc": "json", "json5": "json",
+    "rust": "rust", "rs": "rust",
+    "javascript": "javascript", "js": "javascript", "jsx": "javascript", "mjs": "javascript",
+    "cjs": "javascript", "node": "javascript", "typescript": "javascript", "ts": "javascript",
+    "tsx": "javascript",
+    "sql": "sql", "mysql": "sql", "postgresql": "sql", "postgres": "sql", "psql": "sql",
+    "sqlite": "sql", "plsql": "sql",
+}
+
+# Characters of an untagged block that guess_language looks at
+GUESS_SAMPLE = 2048
+# Untagged blocks up to this size that parse as JSON are JSON
+GUESS_JSON_MAX = 64 * 1024
+
+# One pass over the sample; each alternative is a telltale of one language
+GUESS_RE = re.compile(
+    r"(?P<shell>^#!\s*/(?:usr/)?bin/(?:env\s+)?(?:ba|z|k)?sh\b|^\$ \w|"
+    r"^\s*(?:sudo|apt(?:-get)?|brew|pip3?|npm|yarn|cd|export|echo|git|curl|chmod|mkdir|docker|cargo)\s|"
+    r"^\s*(?:fi|done|esac)\s*$|\$\{\w+\}|\s(?:&&|\|\|)\s)"
+    r"|(?P<rust>\bfn\s+\w+\s*[(<]|\blet\s+mut\b|\bimpl\b|\bpub\s+(?:fn|struct|enum|mod)\b|\w::\w|"
+    r"\b(?:println|vec|format)!|&mut\b|->\s*[A-Z&(]|#\[derive)"
+    r"|(?P<javascript>\b(?:const|let|var)\s+\w+\s*=|\bfunction\s*\w*\s*\(|=>|\bconsole\.\w+|"
+    r"\b(?:document|window)\.|\brequire\(|\bexport\s+(?:default|const|function)\b|;\s*$)"
+    r"|(?P<sql>\b(?:SELECT|INSERT\s+INTO|UPDATE|DELETE\s+FROM|CREATE\s+(?:TABLE|INDEX|VIEW)|"
+    r"WHERE|(?:INNER|LEFT|RIGHT)?\s*JOIN|GROUP\s+BY|ORDER\s+BY)\b)"
+    r"|(?P<python>\bdef\s+\w+\s*\(|^\s*(?:from\s+[\w.]+\s+)?import\s+\w|\bself\.|\belif\b|"
+    r"\b(?:None|True|False)\b|^\s*(?:class|if|for|while|with|try|except)\b[^\n]*:\s*$|\bprint\()",
+    re.MULTILINE,
+)
+# Ties go to the earlier language
+GUESS_ORDER = ("shell", "rust", "javascript", "sql", "python")
+
+
+class RegexLexer:
+    """
+    Single-pass highlighter driven by one regular expression of named token groups.
+
+    Each match is written once with the colour of its group, so escapes are
+    never nested. Two groups are special: ``word`` is coloured as a keyword
+    when it is one and left alone otherwise, and an empty ``call`` group
+    matched right after it marks a function call.
+    """
+
+    def __init__(self, token_re: re.Pattern, styles: Mapping[str, str], keywords: FrozenSet[str] = frozenset(),
+                 case_insensitive: bool = False):
+        """
+        Initialize the lexer.
+
+        Args:
+            token_re: Pattern whose named groups are token kinds.
+            styles: Token kind -> theme colour name ("string", "comment", "keyword",
+                "function", "number", "operator", "class").
+            keywords: Words coloured as keywords.
+            case_insensitive: Whether keywords match regardless of case (SQL).
+        """
+        self.token_re = token_re
+        self.styles = dict(styles)
+        self.keywords = frozenset(word.lower() for word in keywords) if case_insensitive else frozenset(keywords)
+        self.case_insensitive = case_insensitive
+
+    def highlight(self, code: str, theme_ansi: Mapping[str, str]) -> str:
+        """
+        Highlight code with the given theme colours.
+
+        Args:
+            code: Source code.
+            theme_ansi: Theme colour name -> ANSI escape, as in SyntaxHighlighter.theme_ansi.
+
+        Returns:
+            The code with ANSI colour escapes.
+        """
+        keywords = self.keywords
+        styles = self.styles
+        parts = []
+        append = parts.append
+        last_idx = 0
+        for match in self.token_re.finditer(code):
+            kind = match.lastgroup
+            if kind is None:
+                continue
+            if kind == "word" or kind == "call":
+                token = match.group("word")
+                if (token.lower() if self.case_insensitive else token) in keywords:
+                    color = theme_ansi["keyword"]
+                elif kind == "call":
+                    color = theme_ansi["function"]
+                else:
+                    continue
+            else:
+                token = match.group(kind)
+                color = theme_ansi[styles[kind]]
+            start = match.start()
+            if start > last_idx:
+                append(code[last_idx:start])
+            append(f"{color}{token}{RESET}")
+            last_idx = match.end()
+        parts.append(code[last_idx:])
+        return "".join(parts)
+
+
+def resolve_language(tag: str) -> Optional[str]:
+    """
+    Return the language name for a fence tag, or None if no lexer handles it.
+    """
+    return ALIASES.get(tag.strip().lower())
+
+
+_lexers: Dict[str, RegexLexer] = {}
+_lexers_lock = threading.Lock()
+
+
+def get_lexer(language: str) -> Optional[RegexLexer]:
+    """
+    Return the lexer of a registered language, importing its module on first use.
+
+    Returns None for Python, which ds.highlighter handles itself, and for
+    unknown languages.
+    """
+    lexer = _lexers.get(language)
+    if lexer is not None:
+        return lexer
+    module_name = LANGUAGES.get(language)
+    if module_name is None:
+        return None
+    with _lexers_lock:
+        if language not in _lexers:
+            _lexers[language] = importlib.import_module(f"{__name__}.{module_name}").LEXER
+        return _lexers[language]
+
+
+def guess_language(code: str) -> str:
+    """
+    Guess the language of an untagged code block.
+
+    Only the first GUESS_SAMPLE characters are examined. Falls back to
+    Python, which is what untagged blocks were always highlighted as.
+    """
+    sample = code[:GUESS_SAMPLE]
+    stripped = sample.lstrip()
+    if stripped[:1] in ("{", "[") and len(code) <= GUESS_JSON_MAX:
+        try:
+            _json.loads(code)
+            return "json"
+        except ValueError:
+            pass
+    scores = dict.fromkeys(GUESS_ORDER, 0)
+    for match in GUESS_RE.finditer(sample):
+        scores[match.lastgroup] += 1
+    best = max(GUESS_ORDER, key=lambda language: scores[language])
+    return best if scores[best] else "python"
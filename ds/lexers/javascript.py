@@ -0,0 +1,33 @@
+"""
+JavaScript and TypeScript lexer.
+"""
+
+import re
+
+from . import RegexLexer
+
+KEYWORDS = frozenset({
+    "async", "await", "break", "case", "catch", "class", "const", "continue", "debugger", "default",
+    "delete", "do", "else", "export", "extends", "false", "finally", "for", "from", "function", "if",
+    "import", "in", "instanceof", "let", "new", "null", "of", "return", "static", "super", "switch",
+    "this", "throw", "true", "try", "typeof", "undefined", "var", "void", "while", "with", "yield",
+    # TypeScript
+    "interface", "type", "enum", "implements", "private", "public", "protected", "readonly", "as",
+})
+
+TOKEN_RE = re.compile(
+    r'(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)'
+    r'|(?P<string>"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|`(?:[^`\\]|\\.)*`)'
+    r'|\b(?P<number>0[xX][\da-fA-F]+n?|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?n?)\b'
+    r'|(?P<word>[A-Za-z_$][\w$]*)(?P<call>(?=\s*\())?'
+    r'|(?P<operator>[-+*/%=!<>^&|?~]+)'
+)
+
+STYLES = {
+    "comment": "comment",
+    "string": "string",
+    "number": "number",
+    "operator": "operator",
+}
+
+LEXER = RegexLexer(TOKEN_RE, STYLES, KEYWORDS)
@@ -0,0 +1,26 @@
+"""
+JSON lexer.
+"""
+
+import re
+
+from . import RegexLexer
+
+KEYWORDS = frozenset({"true", "false", "null"})
+
+TOKEN_RE = re.compile(
+    r'(?P<key>"(?:[^"\\\n]|\\.)*")(?=\s*:)'
+    r'|(?P<string>"(?:[^"\\\n]|\\.)*")'
+    r'|(?P<number>-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b)'
+    r'|(?P<word>\b[a-z]+\b)'
+    r'|(?P<comment>//[^\n]*)'
+)
+
+STYLES = {
+    "key": "function",
+    "string": "string",
+    "number": "number",
+    "comment": "comment",
+}
+
+LEXER = RegexLexer(TOKEN_RE, STYLES, KEYWORDS)
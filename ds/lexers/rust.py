@@ -0,0 +1,37 @@
+"""
+Rust lexer.
+"""
+
+import re
+
+from . import RegexLexer
+
+KEYWORDS = frozenset({
+    "as", "async", "await", "break", "const", "continue", "crate", "dyn", "else", "enum", "extern",
+    "false", "fn", "for", "if", "impl", "in", "let", "loop", "match", "mod", "move", "mut", "pub",
+    "ref", "return", "self", "static", "struct", "super", "trait", "true", "type", "unsafe", "use",
+    "where", "while",
+})
+
+TOKEN_RE = re.compile(
+    r'(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)'
+    r'|(?P<string>b?r(?P<hashes>#*)"[\s\S]*?"(?P=hashes)|b?"(?:[^"\\]|\\.)*"|b?\'(?:[^\'\\\n]|\\.)\')'
+    r'|(?P<attribute>#!?\[[^\]\n]*\])'
+    r'|(?P<macro>\b\w+!)'
+    r'|\b(?P<number>\d[\d_]*(?:\.\d[\d_]*)?(?:[eE][+-]?\d+)?(?:_?(?:[iu](?:8|16|32|64|128|size)|f32|f64))?)\b'
+    r'|(?P<type>\b[A-Z]\w*)'
+    r'|(?P<word>\w+)(?P<call>(?=\s*(?:::<[^>\n]*>\s*)?\())?'
+    r'|(?P<operator>[-+*/%=!<>^&|?]+)'
+)
+
+STYLES = {
+    "comment": "comment",
+    "string": "string",
+    "attribute": "keyword",
+    "macro": "function",
+    "number": "number",
+    "type": "class",
+    "operator": "operator",
+}
+
+LEXER = RegexLexer(TOKEN_RE, STYLES, KEYWORDS)
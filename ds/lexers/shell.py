@@ -0,0 +1,32 @@
+"""
+Shell (sh, bash, zsh) lexer.
+"""
+
+import re
+
+from . import RegexLexer
+
+KEYWORDS = frozenset({
+    "if", "then", "else", "elif", "fi", "for", "while", "until", "do", "done", "case", "esac", "in",
+    "function", "return", "select", "time", "export", "local", "readonly", "declare", "unset",
+    "shift", "exit", "source", "alias", "set", "trap", "eval", "exec",
+})
+
+TOKEN_RE = re.compile(
+    r'(?P<comment>(?<![\w$#])#[^\n]*)'
+    r'|(?P<string>"(?:[^"\\]|\\.)*"|\'[^\']*\')'
+    r'|(?P<variable>\$\{[^}\n]*\}|\$\w+|\$[@#?$!*-])'
+    r'|\b(?P<number>\d+)\b'
+    r'|(?P<word>[A-Za-z_][\w-]*)'
+    r'|(?P<operator>&&|\|\||[|&;<>]+)'
+)
+
+STYLES = {
+    "comment": "comment",
+    "string": "string",
+    "variable": "class",
+    "number": "number",
+    "operator": "operator",
+}
+
+LEXER = RegexLexer(TOKEN_RE, STYLES, KEYWORDS)
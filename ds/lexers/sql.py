@@ -0,0 +1,37 @@
+"""
+SQL lexer (keywords are case-insensitive).
+"""
+
+import re
+
+from . import RegexLexer
+
+KEYWORDS = frozenset({
+    "select", "from", "where", "and", "or", "not", "null", "is", "in", "as", "join", "inner", "left",
+    "right", "outer", "full", "cross", "on", "using", "group", "by", "order", "having", "limit",
+    "offset", "insert", "into", "values", "update", "set", "delete", "create", "table", "view",
+    "index", "drop", "alter", "add", "column", "primary", "key", "foreign", "references", "unique",
+    "default", "distinct", "union", "all", "case", "when", "then", "else", "end", "exists", "between",
+    "like", "asc", "desc", "with", "returning", "begin", "commit", "rollback", "transaction", "if",
+    "true", "false", "integer", "int", "bigint", "text", "varchar", "char", "boolean", "real",
+    "numeric", "date", "timestamp", "constraint", "check", "cascade", "over", "partition",
+})
+
+TOKEN_RE = re.compile(
+    r'(?P<comment>--[^\n]*|/\*[\s\S]*?\*/)'
+    r'|(?P<string>\'(?:[^\']|\'\')*\')'
+    r'|(?P<identifier>"[^"\n]*"|`[^`\n]*`)'
+    r'|\b(?P<number>\d+(?:\.\d+)?)\b'
+    r'|(?P<word>\w+)(?P<call>(?=\s*\())?'
+    r'|(?P<operator>[-+*/%=<>!|]+)'
+)
+
+STYLES = {
+    "comment": "comment",
+    "string": "string",
+    "identifier": "class",
+    "number": "number",
+    "operator": "operator",
+}
+
+LEXER = RegexLexer(TOKEN_RE, STYLES, KEYWORDS, case_insensitive=True)
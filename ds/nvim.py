@@ -7,53 +7,79 @@ DeepSeek CLI Neovim 集成模块
 import sys
 import argparse
 import re
+import time
 from pathlib import Path
 
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from ds.chat import DeepSeekChat
-from ds.config import load_config, API_KEY, BASE_URL, MODEL, LOG_FILE, ENABLE_COLOR, SPINNER, STREAM
+# 配置在 ds.config 导入时已加载；OpenAI SDK 延迟到首次请求时才导入
+from ds.chat import ChatResult, DeepSeekChat
+from ds.daemon import daemon_chat
+from ds import config
 
-# 确保配置已加载
-load_config()
+_imported_at = time.perf_counter()
 
-def ds_ask(query: str, concise: bool = True) -> str:
+# 由 --timings / DS_TIMINGS 启用，收集本次请求的各阶段耗时
+_timings = None
+
+
+def _send(query: str) -> ChatResult:
     """
-    向 DeepSeek 提问
+    发送查询：优先使用正在运行的 ds serve 守护进程，否则在本进程内请求
     
     Args:
         query: 查询内容
-        concise: 是否返回简洁结果
         
     Returns:
-        DeepSeek 响应内容
+        ChatResult：原始文本在 .text，着色结果在 .rendered（按需生成）
     """
-    chat = DeepSeekChat()
-    
-    pass
+    response = daemon_chat(query, stream=False, timings=_timings)
+    if response is None:
+        response = DeepSeekChat().chat(query, timings=_timings)
+    return response
+
+def ds_ask_result(query: str, concise: bool = True) -> ChatResult:
+    """
+    向 DeepSeek 提问，返回 ChatResult
     
+    Args:
+        query: 查询内容
+        concise: 是否返回简洁结果
+        
+    Returns:
+        ChatResult：原始文本在 .text，着色结果在 .rendered（按需生成）
+    """
     if concise:
         query = f"请用最简洁的方式回答，直接给答案，不要解释过程，不要用礼貌用语：{query}"
     
-    response = chat.chat(query)
+    response = _send(query)
     return response
 
-def ds_review_code(code: str, filetype: str = "python") -> str:
+def ds_ask(query: str, concise: bool = True) -> str:
     """
-    让 DeepSeek 检查代码
+    向 DeepSeek 提问
+    
+    Args:
+        query: 查询内容
+        concise: 是否返回简洁结果
+        
+    Returns:
+        DeepSeek 响应内容（着色后的文本）
+    """
+    return ds_ask_result(query, concise).rendered
+
+def ds_review_code_result(code: str, filetype: str = "python") -> ChatResult:
+    """
+    让 DeepSeek 检查代码，返回 ChatResult
     
     Args:
         code: 代码内容
         filetype: 文件类型
         
     Returns:
-        DeepSeek 响应内容
+        ChatResult：原始文本在 .text，着色结果在 .rendered（按需生成）
     """
-    chat = DeepSeekChat()
-    
-    pass
-    
     prompt = [
         f"直接指出以下{filetype}代码的问题，给出修改后的代码。",
         "要求：1. 列出关键问题（不超过3点） 2. 直接给出修改后的代码 3. 不要解释原理",
@@ -64,33 +90,67 @@ def ds_review_code(code: str, filetype: str = "python") -> str:
         "请按这个格式回答：[问题列表] [修改后的代码]"
     ]
     
-    response = chat.chat("\n".join(prompt))
+    response = _send("\n".join(prompt))
     return response
 
-def ds_generate_doctest(code: str, filetype: str = "python") -> str:
+def ds_review_code(code: str, filetype: str = "python") -> str:
     """
-    生成 doctest 示例
+    让 DeepSeek 检查代码
     
     Args:
         code: 代码内容
         filetype: 文件类型
         
     Returns:
-        DeepSeek 响应内容
+        DeepSeek 响应内容（着色后的文本）
     """
-    chat = DeepSeekChat()
-    
-    pass
+    return ds_review_code_result(code, filetype).rendered
+
+def ds_generate_doctest_result(code: str, filetype: str = "python") -> ChatResult:
+    """
+    生成 doctest 示例，返回 ChatResult
     
+    Args:
+        code: 代码内容
+        filetype: 文件类型
+        
+    Returns:
+        ChatResult：原始文本在 .text，着色结果在 .rendered（按需生成）
+    """
     prompt = [
         f"你是 {filetype} 助教，请基于下面的代码编写 doctest 示例。",
         "只返回 doctest 片段：包含函数调用、输入与预期输出，不要解释，不要其他文字。",
         code,
     ]
     
-    response = chat.chat("\n".join(prompt))
+    response = _send("\n".join(prompt))
     return response
 
+def ds_generate_doctest(code: str, filetype: str = "python") -> str:
+    """
+    生成 doctest 示例
+    
+    Args:
+        code: 代码内容
+        filetype: 文件类型
+        
+    Returns:
+        DeepSeek 响应内容（着色后的文本）
+    """
+    return ds_generate_doctest_result(code, filetype).rendered
+
+def plain_text(result: ChatResult) -> str:
+    """
+    不着色地拼出响应：代码块去掉围栏，与着色结果移除颜色后的文本一致
+    
+    Args:
+        result: ChatResult
+        
+    Returns:
+        纯文本内容
+    """
+    return "".join(f"\n{content}\n" if is_code else content for content, is_code in result.blocks)
+
 def clean_output(output: str, remove_color: bool = True) -> str:
     """
     清理输出内容，移除不必要的标记
@@ -125,6 +185,9 @@ def main() -> None:
         epilog="使用示例: ds-nvim ask --concise \"你好\""
     )
     
+    parser.add_argument("--timings", action="store_const", const="text", help="将各阶段耗时输出到 stderr")
+    parser.add_argument("--timings-json", dest="timings", action="store_const", const="json", help="以单行 JSON 输出各阶段耗时")
+    
     subparsers = parser.add_subparsers(dest="command", required=True, 
                                       help="子命令帮助")
     
@@ -153,11 +216,18 @@ def main() -> None:
     
     args = parser.parse_args()
     
+    global _timings
+    timings_format = args.timings or config.TIMINGS
+    if timings_format:
+        from ds.timings import Timings
+        _timings = Timings()
+        _timings.mark_process_start(_imported_at)
+    
     try:
         # 根据命令类型执行不同的函数
         if args.command == "ask":
             # 如果是 ask 命令，直接使用 query 参数
-            result = ds_ask(args.query, args.concise and not args.verbose)
+            result = ds_ask_result(args.query, args.concise and not args.verbose)
         elif args.command == "review":
             # 获取代码内容
             if args.code:
@@ -168,7 +238,7 @@ def main() -> None:
             else:
                 print("错误: 必须提供 --code 或 --file 参数", file=sys.stderr)
                 sys.exit(1)
-            result = ds_review_code(code, args.filetype)
+            result = ds_review_code_result(code, args.filetype)
         elif args.command == "doctest":
             # 获取代码内容
             if args.code:
@@ -179,17 +249,16 @@ def main() -> None:
             else:
                 print("错误: 必须提供 --code 或 --file 参数", file=sys.stderr)
                 sys.exit(1)
-            result = ds_generate_doctest(code, args.filetype)
+            result = ds_generate_doctest_result(code, args.filetype)
         else:
             print(f"错误: 未知命令 {args.command}", file=sys.stderr)
             sys.exit(1)
         
-        # 根据命令类型决定是否移除颜色代码
-        # ask和review命令保持染色功能，doctest命令移除颜色
+        # ask和review命令输出着色结果，doctest命令输出去掉围栏的纯文本（无需高亮）
         if args.command == 'doctest':
-            print(clean_output(result, remove_color=True))
+            print(clean_output(plain_text(result), remove_color=False))
         else:
-            print(clean_output(result, remove_color=False))
+            print(clean_output(result.rendered, remove_color=False))
         
     except KeyboardInterrupt:
         print("\n操作已取消", file=sys.stderr)
@@ -203,6 +272,9 @@ def main() -> None:
     except Exception as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        if _timings is not None:
+            _timings.report(timings_format)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,401 @@
+"""
+Timeouts, retries and hedged requests for chat completions.
+
+A request attempt runs on a worker thread that calls the API and, when
+streaming, reads ahead to the first content chunk. The calling thread waits
+for that with a first-token deadline, retries retryable failures with
+jittered exponential backoff (honoring Retry-After), and in hedged mode
+starts a second attempt if the first token is slower than the configured
+percentile of recent time-to-first-token, keeping whichever answers first.
+
+ds.aretry applies the same policy to the async client.
+"""
+
+import email.utils
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import config
+
+# Retry-After values above this are not waited for; the error is raised instead
+MAX_RETRY_AFTER = 60.0
+# History entries examined and samples needed to derive a hedging threshold
+HEDGE_LOOKBACK = 1000
+HEDGE_MIN_SAMPLES = 20
+# Seconds a hedging threshold saved in the cache directory is reused before the history is scanned again
+HEDGE_REFRESH = 3600
+
+
+class FirstTokenTimeout(TimeoutError):
+    """
+    No content arrived within the first-token timeout.
+    """
+
+
+class TotalTimeout(TimeoutError):
+    """
+    The response did not complete within the total timeout.
+    """
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Return the server-requested delay in seconds carried by an API error, if any.
+
+    Understands ``retry-after-ms`` and ``retry-after`` as seconds or an HTTP date.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            parsed = email.utils.parsedate_tz(value)
+            if parsed is not None:
+                return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Check whether a failed attempt may succeed if repeated.
+
+    Rate limits, connection failures, SDK timeouts, 5xx responses and our own
+    first-token timeouts are retryable; other client errors are not.
+    """
+    if isinstance(error, FirstTokenTimeout):
+        return True
+    import openai
+
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and (error.status_code >= 500 or error.status_code in (408, 409))
+
+
+def backoff_delay(attempt: int, base: float = None, cap: float = None, server_delay: float = None) -> float:
+    """
+    Return how long to wait before retry number ``attempt + 1``.
+
+    Uses "full jitter": a uniform draw between zero and the exponential bound,
+    so concurrent clients do not retry in lockstep. A Retry-After from the
+    server is treated as a minimum.
+
+    Args:
+        attempt: Zero-based number of the attempt that failed.
+        base: Initial backoff in seconds (defaults to config).
+        cap: Maximum backoff in seconds (defaults to config).
+        server_delay: Delay requested by the server, if any.
+    """
+    base = config.RETRY_BACKOFF if base is None else base
+    cap = config.RETRY_BACKOFF_MAX if cap is None else cap
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if server_delay is not None:
+        delay = max(delay, server_delay)
+    return delay
+
+
+_hedge_thresholds: Dict[tuple, Optional[float]] = {}
+
+
+def _hedge_cache_path():
+    return config.CACHE_DIR / "hedge-thresholds.json"
+
+
+def _read_hedge_cache() -> Dict[str, Any]:
+    try:
+        with open(_hedge_cache_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_hedge_cache(key: str, threshold: Optional[float]):
+    """
+    Save a threshold for other processes; failures only cost a rescan.
+    """
+    path = _hedge_cache_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        thresholds = _read_hedge_cache()
+        thresholds[key] = {"threshold": threshold, "computed_at": time.time()}
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(thresholds, f)
+        os.replace(tmp_name, path)
+    except OSError:
+        pass
+
+
+def _scan_hedge_threshold(log_file, model: str, percentile: float) -> Optional[float]:
+    from .history import iter_recent
+
+    samples = []
+    for seen, entry in enumerate(iter_recent(log_file)):
+        if seen >= HEDGE_LOOKBACK:
+            break
+        if entry.get("model") == model and entry.get("stream") and entry.get("ttft_ms") is not None:
+            samples.append(entry["ttft_ms"] / 1000)
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+
+def hedge_threshold(log_file, model: str, percentile: float, floor: float) -> Optional[float]:
+    """
+    Return the first-token delay after which a hedge request is sent.
+
+    The threshold is the given percentile of time-to-first-token over recent
+    streamed requests to the model in the chat history, and never below
+    ``floor``. Scanning the history is only worth it when hedging is on, so
+    callers ask for the threshold lazily; the result is kept for the process
+    and saved in the cache directory, where other processes reuse it for
+    HEDGE_REFRESH seconds.
+
+    Args:
+        log_file: Chat history file.
+        model: Model name.
+        percentile: Percentile between 0 and 100.
+        floor: Minimum threshold in seconds.
+
+    Returns:
+        Threshold in seconds, or None if the history has too few samples.
+    """
+    key = (str(log_file), model, percentile)
+    if key not in _hedge_thresholds:
+        disk_key = json.dumps(key)
+        saved = _read_hedge_cache().get(disk_key)
+        if isinstance(saved, dict) and 0 <= time.time() - saved.get("computed_at", 0) < HEDGE_REFRESH:
+            _hedge_thresholds[key] = saved.get("threshold")
+        else:
+            _hedge_thresholds[key] = _scan_hedge_threshold(log_file, model, percentile)
+            _write_hedge_cache(disk_key, _hedge_thresholds[key])
+    threshold = _hedge_thresholds[key]
+    return None if threshold is None else max(threshold, floor)
+
+
+class _Attempt:
+    """
+    One API request running on a worker thread.
+    """
+
+    def __init__(self, create: Callable[[], Any], stream: bool, results: "queue.Queue"):
+        self.create = create
+        self.stream = stream
+        self.results = results
+        self.response = None
+        self.created_at = None
+        self.prefetched: List[Any] = []
+        self.iterator = None
+        self.error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._abandoned = False
+        self.thread = threading.Thread(target=self._run, name="ds-request", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            response = self.create()
+            self.created_at = time.perf_counter()
+            with self._lock:
+                self.response = response
+                if self._abandoned:
+                    _close(response)
+                    return
+            if self.stream:
+                self.iterator = iter(response)
+                # Read ahead to the first content chunk (or the end of the stream)
+                for chunk in self.iterator:
+                    self.prefetched.append(chunk)
+                    if _has_content(chunk) or self._abandoned:
+                        break
+        except Exception as e:
+            self.error = e
+        self.results.put(self)
+
+    def abandon(self):
+        """
+        Give up on this attempt and release its connection.
+        """
+        with self._lock:
+            self._abandoned = True
+            if self.response is not None:
+                _close(self.response)
+
+
+def _has_content(chunk: Any) -> bool:
+    choices = getattr(chunk, "choices", None)
+    if not choices:
+        return False
+    delta = choices[0].delta
+    # Reasoning models stream their reasoning before any answer content
+    return bool(getattr(delta, "content", None) or getattr(delta, "reasoning_content", None))
+
+
+def _close(response: Any):
+    close = getattr(response, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class RequestResult:
+    """
+    The winning attempt of a request.
+
+    Attributes:
+        response: The completion (non-streamed) or the stream object.
+        chunks: For streamed requests, an iterator over every chunk, starting
+            with the ones read ahead while waiting for the first token.
+        hedged: Whether a hedge request was sent for the winning try.
+        retries: Number of retries before the winning try.
+        deadline: time.monotonic() value at which the total timeout expires.
+        created_at: perf_counter() value when the API call returned (response
+            headers for streamed requests).
+    """
+
+    def __init__(self, attempt: _Attempt, hedged: bool, retries: int, deadline: float):
+        self.response = attempt.response
+        self.created_at = attempt.created_at
+        self.chunks = None
+        if attempt.stream:
+            self.chunks = _chain(attempt.prefetched, attempt.iterator)
+        self.hedged = hedged
+        self.retries = retries
+        self.deadline = deadline
+
+    def iter_chunks(self) -> Iterator[Any]:
+        """
+        Iterate over a streamed response, enforcing the total timeout.
+
+        Raises:
+            TotalTimeout: If the stream is still open when the deadline passes.
+        """
+        timer = Deadline(self.response, max(0.0, self.deadline - time.monotonic()))
+        try:
+            yield from self.chunks
+        except Exception:
+            if timer.expired:
+                raise TotalTimeout("Response did not complete within the total timeout") from None
+            raise
+        finally:
+            timer.cancel()
+        if timer.expired:
+            raise TotalTimeout("Response did not complete within the total timeout")
+
+
+def _chain(prefetched, iterator):
+    yield from prefetched
+    if iterator is not None:
+        yield from iterator
+
+
+def _race(create: Callable[[], Any], stream: bool, first_token_timeout: float,
+          hedge_after: Optional[float]) -> tuple:
+    """
+    Run one attempt, plus a hedge if it is slow, and return the first to answer.
+    """
+    results: "queue.Queue[_Attempt]" = queue.Queue()
+    attempts = [_Attempt(create, stream, results)]
+    started = time.monotonic()
+    deadline = started + first_token_timeout
+    hedge_at = started + hedge_after if hedge_after is not None else None
+    failed = []
+    while True:
+        wake = deadline if hedge_at is None else min(deadline, hedge_at)
+        try:
+            attempt = results.get(timeout=max(0.0, wake - time.monotonic()))
+        except queue.Empty:
+            if hedge_at is not None and time.monotonic() < deadline:
+                attempts.append(_Attempt(create, stream, results))
+                hedge_at = None
+                continue
+            for attempt in attempts:
+                attempt.abandon()
+            raise FirstTokenTimeout(f"No response within the first-token timeout of {first_token_timeout:g}s")
+
+        if attempt.error is None:
+            for other in attempts:
+                if other is not attempt:
+                    other.abandon()
+            return attempt, len(attempts) > 1
+        failed.append(attempt)
+        if len(failed) == len(attempts):
+            raise attempt.error
+
+
+def request(create: Callable[[], Any], stream: bool, hedge_after: Optional[float] = None,
+            max_retries: int = None, first_token_timeout: float = None, total_timeout: float = None) -> RequestResult:
+    """
+    Send a request with first-token timeout, retries and optional hedging.
+
+    Args:
+        create: Zero-argument callable issuing the API call.
+        stream: Whether create returns a stream of chunks.
+        hedge_after: Seconds without a first token after which a hedge is sent (None disables).
+        max_retries: Retries after the first attempt (defaults to config).
+        first_token_timeout: Seconds to wait for the first content chunk of a
+            streamed response, or for a non-streamed response (defaults to config).
+        total_timeout: Budget in seconds for all attempts and backoff (defaults to config).
+
+    Returns:
+        The winning RequestResult.
+
+    Raises:
+        The last attempt's error when retries are exhausted or the error is not retryable.
+    """
+    max_retries = config.MAX_RETRIES if max_retries is None else max_retries
+    if first_token_timeout is None:
+        first_token_timeout = config.FIRST_TOKEN_TIMEOUT if stream else config.TIMEOUT
+    total_timeout = config.TIMEOUT if total_timeout is None else total_timeout
+    deadline = time.monotonic() + total_timeout
+
+    for retry in range(max_retries + 1):
+        remaining = deadline - time.monotonic()
+        try:
+            attempt, hedged = _race(create, stream, min(first_token_timeout, remaining),
+                                    hedge_after if stream else None)
+            return RequestResult(attempt, hedged, retry, deadline)
+        except Exception as e:
+            if retry == max_retries or not is_retryable(e):
+                raise
+            server_delay = retry_after(e)
+            if server_delay is not None and server_delay > MAX_RETRY_AFTER:
+                raise
+            delay = backoff_delay(retry, server_delay=server_delay)
+            if time.monotonic() + delay >= deadline:
+                raise
+            time.sleep(delay)
+
+
+class Deadline:
+    """
+    Close a stream if it is still being read when the total timeout expires.
+    """
+
+    def __init__(self, response: Any, seconds: float):
+        self.expired = False
+        self._response = response
+        self._timer = threading.Timer(seconds, self._expire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self):
+        self.expired = True
+        _close(self._response)
+
+    def cancel(self):
+        self._timer.cancel()
@@ -0,0 +1,387 @@
+"""
+Local dictionary fast path for spell mode.
+
+Before a spell-mode request goes to the API, the text is split into
+sentences and every word is looked up in a Bloom filter built from a system
+word list plus a plain-text user dictionary. Text whose words are all known
+is returned as is without a network call; otherwise only the sentences with
+unknown words are sent, and the corrected sentences are put back between the
+untouched ones. The filter is built once into the cache directory and
+memory-mapped on use, so a lookup costs a hash and a few page reads.
+
+A Bloom filter has no false negatives but about one false positive in a
+thousand lookups, so a rare misspelling that happens to collide with the
+filter is treated as correct.
+"""
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import config
+from .utils import file_lock
+
+MAGIC = b"DSBLOOM1"
+# Magic, bit count, hash count, word count, padded to 32 bytes
+HEADER = struct.Struct("<8sQIQ4x")
+FALSE_POSITIVE_RATE = 0.001
+# Dirty sentences sent to the API at once
+MAX_PARALLEL = 8
+
+# Runs of letters, with inner apostrophes ("don't", "O'Neill")
+WORD_RE = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+# Sentence boundaries: whitespace after terminal punctuation, or line breaks
+SENTENCE_SPLIT_RE = re.compile(r"((?<=[.!?])[ \t]+|[ \t]*\n\s*)")
+
+
+def _positions(word: str, bits: int, hashes: int) -> Iterable[int]:
+    digest = hashlib.blake2b(word.encode("utf-8"), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], "little")
+    h2 = int.from_bytes(digest[8:], "little") | 1
+    return ((h1 + i * h2) % bits for i in range(hashes))
+
+
+def _normalize(word: str) -> str:
+    return word.lower().replace("’", "'")
+
+
+class BloomFilter:
+    """
+    Read-only Bloom filter over a memory-mapped file.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Open a filter written by build().
+
+        Args:
+            path: Filter file.
+
+        Raises:
+            ValueError: If the file is not a filter.
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{self.path} is not a spell dictionary")
+        magic, self.bits, self.hashes, self.count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or len(self._mmap) < HEADER.size + (self.bits + 7) // 8:
+            raise ValueError(f"{self.path} is not a spell dictionary")
+
+    def __contains__(self, word: str) -> bool:
+        data = self._mmap
+        for position in _positions(word, self.bits, self.hashes):
+            if not data[HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def close(self):
+        self._mmap.close()
+
+    @staticmethod
+    def build(words: Iterable[str], path: Path, false_positive_rate: float = FALSE_POSITIVE_RATE) -> int:
+        """
+        Write a filter holding the given words (lower-cased).
+
+        The file is written through a temporary file and renamed into place,
+        so readers never see a partial filter.
+
+        Args:
+            words: Words to add.
+            path: Destination file.
+            false_positive_rate: Target false positive probability.
+
+        Returns:
+            Number of distinct words added.
+        """
+        unique = {_normalize(word) for word in words if word}
+        count = max(1, len(unique))
+        bits = max(64, math.ceil(-count * math.log(false_positive_rate) / math.log(2) ** 2))
+        hashes = max(1, round(bits / count * math.log(2)))
+        array = bytearray((bits + 7) // 8)
+        for word in unique:
+            for position in _positions(word, bits, hashes):
+                array[position >> 3] |= 1 << (position & 7)
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, bits, hashes, len(unique)))
+                f.write(array)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+        return len(unique)
+
+
+def read_wordlist(path: Path) -> Iterable[str]:
+    """
+    Yield the words of a one-word-per-line list, skipping blanks and # comments.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            word = line.strip()
+            if word and not word.startswith("#"):
+                yield word
+
+
+class SpellDictionary:
+    """
+    Known words: a Bloom filter plus an exact user dictionary.
+    """
+
+    def __init__(self, bloom: BloomFilter, user_words: Iterable[str] = ()):
+        self.bloom = bloom
+        self.user_words: Set[str] = {_normalize(word) for word in user_words}
+
+    def known(self, word: str) -> bool:
+        """
+        Check a word, ignoring case; words outside ASCII are always unknown.
+        """
+        if not word.isascii():
+            return False
+        word = _normalize(word)
+        if word in self.user_words or word in self.bloom:
+            return True
+        # Possessives of known words ("writer's")
+        return word.endswith("'s") and (word[:-2] in self.user_words or word[:-2] in self.bloom)
+
+    def is_clean(self, sentence: str) -> bool:
+        """
+        Check whether every word of a sentence is known.
+        """
+        return all(self.known(word) for word in WORD_RE.findall(sentence))
+
+
+def dictionary_path() -> Path:
+    """
+    Return where the filter built from the configured word list is kept.
+    """
+    return config.CACHE_DIR / "spell-words.bloom"
+
+
+_dictionaries: Dict[tuple, Optional[SpellDictionary]] = {}
+_dictionaries_lock = threading.Lock()
+
+
+def get_dictionary() -> Optional[SpellDictionary]:
+    """
+    Return the process-wide spell dictionary, building the filter if needed.
+
+    The filter is rebuilt when the word list is newer than it, and the user
+    dictionary is reloaded when it changes. Returns None when there is no
+    word list, which turns the fast path off.
+    """
+    wordlist, path = config.SPELL_WORDLIST, dictionary_path()
+    try:
+        user_mtime = config.SPELL_USER_DICT.stat().st_mtime
+    except OSError:
+        user_mtime = None
+    key = (wordlist, path, config.SPELL_USER_DICT, user_mtime)
+    with _dictionaries_lock:
+        if key not in _dictionaries:
+            _dictionaries[key] = _load_dictionary(wordlist, path)
+        return _dictionaries[key]
+
+
+def _load_dictionary(wordlist: Path, path: Path) -> Optional[SpellDictionary]:
+    try:
+        source_mtime = wordlist.stat().st_mtime
+    except OSError:
+        source_mtime = None
+    try:
+        stale = source_mtime is not None and path.stat().st_mtime < source_mtime
+    except OSError:
+        stale = True
+    if stale:
+        if source_mtime is None:
+            return None
+        with file_lock(path.with_name(path.name + ".lock")):
+            BloomFilter.build(read_wordlist(wordlist), path)
+    try:
+        bloom = BloomFilter(path)
+    except (OSError, ValueError):
+        return None
+
+    user_words = ()
+    if config.SPELL_USER_DICT.exists():
+        user_words = list(read_wordlist(config.SPELL_USER_DICT))
+    return SpellDictionary(bloom, user_words)
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences and the whitespace between them.
+
+    Returns:
+        Alternating sentence and separator strings that join back into text.
+    """
+    return SENTENCE_SPLIT_RE.split(text)
+
+
+def _stats_path() -> Path:
+    return config.CACHE_DIR / "spell-stats.json"
+
+
+def read_stats() -> Dict[str, int]:
+    """
+    Return the shared counters of sentences answered locally and sent to the API.
+    """
+    try:
+        with open(_stats_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"local": 0, "api": 0}
+
+
+def record_stats(local: int, api: int):
+    """
+    Add to the shared sentence counters (safe across processes).
+    """
+    path = _stats_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(path.with_name(path.name + ".lock")):
+        stats = read_stats()
+        stats["local"] = stats.get("local", 0) + local
+        stats["api"] = stats.get("api", 0) + api
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(stats, f)
+        os.replace(tmp_name, path)
+
+
+def _reattach(source: str, corrected: str) -> str:
+    body = source.strip()
+    start = source.index(body[0]) if body else 0
+    return source[:start] + corrected.strip() + source[start + len(body):]
+
+
+def _plan(query: str) -> Optional[Tuple[List[str], List[int], int]]:
+    """
+    Split a query into sentences and find the ones with unknown words.
+
+    Returns (parts, indexes of dirty sentences, number of clean sentences),
+    or None when the whole query should go to the API as one request.
+    """
+    dictionary = get_dictionary()
+    if dictionary is None:
+        return None
+    parts = split_sentences(query)
+    dirty = [i for i in range(0, len(parts), 2) if parts[i].strip() and not dictionary.is_clean(parts[i])]
+    clean = sum(1 for i in range(0, len(parts), 2) if parts[i].strip()) - len(dirty)
+    if dirty and not clean:
+        record_stats(0, len(dirty))
+        return None
+    return parts, dirty, clean
+
+
+def correct_locally(chat_instance, query: str, language: str, use_cache: bool = True,
+                    refresh: bool = False) -> Optional[Tuple[str, int, int]]:
+    """
+    Answer a spell-mode query with as few API requests as possible.
+
+    Args:
+        chat_instance: DeepSeekChat used for the sentences with unknown words.
+        query: Text to correct.
+        language: Language passed to the spell prompt.
+        use_cache: Whether sentence requests may use the response cache.
+        refresh: Skip cache lookups for sentence requests but store the answers.
+
+    Returns:
+        A tuple of (corrected text, sentences answered locally, sentences sent
+        to the API), or None when the whole query should go to the API as one
+        request (no dictionary, or no sentence is clean).
+    """
+    plan = _plan(query)
+    if plan is None:
+        return None
+    parts, dirty, clean = plan
+
+    if dirty:
+        def correct(index):
+            # A single dirty sentence has no clean part, so this goes straight to the API
+            response = chat_instance.chat(parts[index].strip(), "spell", language, stream=False,
+                                          use_cache=use_cache, refresh=refresh)
+            return _reattach(parts[index], response.text)
+
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL, len(dirty))) as executor:
+            for index, corrected in zip(dirty, executor.map(correct, dirty)):
+                parts[index] = corrected
+    record_stats(clean, 0)
+    return "".join(parts), clean, len(dirty)
+
+
+async def acorrect_locally(chat_instance, query: str, language: str, use_cache: bool = True,
+                           refresh: bool = False) -> Optional[Tuple[str, int, int]]:
+    """
+    Async counterpart of correct_locally for an AsyncDeepSeekChat.
+
+    The dictionary lookups run in the default executor and the sentences
+    with unknown words are sent concurrently with achat().
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    plan = await loop.run_in_executor(None, _plan, query)
+    if plan is None:
+        return None
+    parts, dirty, clean = plan
+
+    if dirty:
+        limit = asyncio.Semaphore(MAX_PARALLEL)
+
+        async def correct(index):
+            async with limit:
+                response = await chat_instance.achat(parts[index].strip(), "spell", language,
+                                                     use_cache=use_cache, refresh=refresh)
+            return _reattach(parts[index], response.text)
+
+        for index, corrected in zip(dirty, await asyncio.gather(*(correct(index) for index in dirty))):
+            parts[index] = corrected
+    await loop.run_in_executor(None, record_stats, clean, 0)
+    return "".join(parts), clean, len(dirty)
+
+
+def main(argv=None):
+    """
+    Entry point for `ds spell stats|build`.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="ds spell", description="Local dictionary for spell mode")
+    parser.add_argument("action", choices=["stats", "build"],
+                        help="Show the local hit ratio, or rebuild the dictionary from the word list")
+    args = parser.parse_args(argv)
+
+    if args.action == "build":
+        if not config.SPELL_WORDLIST.exists():
+            parser.error(f"word list {config.SPELL_WORDLIST} not found (set DS_SPELL_WORDLIST)")
+        count = BloomFilter.build(read_wordlist(config.SPELL_WORDLIST), dictionary_path())
+        print(f"Built {dictionary_path()} from {config.SPELL_WORDLIST} ({count} words)")
+        return
+
+    stats = read_stats()
+    sentences = stats.get("local", 0) + stats.get("api", 0)
+    ratio = stats.get("local", 0) / sentences if sentences else 0.0
+    dictionary = get_dictionary()
+    print(f"word list:       {config.SPELL_WORDLIST}" + ("" if dictionary else " (missing; fast path off)"))
+    print(f"user dictionary: {config.SPELL_USER_DICT}" + (f" ({len(dictionary.user_words)} words)" if dictionary else ""))
+    print(f"local:           {stats.get('local', 0)} sentences")
+    print(f"api:             {stats.get('api', 0)} sentences")
+    print(f"hit ratio:       {ratio:.1%}")
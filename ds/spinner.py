@@ -0,0 +1,89 @@
+"""
+Terminal activity spinner.
+
+The spinner draws on stderr from a background thread that sleeps on an event
+rather than a fixed ``time.sleep``, so stop() returns as soon as the current
+frame (if any) has been written instead of waiting out the frame interval.
+Nothing is drawn unless the target stream is a terminal, and stdout is never
+written to, so it cannot interleave with response output.
+"""
+
+import sys
+import threading
+from typing import TextIO
+
+FRAMES = ("|", "/", "-", "\\")
+# Carriage return plus "erase to end of line"
+CLEAR_LINE = "\r\033[K"
+
+
+class Spinner:
+    """
+    Event-driven spinner that can be stopped without delay.
+    """
+
+    def __init__(self, message: str = "Thinking...", stream: TextIO = None, interval: float = 0.1,
+                 enabled: bool = True):
+        """
+        Initialize the spinner.
+
+        Args:
+            message: Text shown after the spinning character.
+            stream: Terminal stream to draw on (defaults to stderr).
+            interval: Seconds between frames.
+            enabled: Whether to draw at all; ignored (treated as False) when the stream is not a TTY.
+        """
+        self.message = message
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        isatty = getattr(self.stream, "isatty", None)
+        self.enabled = enabled and bool(isatty and isatty())
+        self._stop = threading.Event()
+        self._draw_lock = threading.Lock()
+        self._thread = None
+        self._drawn = False
+
+    def start(self):
+        """
+        Start drawing frames in the background.
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ds-spinner", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        idx = 0
+        while True:
+            with self._draw_lock:
+                if self._stop.is_set():
+                    return
+                self.stream.write(f"\r{FRAMES[idx]} {self.message}")
+                self.stream.flush()
+                self._drawn = True
+            idx = (idx + 1) % len(FRAMES)
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self):
+        """
+        Stop the spinner and erase its line. Safe to call more than once.
+
+        Returns as soon as any frame being drawn has finished; the background
+        thread is not joined, it exits on its own when it wakes.
+        """
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        with self._draw_lock:
+            if self._drawn:
+                self.stream.write(CLEAR_LINE)
+                self.stream.flush()
+                self._drawn = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,251 @@
+"""
+Latency and token usage statistics over the chat history.
+
+`ds stats` streams every history entry once, oldest first, and folds it into
+per-group accumulators. Latency percentiles come from a log-bucketed sketch
+with a fixed relative error, so memory depends on the number of groups, not
+on the number of entries.
+"""
+
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from . import config
+from .history import iter_entries
+
+DIMENSIONS = ("model", "mode", "day")
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """
+    Streaming quantile estimator with bounded relative error.
+
+    Values are counted in logarithmic buckets whose width is set by the
+    relative error, so about 900 buckets cover 0.1 ms to 3 hours at 1%.
+    """
+
+    def __init__(self, relative_error: float = 0.01):
+        """
+        Initialize the sketch.
+
+        Args:
+            relative_error: Maximum relative error of reported quantiles.
+        """
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value: float):
+        """
+        Record one value.
+        """
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Args:
+            q: Quantile between 0 and 1.
+
+        Returns:
+            The estimate, or None if no values were recorded.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class GroupStats:
+    """
+    Accumulated metrics for one group of history entries.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.cached = 0
+        self.latency = QuantileSketch()
+        self.ttft = QuantileSketch()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit_tokens = 0
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+
+    def add(self, entry: Dict[str, Any]):
+        """
+        Fold one history entry into the group.
+
+        Response-cache hits are counted but left out of latency and token
+        figures, since no API request was made.
+        """
+        self.requests += 1
+        if entry.get("cached"):
+            self.cached += 1
+            return
+
+        latency = entry.get("latency_ms")
+        ttft = entry.get("ttft_ms")
+        if latency is not None:
+            self.latency.add(latency)
+        if ttft is not None:
+            self.ttft.add(ttft)
+
+        usage = entry.get("usage") or {}
+        completion = usage.get("completion_tokens") or 0
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += completion
+        self.cache_hit_tokens += usage.get("cache_hit_tokens") or 0
+        if completion and latency:
+            # Generation time runs from the first token; non-streamed requests only have the total
+            generating = latency - ttft if ttft is not None and latency > ttft else latency
+            self.generated_tokens += completion
+            self.generation_seconds += generating / 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return the group's figures (latencies in milliseconds).
+        """
+        result = {"requests": self.requests, "cached": self.cached}
+        for q in QUANTILES:
+            name = f"p{round(q * 100)}"
+            result[f"latency_{name}_ms"] = _round(self.latency.quantile(q))
+            result[f"ttft_{name}_ms"] = _round(self.ttft.quantile(q))
+        result["tokens_per_sec"] = (
+            round(self.generated_tokens / self.generation_seconds, 1) if self.generation_seconds > 0 else None
+        )
+        result["prompt_tokens"] = self.prompt_tokens
+        result["completion_tokens"] = self.completion_tokens
+        result["cache_hit_tokens"] = self.cache_hit_tokens
+        return result
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def group_key(entry: Dict[str, Any], by: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Return the values of the grouping dimensions for an entry.
+    """
+    values = {
+        "model": entry.get("model") or "-",
+        "mode": entry.get("mode") or "-",
+        "day": (entry.get("timestamp") or "-")[:10],
+    }
+    return tuple(values[dimension] for dimension in by)
+
+
+def aggregate(entries: Iterable[Dict[str, Any]], by: Tuple[str, ...] = DIMENSIONS, since: str = None,
+              until: str = None) -> Tuple[Dict[Tuple[str, ...], GroupStats], GroupStats]:
+    """
+    Aggregate history entries per group in a single pass.
+
+    Args:
+        entries: History entries, e.g. from ds.history.iter_entries.
+        by: Grouping dimensions, any of "model", "mode" and "day".
+        since: Only entries on or after this date (YYYY-MM-DD).
+        until: Only entries on or before this date (YYYY-MM-DD).
+
+    Returns:
+        A tuple of (per-group stats keyed by dimension values, overall stats).
+    """
+    groups: Dict[Tuple[str, ...], GroupStats] = {}
+    total = GroupStats()
+    for entry in entries:
+        day = (entry.get("timestamp") or "")[:10]
+        if (since and day < since) or (until and day > until):
+            continue
+        key = group_key(entry, by)
+        if key not in groups:
+            groups[key] = GroupStats()
+        groups[key].add(entry)
+        total.add(entry)
+    return groups, total
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.0f}" if value >= 100 else f"{value:.1f}"
+    return str(value)
+
+
+def format_table(groups: Dict[Tuple[str, ...], GroupStats], total: GroupStats, by: Tuple[str, ...]) -> str:
+    """
+    Render aggregated stats as an aligned text table.
+    """
+    columns = [
+        ("requests", "requests"), ("cached", "cached"),
+        ("latency_p50_ms", "p50 ms"), ("latency_p95_ms", "p95 ms"), ("latency_p99_ms", "p99 ms"),
+        ("ttft_p50_ms", "ttft p50"), ("ttft_p95_ms", "ttft p95"), ("tokens_per_sec", "tok/s"),
+        ("prompt_tokens", "prompt"), ("completion_tokens", "completion"), ("cache_hit_tokens", "cache hit"),
+    ]
+    header = list(by) + [label for _, label in columns]
+    rows = []
+    for key in sorted(groups):
+        data = groups[key].as_dict()
+        rows.append(list(key) + [_cell(data[name]) for name, _ in columns])
+    data = total.as_dict()
+    rows.append(["total"] + [""] * (len(by) - 1) + [_cell(data[name]) for name, _ in columns])
+
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        cells = [
+            cell.ljust(width) if i < len(by) else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))
+        ]
+        lines.append("  ".join(cells).rstrip())
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """
+    Entry point for `ds stats`.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="ds stats", description="Latency and token usage from the chat history")
+    parser.add_argument("--by", default="model,mode,day",
+                        help="Comma-separated grouping dimensions: model, mode, day (default: model,mode,day)")
+    parser.add_argument("--since", metavar="YYYY-MM-DD", help="Only entries on or after this date")
+    parser.add_argument("--until", metavar="YYYY-MM-DD", help="Only entries on or before this date")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per group")
+    args = parser.parse_args(argv)
+
+    by = tuple(dimension.strip() for dimension in args.by.split(",") if dimension.strip())
+    unknown = [dimension for dimension in by if dimension not in DIMENSIONS]
+    if not by or unknown:
+        parser.error(f"--by takes a comma-separated subset of {', '.join(DIMENSIONS)}")
+
+    groups, total = aggregate(iter_entries(Path(config.LOG_FILE)), by, args.since, args.until)
+    if args.json:
+        for key in sorted(groups):
+            print(json.dumps({**dict(zip(by, key)), **groups[key].as_dict()}))
+        print(json.dumps({"total": True, **total.as_dict()}))
+        return
+    if not total.requests:
+        print("No history entries found", file=sys.stderr)
+        return
+    print(format_table(groups, total, by))
@@ -0,0 +1,138 @@
+"""
+Per-phase latency breakdown for `--timings` / DS_TIMINGS.
+
+A Timings object collects perf_counter marks at phase boundaries of a single
+request. DeepSeekChat.chat only marks phases (never individual chunks), and
+callers that do not ask for timings pass None, which costs one comparison
+per phase.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Optional, TextIO
+
+# (report key, label, start mark, end mark)
+SPANS = (
+    ("import_ms", "process start -> imports done", "process_start", "imported"),
+    ("client_ms", "client construction", "client_start", "client_ready"),
+    ("request_sent_ms", "request sent", "chat_start", "request_sent"),
+    ("first_byte_ms", "first byte", "request_sent", "first_byte"),
+    ("first_token_ms", "first token", "request_sent", "first_token"),
+    ("last_token_ms", "last token", "request_sent", "last_token"),
+    ("render_ms", "render", "render_start", "render_end"),
+    ("log_ms", "log write", "log_start", "log_end"),
+)
+
+
+def process_start() -> Optional[float]:
+    """
+    Return the perf_counter value at which this process started.
+
+    Reads the start time from /proc (clock-tick resolution, usually 10 ms), so
+    interpreter startup is included. Returns None where that is unavailable.
+    """
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.perf_counter() - (time.clock_gettime(time.CLOCK_BOOTTIME) - started)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Timings:
+    """
+    Phase marks and counters for one request.
+    """
+
+    def __init__(self):
+        self.marks: Dict[str, float] = {}
+        self.values: Dict[str, Any] = {}
+
+    def mark(self, name: str, at: float = None):
+        """
+        Record the time a phase boundary was reached.
+
+        Args:
+            name: Mark name (see SPANS).
+            at: perf_counter value (defaults to now).
+        """
+        self.marks[name] = time.perf_counter() if at is None else at
+
+    def mark_process_start(self, imported: float = None):
+        """
+        Record process start and the end of imports.
+
+        Args:
+            imported: perf_counter value when imports finished (defaults to now).
+        """
+        started = process_start()
+        if started is not None:
+            self.mark("process_start", started)
+        self.mark("imported", imported)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Return the measured phases in milliseconds plus counters.
+
+        request_sent_ms is measured from the start of the chat call, and the
+        first byte/first token/last token figures from the moment the request
+        was sent. Phases that did not happen are omitted.
+        """
+        result = {}
+        for key, _, start, end in SPANS:
+            if start in self.marks and end in self.marks:
+                result[key] = round((self.marks[end] - self.marks[start]) * 1000, 1)
+        tokens = self.values.get("tokens")
+        if tokens and "first_token" in self.marks and "last_token" in self.marks:
+            generating = self.marks["last_token"] - self.marks["first_token"]
+            if generating > 0:
+                result["tokens_per_sec"] = round(tokens / generating, 1)
+        result.update(self.values)
+        return result
+
+    def merge(self, remote: Dict[str, Any]):
+        """
+        Add phases measured by a ds daemon on our behalf.
+
+        Local phases (process start and imports) are kept.
+        """
+        for key, value in remote.items():
+            if key != "import_ms":
+                self.values[key] = value
+        self.values["daemon"] = True
+
+    def format_text(self) -> str:
+        """
+        Render the breakdown as aligned human-readable lines.
+        """
+        data = self.as_dict()
+        lines = ["timings:"]
+        for key, label, _, _ in SPANS:
+            if key in data:
+                lines.append(f"  {label:<30} {data[key]:>9.1f} ms")
+        if "tokens" in data:
+            rate = f", {data['tokens_per_sec']:.1f} tokens/s" if "tokens_per_sec" in data else ""
+            lines.append(f"  {'tokens':<30} {data['tokens']:>9}{rate}")
+        for flag in ("cached", "daemon"):
+            if data.get(flag):
+                lines.append(f"  ({'answered from the response cache' if flag == 'cached' else 'served by ds daemon'})")
+        return "\n".join(lines)
+
+    def report(self, fmt: str = "text", stream: TextIO = None):
+        """
+        Write the breakdown to stderr as text or as one JSON line.
+
+        Args:
+            fmt: "text" or "json".
+            stream: Destination (defaults to stderr).
+        """
+        stream = stream if stream is not None else sys.stderr
+        if fmt == "json":
+            stream.write(json.dumps(self.as_dict()) + "\n")
+        else:
+            stream.write(self.format_text() + "\n")
+        stream.flush()
@@ -0,0 +1,322 @@
+"""
+Document translation pipeline for `ds -t -` and `ds -t --file`.
+
+A document is split into paragraphs, with fenced code blocks kept whole and
+left untranslated. Paragraphs are translated concurrently over one shared
+DeepSeekChat using the `trans` prompt and written back in document order as
+soon as every earlier paragraph is done. A translation memory keyed by a
+hash of (model, prompt, paragraph) remembers finished segments, so
+re-translating an edited document only sends the paragraphs that changed.
+A paragraph that still fails after retries is kept in the source language
+and reported, instead of losing the whole document.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, TextIO
+
+from . import config
+
+DEFAULT_CONCURRENCY = 8
+# Opening or closing line of a fenced code block (CommonMark allows three spaces of indent)
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class Segment(NamedTuple):
+    """
+    A piece of a document.
+
+    Attributes:
+        text: Source text, including its trailing line breaks.
+        translate: False for code blocks and blank lines, which are copied verbatim.
+    """
+    text: str
+    translate: bool
+
+
+def split_segments(text: str) -> List[Segment]:
+    """
+    Split a document into paragraphs, code blocks and the blank lines between them.
+
+    Joining the texts of the returned segments gives back the document exactly.
+    An unterminated code fence runs to the end of the document.
+
+    Args:
+        text: Document text.
+
+    Returns:
+        Segments in document order.
+    """
+    segments: List[Segment] = []
+    paragraph: List[str] = []
+    verbatim: List[str] = []
+    fence = None
+
+    def flush_paragraph():
+        if paragraph:
+            segments.append(Segment("".join(paragraph), True))
+            paragraph.clear()
+
+    def flush_verbatim():
+        if verbatim:
+            segments.append(Segment("".join(verbatim), False))
+            verbatim.clear()
+
+    for line in text.splitlines(keepends=True):
+        if fence is not None:
+            verbatim.append(line)
+            stripped = line.strip()
+            if stripped.startswith(fence) and stripped == stripped[0] * len(stripped):
+                fence = None
+            continue
+        match = FENCE_RE.match(line)
+        if match:
+            flush_paragraph()
+            fence = match.group(1)
+            verbatim.append(line)
+        elif not line.strip():
+            flush_paragraph()
+            verbatim.append(line)
+        else:
+            if verbatim and not paragraph:
+                flush_verbatim()
+            paragraph.append(line)
+    flush_paragraph()
+    flush_verbatim()
+    return segments
+
+
+def segment_key(model: str, system_prompt: str, text: str) -> str:
+    """
+    Return the translation memory key of a paragraph.
+
+    Surrounding whitespace is ignored, so re-wrapping blank lines around an
+    unchanged paragraph still hits the memory.
+    """
+    material = json.dumps([model, system_prompt, text.strip()], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    Persistent map from segment key to translated text, stored in SQLite.
+    """
+
+    def __init__(self, path: Path = None):
+        """
+        Initialize the memory.
+
+        Args:
+            path: SQLite database path (defaults to a file in the cache directory).
+        """
+        self.path = Path(path) if path else config.CACHE_DIR / "translation-memory.sqlite3"
+        self._conn = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def lookup(self, keys: Iterable[str]) -> Dict[str, str]:
+        """
+        Return the stored translations among the given keys.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        # Stay under SQLite's default limit on bound parameters
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self.conn.execute(f"SELECT key, target FROM segments WHERE key IN ({placeholders})", batch))
+        return found
+
+    def store(self, key: str, source: str, target: str):
+        """
+        Remember the translation of a segment.
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO segments (key, source, target, updated) VALUES (?, ?, ?, ?)",
+            (key, source, target, time.time()),
+        )
+
+
+def _reattach(source: str, translated: str) -> str:
+    """
+    Give a translated paragraph the source paragraph's leading and trailing whitespace.
+    """
+    body = source.strip()
+    start = source.index(body[0]) if body else 0
+    return source[:start] + translated.strip() + source[start + len(body):]
+
+
+class DocumentTranslator:
+    """
+    Translate documents paragraph by paragraph over one DeepSeekChat.
+    """
+
+    def __init__(self, chat_instance, language: str = "Chinese", concurrency: int = DEFAULT_CONCURRENCY,
+                 memory: Optional[TranslationMemory] = None, use_memory: bool = True, refresh: bool = False):
+        """
+        Initialize the translator.
+
+        Args:
+            chat_instance: DeepSeekChat shared by all worker threads.
+            language: Target language.
+            concurrency: Maximum number of paragraphs in flight.
+            memory: Translation memory (defaults to the one in the cache directory).
+            use_memory: Whether the translation memory is read and written.
+            refresh: Skip memory lookups but store fresh translations.
+        """
+        self.chat = chat_instance
+        self.language = language
+        self.concurrency = max(1, concurrency)
+        self.memory = memory if memory is not None else TranslationMemory()
+        self.use_memory = use_memory
+        self.refresh = refresh
+
+    def _translate(self, text: str) -> str:
+        response = self.chat.chat(text.strip(), "trans", self.language, stream=False, use_cache=False)
+        return _reattach(text, response.text)
+
+    def translate(self, text: str, output: TextIO = None) -> Dict[str, Any]:
+        """
+        Translate a document.
+
+        Args:
+            text: Document text.
+            output: Optional text stream that receives the translation in
+                document order while later paragraphs are still in flight.
+
+        Returns:
+            Summary with the translated "text", segment counts ("segments",
+            "from_memory", "translated", "failed"), per-segment "errors" and "seconds".
+        """
+        start = time.perf_counter()
+        segments = split_segments(text)
+        system_prompt = self.chat.build_system_prompt("trans", self.language)
+        keys = [segment_key(self.chat.model, system_prompt, s.text) if s.translate else None for s in segments]
+        remembered = {}
+        if self.use_memory and not self.refresh:
+            remembered = self.memory.lookup(key for key in keys if key is not None)
+
+        results: List[Optional[str]] = [None] * len(segments)
+        errors = []
+        written = 0
+        counts = {"from_memory": 0, "translated": 0, "failed": 0}
+
+        def emit():
+            nonlocal written
+            while written < len(results) and results[written] is not None:
+                if output is not None:
+                    output.write(results[written])
+                    output.flush()
+                written += 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {}
+            for index, (segment, key) in enumerate(zip(segments, keys)):
+                if not segment.translate:
+                    results[index] = segment.text
+                elif key in remembered:
+                    results[index] = _reattach(segment.text, remembered[key])
+                    counts["from_memory"] += 1
+                else:
+                    futures[executor.submit(self._translate, segment.text)] = index
+            emit()
+
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures[future]
+                    segment = segments[index]
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        # Keep the source paragraph so the document stays complete
+                        results[index] = segment.text
+                        counts["failed"] += 1
+                        errors.append({"segment": index, "error": str(e)})
+                        continue
+                    counts["translated"] += 1
+                    if self.use_memory:
+                        self.memory.store(keys[index], segment.text.strip(), results[index].strip())
+                emit()
+
+        return {
+            "text": "".join(results),
+            "segments": sum(segment.translate for segment in segments),
+            **counts,
+            "errors": errors,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """
+    Render a translation summary as one human-readable line.
+    """
+    return (
+        f"translate: {summary['segments']} paragraphs ({summary['from_memory']} from memory, "
+        f"{summary['translated']} translated, {summary['failed']} failed) in {summary['seconds']:.2f}s"
+    )
+
+
+def translate_document(text: str, language: str = "Chinese", output: TextIO = None,
+                       concurrency: int = DEFAULT_CONCURRENCY, use_memory: bool = True,
+                       refresh: bool = False) -> Dict[str, Any]:
+    """
+    Translate a document with a fresh DeepSeekChat and report progress on stderr.
+
+    Args:
+        text: Document text.
+        language: Target language.
+        output: Optional text stream that receives the translation in order.
+        concurrency: Maximum number of paragraphs in flight.
+        use_memory: Whether the translation memory is read and written.
+        refresh: Skip memory lookups but store fresh translations.
+
+    Returns:
+        The summary from DocumentTranslator.translate.
+    """
+    from .chat import DeepSeekChat
+    from .utils import format_info_message
+
+    # Worker threads must not draw spinners, and translations are plain text
+    config.SPINNER = False
+    chat_instance = DeepSeekChat(enable_color=False)
+    if not chat_instance.api_key:
+        raise ValueError("API key is missing. Please set the DEEPSEEK_API_KEY environment variable.")
+
+    translator = DocumentTranslator(chat_instance, language, concurrency, use_memory=use_memory, refresh=refresh)
+    try:
+        summary = translator.translate(text, output)
+    finally:
+        translator.memory.close()
+    print(format_info_message(format_summary(summary), config.ENABLE_COLOR and sys.stderr.isatty()), file=sys.stderr)
+    return summary
@@ -1,3 +1,11 @@
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl; fall back to unlocked updates
+    fcntl = None
+
 # Import ANSI color codes for message formatting
 from .highlighter import COLORS
 
@@ -11,6 +19,47 @@ from .highlighter import (
 )
 
 
+@contextmanager
+def file_lock(lock_path: Path):
+    """
+    Hold an exclusive advisory lock shared by every process using the same lock file.
+    
+    Args:
+        lock_path: Path of the lock file (created if missing).
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def resolve_language(mode: str, language: str = None) -> str:
+    """
+    Resolve the response language for a mode.
+    
+    Translation only supports English and Chinese: "en"/"english" selects English
+    and anything else (including no value) selects Chinese. Other modes answer in
+    the given language, defaulting to English.
+    
+    Args:
+        mode: Operation mode ("normal", "spell", "trans").
+        language: Requested language, if any.
+        
+    Returns:
+        Language name to pass to the system prompt.
+    """
+    if mode == "trans":
+        if language and language.lower() in ['en', 'english']:
+            return "English"
+        return "Chinese"
+    return language or "English"
+
+
 def format_error_message(error_type: str, message: str, enable_color: bool = True) -> str:
     """
     Format error messages with appropriate colors.
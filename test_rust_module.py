@@ -19,27 +19,17 @@ try:
     print(f"输入: {input_text}")
     print(f"输出: {result}")
     
-    # 测试highlight_code函数
-    print("\n=== 测试 highlight_code ===")
-    code = '''def hello():
-    # This is a comment
-    print("Hello World")
-    return 42'''
-    result = _ds_highlighter.highlight_code_py(code, "dracula")
-    print(f"原始代码:")
-    print(code)
-    print(f"\n高亮代码:")
-    print(result)
-    
-    # 测试highlight函数
-    print("\n=== 测试 highlight ===")
+    # 测试流式渲染器（Python代码块在Rust端高亮）
+    print("\n=== 测试 StreamHighlighter ===")
     content = '''Some text
 ```python
 def hello():
     print("Hello")
 ```
 More text'''
-    result = _ds_highlighter.highlight_py(content, "monokai")
+    theme_ansi = {"keyword": "\x1B[35m", "function": "\x1B[32m", "string": "\x1B[33m"}
+    renderer = _ds_highlighter.StreamHighlighter(theme_ansi)
+    result = renderer.feed(content) + renderer.close()
     print(f"原始内容:")
     print(content)
     print(f"\n高亮内容:")
@@ -0,0 +1,112 @@
+"""
+Shared fixtures for the ds test suite.
+"""
+
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def make_chunk(content):
+    """
+    Build an object shaped like a streamed chat completion chunk.
+    """
+    delta = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def make_usage(completion_tokens, prompt_tokens=10, cache_hit_tokens=4):
+    """
+    Build an object shaped like DeepSeek's usage block.
+    """
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens,
+                           prompt_cache_hit_tokens=cache_hit_tokens,
+                           prompt_cache_miss_tokens=prompt_tokens - cache_hit_tokens)
+
+
+def make_completion(content, usage=None):
+    """
+    Build an object shaped like a non-streamed chat completion.
+    """
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeCompletions:
+    """
+    Stand-in for ``client.chat.completions`` that replays canned content.
+    """
+
+    def __init__(self, pieces):
+        self.pieces = list(pieces)
+        self.calls = []
+        self.consumed = 0
+        self.include_usage = False
+
+    def _stream(self):
+        for piece in self.pieces:
+            self.consumed += 1
+            yield make_chunk(piece)
+        if self.include_usage:
+            yield SimpleNamespace(choices=[], usage=make_usage(len(self.pieces)))
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs.get("stream"):
+            self.include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return self._stream()
+        return make_completion("".join(self.pieces), make_usage(len(self.pieces)))
+
+
+class FakeClient:
+    """
+    Minimal object exposing ``chat.completions.create``.
+    """
+
+    def __init__(self, pieces):
+        self.chat = SimpleNamespace(completions=FakeCompletions(pieces))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """
+    Point the response cache at a per-test directory, with no spell word lists.
+    """
+    from ds import config
+
+    monkeypatch.setattr(config, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(config, "SPELL_WORDLIST", tmp_path / "no-words")
+    monkeypatch.setattr(config, "SPELL_USER_DICT", tmp_path / "no-user-words")
+
+
+@pytest.fixture
+def fake_chat(tmp_path):
+    """
+    Return a factory producing DeepSeekChat instances backed by a fake client.
+    """
+    from ds.chat import DeepSeekChat
+
+    def factory(pieces):
+        instance = DeepSeekChat(api_key="sk-test", base_url="http://localhost", model="deepseek-chat",
+                                log_file=tmp_path / "chat_history.jsonl")
+        instance.client = FakeClient(pieces)
+        return instance
+
+    return factory
+
+
+def read_log(path):
+    """
+    Read every entry from a JSONL chat history file, after pending writes land.
+    """
+    from ds.history import flush_history
+
+    flush_history()
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
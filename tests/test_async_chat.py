@@ -0,0 +1,192 @@
+"""
+Tests for AsyncDeepSeekChat.
+"""
+
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from ds import aretry, config
+from ds.async_chat import AsyncDeepSeekChat, StreamChunk
+from ds.chat import DeepSeekChat
+from ds.highlighter import render_content
+from conftest import make_chunk, make_completion, read_log
+
+PIECES = ["Answer: ", "```python\n", "x = 1\n", "```", " done"]
+
+
+class FakeAsyncStream:
+    """
+    Async iterator over chunks with an optional delay and a close() record.
+    """
+
+    def __init__(self, pieces, delay=0.0):
+        self.pieces = list(pieces)
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for piece in self.pieces:
+            await asyncio.sleep(self.delay)
+            yield make_chunk(piece)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncCompletions:
+    def __init__(self, pieces, delay=0.0):
+        self.pieces = pieces
+        self.delay = delay
+        self.calls = []
+        self.streams = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        if kwargs["stream"]:
+            stream = FakeAsyncStream(self.pieces, self.delay)
+            self.streams.append(stream)
+            return stream
+        return make_completion("".join(self.pieces))
+
+
+@pytest.fixture
+def async_chat(tmp_path):
+    def factory(pieces, delay=0.0):
+        instance = AsyncDeepSeekChat(api_key="sk-test", base_url="http://localhost", model="deepseek-chat",
+                                     log_file=tmp_path / "chat_history.jsonl")
+        instance.client = type("Client", (), {})()
+        instance.client.chat = type("Chat", (), {})()
+        instance.client.chat.completions = FakeAsyncCompletions(pieces, delay)
+        return instance
+    return factory
+
+
+def test_astream_yields_raw_and_rendered_chunks(async_chat, tmp_path):
+    instance = async_chat(PIECES)
+
+    async def collect():
+        return [chunk async for chunk in instance.astream("q")]
+
+    chunks = asyncio.run(collect())
+    assert all(isinstance(chunk, StreamChunk) for chunk in chunks)
+    assert "".join(chunk.raw for chunk in chunks) == "".join(PIECES)
+    assert chunks[0].rendered == "Answer: "
+    # The code block is only rendered once its closing fence arrives
+    assert [chunk.rendered for chunk in chunks[1:3]] == ["", ""]
+    assert "x" in chunks[3].rendered
+    assert len(read_log(tmp_path / "chat_history.jsonl")) == 1
+
+
+def test_achat_matches_sync_semantics(async_chat, fake_chat, tmp_path):
+    expected = render_content("".join(PIECES))
+
+    assert asyncio.run(async_chat(PIECES).achat("q", mode="spell")).rendered == expected
+    assert asyncio.run(async_chat(PIECES).achat("q2", stream=True)).rendered == expected
+
+    sync_instance = fake_chat(PIECES)
+    async_instance = async_chat(PIECES)
+    assert sync_instance.build_system_prompt("trans", "Chinese") == async_instance.build_system_prompt("trans", "Chinese")
+    assert isinstance(async_instance, DeepSeekChat)
+    entries = read_log(tmp_path / "chat_history.jsonl")
+    assert [entry["messages"][1]["content"] for entry in entries] == ["q", "q2"]
+
+
+def test_cache_hits_skip_the_api(async_chat):
+    asyncio.run(async_chat(["fixed"]).achat("teh", mode="spell"))
+    again = async_chat(["unused"])
+
+    assert asyncio.run(again.achat("teh", mode="spell")).text == "fixed"
+    assert again.client.chat.completions.calls == []
+
+
+def test_many_concurrent_requests_in_one_loop(async_chat):
+    instance = async_chat(["ok"], delay=0.05)
+
+    async def run_all():
+        return await asyncio.gather(*(instance.achat(f"q{i}") for i in range(200)))
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    assert [result.text for result in results] == ["ok"] * 200
+    # 200 requests of 50 ms each finish together rather than one after another
+    assert time.perf_counter() - start < 2.0
+
+
+def test_cancellation_closes_stream_and_skips_log(async_chat, tmp_path):
+    instance = async_chat(["a"] * 100, delay=0.01)
+
+    async def consume():
+        async for _ in instance.astream("q"):
+            pass
+
+    async def cancel_soon():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_soon())
+    assert instance.client.chat.completions.streams[0].closed
+    assert not (tmp_path / "chat_history.jsonl").exists()
+
+
+def test_api_errors_are_wrapped(async_chat):
+    instance = async_chat([])
+
+    async def fail(**kwargs):
+        raise ValueError("bad request")
+
+    instance.client.chat.completions.create = fail
+    with pytest.raises(RuntimeError, match="unexpected error occurred: bad request"):
+        asyncio.run(instance.achat("q"))
+
+
+def test_achat_retries_connection_errors_and_logs_retries(async_chat, tmp_path, monkeypatch):
+    monkeypatch.setattr(aretry, "backoff_delay", lambda *args, **kwargs: 0)
+    instance = async_chat(["Hel", "lo"])
+    completions = instance.client.chat.completions
+    create = completions.create
+    failures = [openai.APIConnectionError(request=httpx.Request("POST", "http://localhost"))]
+
+    async def flaky(**kwargs):
+        if failures:
+            raise failures.pop()
+        return await create(**kwargs)
+
+    monkeypatch.setattr(completions, "create", flaky)
+    assert asyncio.run(instance.achat("q", use_cache=False)).text == "Hello"
+    assert read_log(tmp_path / "chat_history.jsonl")[-1]["retries"] == 1
+
+
+def test_spell_fast_path_is_shared_with_the_sync_chat(async_chat, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SPELL_WORDLIST", tmp_path / "words")
+    (tmp_path / "words").write_text("the\nquick\nfox\nlazy\ndog\n", encoding="utf-8")
+    instance = async_chat(["The lazy dog."])
+
+    assert asyncio.run(instance.achat("The quick fox.", mode="spell")).text == "The quick fox."
+    assert not instance.client.chat.completions.calls
+    assert read_log(tmp_path / "chat_history.jsonl")[-1]["local"] is True
+
+    async def collect():
+        return [chunk.raw async for chunk in instance.astream("The quick fox.  Teh lazzy dog.", mode="spell")]
+
+    assert asyncio.run(collect()) == ["The quick fox.  The lazy dog."]
+    # Only the sentence with unknown words was sent
+    assert [call["messages"][-1]["content"] for call in instance.client.chat.completions.calls] == ["Teh lazzy dog."]
+
+
+def test_params_override_stream_options(async_chat):
+    instance = async_chat(["a"])
+    instance.params = {"stream_options": {"include_usage": False}}
+
+    assert asyncio.run(instance.achat("q", stream=True)).text == "a"
+    assert instance.client.chat.completions.calls[0]["stream_options"] == {"include_usage": False}
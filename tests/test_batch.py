@@ -0,0 +1,120 @@
+"""
+Tests for concurrent batch mode.
+"""
+
+import io
+import json
+import threading
+import time
+
+from ds.batch import BatchRunner
+from conftest import make_completion, read_log
+
+
+class SlowCompletions:
+    """
+    Fake completions endpoint with per-query latency and a concurrency gauge.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def create(self, messages, **kwargs):
+        query = messages[1]["content"]
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if query == "boom":
+                raise ValueError("server exploded")
+            time.sleep(0.05 if query.startswith("slow") else 0.005)
+            return make_completion(f"{query}|{messages[0]['content'].splitlines()[-1]}")
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def run(fake_chat, lines, **kwargs):
+    instance = fake_chat([])
+    instance.enable_color = False
+    instance.client.chat.completions = SlowCompletions()
+    output = io.StringIO()
+    summary = BatchRunner(instance, **kwargs).run(lines, output)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    return instance, summary, results
+
+
+def test_results_in_input_order_with_per_item_errors(fake_chat):
+    lines = [
+        json.dumps({"query": "slow one", "id": "a"}),
+        json.dumps({"query": "boom", "mode": "spell"}),
+        "not json",
+        "",
+        json.dumps({"query": "fast", "mode": "trans", "language": "en"}),
+    ]
+    instance, summary, results = run(fake_chat, lines, concurrency=4)
+
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert results[0]["id"] == "a"
+    assert results[0]["response"].startswith("slow one|")
+    assert "server exploded" in results[1]["error"]
+    assert results[2]["error"].startswith("Invalid input line")
+    assert results[3]["response"].endswith("Target language: English")
+    assert (summary["items"], summary["succeeded"], summary["failed"]) == (4, 2, 2)
+    # Successful and failed API calls are both handled; only successes are logged
+    assert len(read_log(instance.log_file)) == 2
+
+
+def test_invalid_language_is_a_per_item_error(fake_chat):
+    lines = [json.dumps({"query": "x", "mode": "trans", "language": 5}), json.dumps({"query": "ok"})]
+    _, summary, results = run(fake_chat, lines)
+
+    assert '"language" must be a string' in results[0]["error"]
+    assert results[1]["error"] is None
+    assert summary["failed"] == 1
+
+
+def test_ordered_read_ahead_is_bounded_behind_a_slow_item(fake_chat):
+    instance = fake_chat([])
+    instance.enable_color = False
+    instance.client.chat.completions = SlowCompletions()
+    consumed = []
+
+    def lines():
+        for i in range(30):
+            consumed.append(i)
+            yield json.dumps({"query": "slow head" if i == 0 else f"q{i}"})
+
+    runner = BatchRunner(instance, concurrency=2)
+    write = runner._write
+    consumed_at_head = []
+
+    def record(output, result):
+        if result["index"] == 0:
+            consumed_at_head.append(len(consumed))
+        write(output, result)
+
+    runner._write = record
+    output = io.StringIO()
+    runner.run(lines(), output)
+
+    assert consumed_at_head[0] <= 2 * 2 + 1
+    assert [json.loads(line)["index"] for line in output.getvalue().splitlines()] == list(range(30))
+
+
+def test_completion_order_and_concurrency_bound(fake_chat):
+    lines = [json.dumps({"query": "slow first"})] + [json.dumps({"query": f"q{i}"}) for i in range(20)]
+    instance, summary, results = run(fake_chat, lines, concurrency=3, ordered=False)
+
+    assert sorted(r["index"] for r in results) == list(range(21))
+    assert results[0]["index"] != 0
+    assert instance.client.chat.completions.peak <= 3
+    assert summary["items_per_second"] > 0
+
+
+def test_batch_uses_the_same_prompts_as_single_queries(fake_chat):
+    _, _, results = run(fake_chat, [json.dumps({"query": "x", "mode": "spell"})])
+    prompt = fake_chat([]).build_system_prompt("spell", "English")
+    assert results[0]["response"] == "x|" + prompt.splitlines()[-1]
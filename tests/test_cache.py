@@ -0,0 +1,117 @@
+"""
+Tests for the on-disk response cache.
+"""
+
+import io
+import multiprocessing
+import os
+import time
+
+from ds.cache import ResponseCache, get_response_cache
+
+
+def test_keys_cover_every_input():
+    base = ("deepseek-chat", "https://api.deepseek.com", "prompt", "query", {"temperature": 0})
+    key = ResponseCache.make_key(*base)
+
+    assert key == ResponseCache.make_key(*base)
+    for index, other in enumerate(("deepseek-reasoner", "http://proxy", "other prompt", "other query", {"temperature": 1})):
+        changed = list(base)
+        changed[index] = other
+        assert ResponseCache.make_key(*changed) != key
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = ResponseCache(tmp_path)
+    key = ResponseCache.make_key("m", "u", "p", "q")
+
+    assert cache.get(key, ttl=60) is None
+    cache.put(key, "réponse")
+    assert cache.get(key, ttl=60) == "réponse"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["bytes"] > 0
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResponseCache(tmp_path)
+    key = ResponseCache.make_key("m", "u", "p", "q")
+    cache.put(key, "old")
+
+    assert cache.get(key, ttl=0) is None
+    assert cache.get(key, ttl=60) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=2500)
+    keys = [ResponseCache.make_key("m", "u", "p", str(i)) for i in range(8)]
+    for i, key in enumerate(keys[:4]):
+        cache.put(key, "x" * 300)
+        past = time.time() - 100 + i
+        os.utime(cache._path(key), (past, past))
+    # Touch the oldest entry so it becomes most recently used
+    assert cache.get(keys[0], ttl=60) is not None
+
+    for key in keys[4:]:
+        cache.put(key, "x" * 300)
+
+    assert cache.stats()["bytes"] <= 2500
+    assert cache.get(keys[0], ttl=60) is not None
+    assert cache.get(keys[1], ttl=60) is None
+    assert cache.get(keys[-1], ttl=60) is not None
+
+
+def _hammer(directory, worker):
+    cache = ResponseCache(directory)
+    for i in range(25):
+        key = ResponseCache.make_key("m", "u", "p", f"{worker}-{i % 5}")
+        cache.put(key, f"value {worker} {i}")
+        cache.get(key, ttl=60)
+
+
+def test_concurrent_processes_share_counters(tmp_path):
+    processes = [multiprocessing.Process(target=_hammer, args=(tmp_path, n)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    stats = ResponseCache(tmp_path).stats()
+    assert stats["hits"] + stats["misses"] == 100
+    on_disk = sum(entry.stat().st_size for entry in ResponseCache(tmp_path)._entries())
+    assert stats["bytes"] == on_disk
+    assert not [p for p in tmp_path.rglob(".tmp-*")]
+
+
+def test_spell_mode_hits_skip_the_api(fake_chat):
+    first = fake_chat(["I have a spelling error"])
+    response = first.chat("I hav a speling error", mode="spell", stream=False)
+
+    second = fake_chat(["unused"])
+    output = io.StringIO()
+    assert second.chat("I hav a speling error", mode="spell", stream=True, output=output).text == response.text
+    assert output.getvalue() == response.rendered
+    assert second.client.chat.completions.calls == []
+    assert get_response_cache().stats()["hits"] == 1
+
+
+def test_refresh_and_no_cache(fake_chat):
+    fake_chat(["cached"]).chat("q", mode="trans", stream=False)
+
+    refreshed = fake_chat(["fresh"])
+    assert refreshed.chat("q", mode="trans", stream=False, refresh=True).text == "fresh"
+    assert len(refreshed.client.chat.completions.calls) == 1
+
+    bypass = fake_chat(["bypass"])
+    assert bypass.chat("q", mode="trans", stream=False, use_cache=False).text == "bypass"
+    assert fake_chat(["unused"]).chat("q", mode="trans", stream=False).text == "fresh"
+
+
+def test_normal_mode_is_not_cached(fake_chat):
+    fake_chat(["one"]).chat("q", stream=False)
+    again = fake_chat(["two"])
+    assert again.chat("q", stream=False).text == "two"
+    assert len(again.client.chat.completions.calls) == 1
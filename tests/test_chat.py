@@ -0,0 +1,104 @@
+"""
+Tests for DeepSeekChat response handling.
+"""
+
+import importlib
+import io
+
+from ds import config
+from ds.__main__ import main
+from ds.highlighter import render_content, strip_ansi
+from conftest import read_log
+
+PIECES = [
+    "Here is ", "the answer:\n\n",
+    "``", "`python\n", "def add(a, b):\n",
+    "    return a + b\n", "``", "`\n",
+    "Done.",
+]
+
+
+class RecordingOutput(io.StringIO):
+    """
+    StringIO that remembers each write and how much of the stream had been consumed.
+    """
+
+    def __init__(self, completions):
+        super().__init__()
+        self.completions = completions
+        self.writes = []
+
+    def write(self, s):
+        self.writes.append((self.completions.consumed, s))
+        return super().write(s)
+
+
+def test_streaming_writes_prose_before_stream_ends(fake_chat):
+    instance = fake_chat(PIECES)
+    output = RecordingOutput(instance.client.chat.completions)
+    instance.chat("q", stream=True, output=output)
+
+    assert output.writes[0] == (1, "Here is ")
+    assert "Done." in output.writes[-1][1]
+
+
+def test_streaming_code_block_is_written_whole(fake_chat):
+    instance = fake_chat(PIECES)
+    output = RecordingOutput(instance.client.chat.completions)
+    instance.chat("q", stream=True, output=output)
+
+    code_writes = [w for _, w in output.writes if "def" in strip_ansi(w)]
+    assert len(code_writes) == 1
+    assert "return a + b" in strip_ansi(code_writes[0])
+    assert "```" not in strip_ansi(output.getvalue())
+
+
+def test_streaming_return_value_and_log_match_non_streaming(fake_chat, tmp_path):
+    expected = render_content("".join(PIECES))
+
+    streamed = fake_chat(PIECES).chat("q", stream=True, output=io.StringIO())
+    plain = fake_chat(PIECES).chat("q", stream=False)
+
+    assert streamed.text == plain.text == "".join(PIECES)
+    assert streamed.rendered == plain.rendered == str(plain) == expected
+    entries = read_log(tmp_path / "chat_history.jsonl")
+    assert len(entries) == 2
+    assert entries[0]["response"] == entries[1]["response"] == "".join(PIECES)
+
+
+def test_unterminated_code_block_is_flushed(fake_chat):
+    output = io.StringIO()
+    fake_chat(["text ", "```python\n", "x = 1\n"]).chat("q", stream=True, output=output)
+
+    assert strip_ansi(output.getvalue()) == "text ```python\nx = 1\n"
+
+
+def test_result_renders_lazily_and_once(fake_chat, monkeypatch):
+    calls = []
+    chat_module = importlib.import_module("ds.chat")
+    monkeypatch.setattr(chat_module, "render_content", lambda text, **kwargs: calls.append(text) or "rendered")
+
+    result = fake_chat(PIECES).chat("q", stream=False)
+    assert result.text == "".join(PIECES)
+    assert result.blocks[1] == ("def add(a, b):\n    return a + b", True)
+    assert calls == []
+
+    assert result.rendered == str(result) == "rendered"
+    assert result.rendered == "rendered"
+    assert calls == ["".join(PIECES)]
+
+
+def test_unrendered_stream_writes_raw_chunks(fake_chat):
+    output = io.StringIO()
+    result = fake_chat(PIECES).chat("q", stream=True, output=output, render=False)
+
+    assert output.getvalue() == result.text == "".join(PIECES)
+
+
+def test_ds_prints_raw_markdown_to_a_pipe(fake_chat, monkeypatch, capsys):
+    monkeypatch.setattr(config, "USE_DAEMON", False)
+    monkeypatch.setattr(config, "STREAM", False)
+    monkeypatch.setattr(importlib.import_module("ds.chat"), "DeepSeekChat", lambda: fake_chat(PIECES))
+
+    main(["q"])
+    assert capsys.readouterr().out == "".join(PIECES) + "\n"
@@ -0,0 +1,89 @@
+"""
+Tests for the shared OpenAI client registry.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from ds import clients, config
+from ds.async_chat import AsyncDeepSeekChat
+from ds.chat import DeepSeekChat
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    clients.close_clients()
+    yield
+    clients.close_clients()
+
+
+def _pool(client):
+    return client._client._transport._pool
+
+
+def test_instances_share_one_client_per_endpoint_and_key():
+    first = DeepSeekChat(api_key="sk-a", base_url="http://localhost:1")
+    second = DeepSeekChat(api_key="sk-a", base_url="http://localhost:1")
+    other_key = DeepSeekChat(api_key="sk-b", base_url="http://localhost:1")
+
+    assert first.client is second.client
+    assert other_key.client is not first.client
+
+
+def test_concurrent_first_use_creates_a_single_client():
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def worker():
+        barrier.wait()
+        seen.append(DeepSeekChat(api_key="sk-a", base_url="http://localhost:1").client)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in seen}) == 1
+
+
+def test_pool_settings_come_from_config(monkeypatch):
+    monkeypatch.setattr(config, "POOL_SIZE", 3)
+    monkeypatch.setattr(config, "KEEPALIVE", 12.0)
+    monkeypatch.setattr(config, "HTTP2", False)
+    client = clients.get_client("http://localhost:1", "sk-a")
+
+    pool = _pool(client)
+    assert pool._max_connections == 3
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 12.0
+    assert client.max_retries == 0
+
+
+def test_http2_falls_back_without_h2(monkeypatch):
+    monkeypatch.setattr(config, "HTTP2", True)
+    monkeypatch.setattr(clients, "http2_available", lambda: False)
+    assert clients.http_client_options()["http2"] is False
+
+    monkeypatch.setattr(clients, "http2_available", lambda: True)
+    assert clients.http_client_options()["http2"] is True
+
+
+def test_async_instances_share_one_client_per_event_loop():
+    async def loop_clients():
+        instances = [AsyncDeepSeekChat(api_key="sk-a", base_url="http://localhost:1") for _ in range(50)]
+        seen = {id(instance.client) for instance in instances}
+        client = instances[0].client
+        await clients.aclose_clients()
+        return seen, client
+
+    first, first_client = asyncio.run(loop_clients())
+    second, _ = asyncio.run(loop_clients())
+
+    assert len(first) == 1 and len(second) == 1
+    # Async clients are bound to their loop, so a new loop gets a new client
+    assert first != second
+    assert first_client.is_closed()
+    assert not clients._async_clients
@@ -0,0 +1,120 @@
+"""
+Tests for the ds serve daemon and its client.
+"""
+
+import io
+import os
+import threading
+
+import pytest
+
+from ds import config
+from ds.daemon import DaemonServer, daemon_chat, is_running
+from ds.highlighter import render_content, strip_ansi
+from ds.timings import Timings
+from conftest import FakeClient, read_log
+
+
+@pytest.fixture
+def daemon(fake_chat, tmp_path, monkeypatch):
+    """
+    Run a daemon backed by a fake client on a temporary socket.
+    """
+    # The client's credentials match the daemon's
+    monkeypatch.setattr(config, "API_KEY", "sk-test")
+    monkeypatch.setattr(config, "BASE_URL", "http://localhost")
+    instance = fake_chat(["Hello ", "from ", "```python\nx = 1\n```", " the daemon"])
+    server = DaemonServer(tmp_path / "ds.sock", instance)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_no_daemon_returns_none(tmp_path):
+    assert not is_running(tmp_path / "missing.sock")
+    assert daemon_chat("q", socket_path=tmp_path / "missing.sock") is None
+
+
+def test_streamed_request(daemon):
+    output = io.StringIO()
+    response = daemon_chat("q", stream=True, output=output, socket_path=daemon.socket_path)
+
+    assert is_running(daemon.socket_path)
+    assert strip_ansi(output.getvalue()) == "Hello from \nx = 1\n the daemon"
+    assert response.text == "Hello from ```python\nx = 1\n``` the daemon"
+    assert response.rendered == render_content(response.text)
+
+
+def test_unrendered_stream_is_raw(daemon):
+    output = io.StringIO()
+    response = daemon_chat("q", stream=True, output=output, socket_path=daemon.socket_path, render=False)
+
+    assert output.getvalue() == response.text == "Hello from ```python\nx = 1\n``` the daemon"
+
+
+def test_non_streamed_request_reuses_client_and_logs(daemon):
+    first = daemon_chat("one", stream=False, socket_path=daemon.socket_path)
+    second = daemon_chat("two", mode="spell", stream=False, socket_path=daemon.socket_path)
+
+    assert first.text == second.text
+    calls = daemon.chat.client.chat.completions.calls
+    assert [call["messages"][1]["content"] for call in calls] == ["one", "two"]
+    assert "spell correction" in calls[1]["messages"][0]["content"]
+    assert len(read_log(daemon.chat.log_file)) == 2
+
+
+def test_errors_are_reported(daemon):
+    daemon.chat.client = FakeClient([])
+    daemon.chat.client.chat.completions.create = None
+
+    with pytest.raises(RuntimeError, match="unexpected error"):
+        daemon_chat("q", stream=False, socket_path=daemon.socket_path)
+
+
+def test_socket_is_private_and_removed(fake_chat, tmp_path):
+    server = DaemonServer(tmp_path / "ds.sock", fake_chat([]))
+    assert (server.socket_path.stat().st_mode & 0o777) == 0o600
+    server.server_close()
+    assert not server.socket_path.exists()
+
+
+def test_socket_is_bound_private(fake_chat, tmp_path, monkeypatch):
+    # Without the chmod after bind, the socket must already be private
+    monkeypatch.setattr("ds.daemon.os.chmod", lambda path, mode: None)
+    umask = os.umask(0o022)
+    try:
+        server = DaemonServer(tmp_path / "ds.sock", fake_chat([]))
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(umask)
+    assert (server.socket_path.stat().st_mode & 0o777) == 0o600
+    server.server_close()
+
+
+def test_sampling_params_are_forwarded(daemon):
+    daemon.chat.params = {"temperature": 0.2, "top_p": 0.9}
+    daemon_chat("q", stream=False, socket_path=daemon.socket_path, params={"temperature": 0.7})
+
+    call = daemon.chat.client.chat.completions.calls[0]
+    assert call["temperature"] == 0.7
+    assert call["top_p"] == 0.9
+
+
+def test_timings_are_returned_by_the_daemon(daemon):
+    timings = Timings()
+    daemon_chat("q", stream=True, output=io.StringIO(), socket_path=daemon.socket_path, timings=timings)
+
+    data = timings.as_dict()
+    assert data["daemon"] is True
+    assert data["tokens"] == 4
+    assert {"first_token_ms", "last_token_ms", "render_ms", "log_ms"} <= data.keys()
+
+
+@pytest.mark.parametrize("setting, value", [("API_KEY", "sk-other"), ("BASE_URL", "http://elsewhere")])
+def test_daemon_refuses_other_credentials(daemon, monkeypatch, setting, value):
+    monkeypatch.setattr(config, setting, value)
+
+    assert daemon_chat("q", stream=False, socket_path=daemon.socket_path) is None
+    assert daemon.chat.client.chat.completions.calls == []
@@ -0,0 +1,112 @@
+"""
+Tests for the streaming code fence parser.
+"""
+
+import pytest
+
+from ds import config, ds_highlighter
+from ds.fences import Block, FenceParser, parse_fences
+from ds.highlighter import SyntaxHighlighter, render_content, render_incremental
+
+DOCUMENTS = [
+    "Here is code:\n```python\ndef f():\n    return 1\n```\nDone.",
+    "```bash\necho `date`\n```\n``` not a tag\nx = 1\n```",
+    "inline ```x = 1``` and ``two`` and `one` ```",
+    "````\n`````" + "``x" * 20 + "```",
+    "no fences at all",
+]
+
+
+def feed_all(pieces):
+    parser = FenceParser()
+    blocks = []
+    for piece in pieces:
+        blocks.extend(parser.feed(piece))
+    return merge(blocks + parser.close())
+
+
+def merge(blocks):
+    """
+    Join adjacent prose blocks, whose boundaries depend on how the input was cut.
+    """
+    merged = []
+    for block in blocks:
+        if merged and not block.is_code and not merged[-1].is_code:
+            merged[-1] = Block(merged[-1].content + block.content, False)
+        elif block.content or block.is_code:
+            merged.append(block)
+    return merged
+
+
+def test_result_does_not_depend_on_chunk_boundaries():
+    for text in DOCUMENTS:
+        expected = merge(parse_fences(text))
+        assert feed_all(list(text)) == expected
+        for cut in range(len(text) + 1):
+            assert feed_all([text[:cut], text[cut:]]) == expected, (text, cut)
+
+
+def test_language_tags():
+    blocks = parse_fences(DOCUMENTS[1])
+
+    assert blocks[0] == Block("echo `date`\n", True, "bash")
+    assert blocks[2] == Block(" not a tag\nx = 1\n", True, "")
+    assert parse_fences("```x = 1```") == [Block("x = 1", True)]
+
+
+def test_only_undecided_backticks_are_held_back():
+    parser = FenceParser()
+
+    assert parser.feed("some prose``") == [Block("some prose", False)]
+    assert parser.pending() == "``"
+    assert parser.feed("`py") == []
+    assert parser.feed("thon\nx = 1\n``") == []
+    assert parser.pending() == "```python\nx = 1\n``"
+    assert parser.feed("`!") == [Block("x = 1\n", True, "python"), Block("!", False)]
+
+
+def test_unterminated_block_is_returned_verbatim():
+    parser = FenceParser()
+    parser.feed("text ```python\nx = 1\n")
+
+    assert parser.close() == [Block("```python\nx = 1\n", False)]
+    assert parser.feed("fresh") == [Block("fresh", False)]
+
+
+def test_stream_renderer_matches_whole_rendering():
+    text = DOCUMENTS[0]
+    renderer = SyntaxHighlighter("dracula", True).stream_renderer()
+
+    streamed = "".join(renderer.feed(char) for char in text) + renderer.close()
+    assert streamed == render_content(text)
+    assert render_incremental(text[:24], "") == (render_content(text[:14]), "```python\n")
+
+
+@pytest.mark.parametrize("backend", [
+    "python",
+    pytest.param("rust", marks=pytest.mark.skipif(not ds_highlighter._using_rust_stream,
+                                                  reason="ds-highlighter extension not built")),
+])
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_stream_backends_match_python_rendering(backend, text):
+    renderer = ds_highlighter.stream_renderer(True, "dracula", "dim", backend=backend)
+    reference = SyntaxHighlighter("dracula", True).stream_renderer("dim")
+
+    for char in text:
+        assert renderer.feed(char) == reference.feed(char)
+        assert renderer.pending() == reference.pending()
+    assert renderer.close() == reference.close()
+    assert ds_highlighter.render_incremental(text[:24], "", backend=backend) == render_incremental(text[:24], "")
+
+
+def test_stream_backend_selection(monkeypatch):
+    # Python is the default whether or not the Rust extension is built
+    assert ds_highlighter._stream_backend(None) == "python"
+    monkeypatch.setattr(config, "STREAM_BACKEND", "rust")
+    if ds_highlighter._using_rust_stream:
+        assert ds_highlighter._stream_backend(None) == "rust"
+    else:
+        with pytest.raises(ImportError):
+            ds_highlighter.stream_renderer()
+    with pytest.raises(ValueError):
+        ds_highlighter.stream_renderer(backend="go")
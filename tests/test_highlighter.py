@@ -0,0 +1,143 @@
+"""
+Tests for the Python syntax highlighter.
+"""
+
+import re
+
+import pytest
+
+from ds import ds_highlighter, highlighter
+from ds.highlighter import (
+    BASIC_PALETTE,
+    COLORS,
+    THEME_PALETTES,
+    SyntaxHighlighter,
+    apply_syntax_highlighting,
+    detect_color_depth,
+    get_highlighter,
+    strip_ansi,
+)
+
+ESCAPE_RE = re.compile(r'\x1b[^m]*m')
+WELL_FORMED_RE = re.compile(r'\x1b\[\d+(;\d+)*m')
+
+SAMPLE = '''import os
+from typing import List
+
+@dataclass
+class Point3D(Base):
+    """Docstring with "quotes" and #hash"""
+    x: int = 0
+
+    def scale(self, factor=1.5, *args, **kwargs):
+        # multiply 3 coords; see [1] and a[2]
+        values = [self.x * factor, 10 ** 2, -7 % 3]
+        if values and not None or True:
+            return {'a': 1, "b": values[0] >= 2}
+        while x != 42 | 8 & 1 ^ 3:
+            lambda y: y << 1
+'''
+
+
+def assert_flat_escapes(output):
+    """
+    Every colour escape must be well formed and closed by a reset before the next one opens.
+    """
+    open_color = False
+    for escape in ESCAPE_RE.findall(output):
+        assert WELL_FORMED_RE.fullmatch(escape), repr(escape)
+        if escape == COLORS["reset"]:
+            assert open_color, "reset without a preceding colour"
+            open_color = False
+        else:
+            assert not open_color, "nested colour escape"
+            open_color = True
+    assert not open_color
+
+
+def test_highlighting_preserves_text():
+    for code in (SAMPLE, SAMPLE * 50, "", "x", "1 2 3", "'unterminated"):
+        assert strip_ansi(apply_syntax_highlighting(code)) == code
+
+
+def test_escapes_are_never_nested_or_corrupted():
+    for theme in ("dracula", "monokai", "default"):
+        assert_flat_escapes(apply_syntax_highlighting(SAMPLE, theme_name=theme))
+
+
+def test_escape_digits_are_not_rehighlighted():
+    highlighted = apply_syntax_highlighting("x = [1]")
+    # Exactly two tokens, "=" and "1", each wrapped in a colour and a reset;
+    # the digits inside the inserted escape codes are not highlighted again
+    assert re.findall(r'\x1b\[[\d;]+m([^\x1b]*)\x1b\[0m', highlighted) == ["=", "1"]
+    assert len(ESCAPE_RE.findall(highlighted)) == 4
+
+
+def test_token_classes():
+    highlighter = SyntaxHighlighter()
+    ansi = highlighter.theme_ansi
+    reset = COLORS["reset"]
+    highlighted = highlighter.apply_syntax_highlighting('class Foo:\n    def bar(): return "s" # c\n')
+
+    assert f"{ansi['keyword']}class{reset} {ansi['keyword']}Foo{reset}" in highlighted
+    assert f"{ansi['keyword']}def{reset}" in highlighted
+    assert f"{ansi['function']}bar{reset}(" in highlighted
+    assert f"{ansi['string']}\"s\"{reset}" in highlighted
+    assert f"{ansi['comment']}# c{reset}" in highlighted
+
+
+def test_keywords_inside_strings_and_comments_are_untouched():
+    highlighted = apply_syntax_highlighting('"if 1 + 2" # return 3')
+    assert strip_ansi(highlighted) == '"if 1 + 2" # return 3'
+    assert len(ESCAPE_RE.findall(highlighted)) == 4
+
+
+def test_disabled_color_returns_input():
+    assert apply_syntax_highlighting(SAMPLE, enable_color=False) == SAMPLE
+
+
+def test_highlighters_are_cached_per_theme_and_color():
+    assert get_highlighter("monokai", True) is get_highlighter("monokai", True)
+    assert get_highlighter("monokai", True) is not get_highlighter("monokai", False)
+    assert get_highlighter("dracula", True) is not get_highlighter("monokai", True)
+
+
+def test_palettes_use_theme_hex_colors():
+    assert THEME_PALETTES["dracula"]["truecolor"]["string"] == "\x1b[38;2;241;250;140m"
+    assert THEME_PALETTES["monokai"]["truecolor"]["keyword"] == "\x1b[38;2;249;38;114m"
+    assert THEME_PALETTES["dracula"]["256"]["keyword"] == "\x1b[38;5;212m"
+    assert THEME_PALETTES["default"]["256"]["string"] == "\x1b[38;5;21m"
+    assert THEME_PALETTES["dracula"]["basic"] is BASIC_PALETTE
+
+
+def test_theme_foreground_tokens_use_the_terminal_foreground():
+    # The default theme's black would be invisible on a dark terminal
+    for depth in ("truecolor", "256"):
+        palette = THEME_PALETTES["default"][depth]
+        assert palette["function"] == palette["class"] == palette["operator"] == "\x1b[39m"
+        assert not {"\x1b[38;2;0;0;0m", "\x1b[38;5;16m"} & set(palette.values())
+
+
+def test_color_depth_detection():
+    assert detect_color_depth({"COLORTERM": "truecolor", "TERM": "xterm"}) == "truecolor"
+    assert detect_color_depth({"TERM": "xterm-256color"}) == "256"
+    assert detect_color_depth({"TERM": "xterm"}) == "basic"
+    assert detect_color_depth({"COLORTERM": "truecolor", "DS_COLOR_DEPTH": "basic"}) == "basic"
+
+
+def test_highlighter_uses_requested_depth():
+    highlighter = SyntaxHighlighter("monokai", True, color_depth="truecolor")
+    assert highlighter.theme_ansi is THEME_PALETTES["monokai"]["truecolor"]
+    assert_flat_escapes(highlighter.apply_syntax_highlighting(SAMPLE))
+
+
+@pytest.mark.skipif(not ds_highlighter._using_rust, reason="ds-highlighter extension not built")
+def test_ds_highlighter_exports_match_python():
+    content = "Run it:\n```python\n" + SAMPLE + "```\n```bash\necho $HOME\n```\n"
+    rendered = highlighter.highlight(content)
+    # Cursor and screen escapes are stripped as well as colours
+    screen = rendered + "\x1b[2J\x1b[1;2H\x1b[?25l"
+    assert ds_highlighter.strip_ansi(screen) == highlighter.strip_ansi(screen)
+    for theme in ("dracula", "monokai", "default"):
+        assert ds_highlighter.highlight(content, theme) == highlighter.highlight(content, theme)
+        assert ds_highlighter.highlight_code(SAMPLE, theme) == highlighter.highlight_code(SAMPLE, theme)
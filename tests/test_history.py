@@ -0,0 +1,120 @@
+"""
+Tests for the background chat history writer.
+"""
+
+import gzip
+import json
+import multiprocessing
+import os
+import time
+
+from ds.history import HistoryWriter, iter_recent, list_segments, recent_entries, reverse_lines
+
+from conftest import read_log
+
+
+def _entry(i, timestamp=None):
+    return {"timestamp": timestamp or time.strftime("%Y-%m-%d %H:%M:%S"), "response": f"answer {i}", "messages": []}
+
+
+def _read_segment(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_append_returns_before_write_and_close_flushes(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    writer = HistoryWriter(log_file)
+    for i in range(100):
+        writer.append(_entry(i))
+    writer.close()
+
+    assert [entry["response"] for entry in read_log(log_file)] == [f"answer {i}" for i in range(100)]
+
+
+def test_rotation_by_size_compresses_sealed_segments(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    writer = HistoryWriter(log_file, max_bytes=200, max_age=0)
+    for i in range(12):
+        writer.append(_entry(i))
+        writer.flush()
+    writer.close()
+
+    segments = list_segments(log_file)
+    assert segments and all(path.name.endswith(".jsonl.gz") for path in segments)
+    responses = [entry["response"] for path in segments for entry in _read_segment(path)]
+    responses += [entry["response"] for entry in read_log(log_file)]
+    assert responses == [f"answer {i}" for i in range(12)]
+
+
+def test_rotation_by_age(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    log_file.write_text(json.dumps(_entry("old", "2020-01-01 00:00:00")) + "\n", encoding="utf-8")
+    writer = HistoryWriter(log_file, max_bytes=0, max_age=24 * 3600)
+    writer.append(_entry("new"))
+    writer.close()
+
+    segments = list_segments(log_file)
+    assert len(segments) == 1
+    assert [entry["response"] for entry in _read_segment(segments[0])] == ["answer old"]
+    assert [entry["response"] for entry in read_log(log_file)] == ["answer new"]
+
+
+def test_list_segments_orders_same_second_segments(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    for name in ("chat_history.20240102-000000.jsonl.gz", "chat_history.20240101-000000-1.jsonl",
+                 "chat_history.20240101-000000.jsonl.gz", "other.20240101-000000.jsonl"):
+        (tmp_path / name).write_bytes(b"")
+
+    assert [path.name for path in list_segments(log_file)] == [
+        "chat_history.20240101-000000.jsonl.gz",
+        "chat_history.20240101-000000-1.jsonl",
+        "chat_history.20240102-000000.jsonl.gz",
+    ]
+
+
+def _write_from_process(log_file, worker):
+    writer = HistoryWriter(log_file, max_bytes=4096, max_age=0)
+    for i in range(50):
+        writer.append({"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "worker": worker, "i": i, "pad": "x" * 100})
+    writer.close()
+
+
+def test_concurrent_processes_do_not_interleave_or_lose_entries(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    context = multiprocessing.get_context("fork" if hasattr(os, "fork") else "spawn")
+    workers = [context.Process(target=_write_from_process, args=(log_file, w)) for w in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    entries = [entry for path in list_segments(log_file) for entry in _read_segment(path)]
+    entries += read_log(log_file)
+    assert sorted((entry["worker"], entry["i"]) for entry in entries) == [(w, i) for w in range(4) for i in range(50)]
+    for w in range(4):
+        assert [entry["i"] for entry in entries if entry["worker"] == w] == list(range(50))
+
+
+def test_recent_entries_reads_backwards_across_compressed_segments(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    writer = HistoryWriter(log_file, max_bytes=200, max_age=0)
+    for i in range(12):
+        writer.append(_entry(i))
+        writer.flush()
+    writer.close()
+    assert list_segments(log_file)
+
+    assert [entry["response"] for entry in recent_entries(log_file, 3)] == ["answer 11", "answer 10", "answer 9"]
+    assert [entry["response"] for entry in recent_entries(log_file, 100)] == [f"answer {i}" for i in reversed(range(12))]
+
+
+def test_reverse_lines_skips_partial_and_invalid_lines(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    first, second = (json.dumps(_entry(i, "2024-01-01 00:00:00")) for i in range(2))
+    log_file.write_bytes((first + "\nnot json\n\n" + second + "\n" + '{"timestamp": "20').encode("utf-8"))
+
+    assert list(reverse_lines(log_file))[0] == (second + "\n").encode("utf-8")
+    assert [entry["response"] for entry in iter_recent(log_file)] == ["answer 1", "answer 0"]
+    assert recent_entries(tmp_path / "missing.jsonl", 5) == []
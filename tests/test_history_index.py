@@ -0,0 +1,104 @@
+"""
+Tests for the incremental history search index.
+"""
+
+import gzip
+import json
+import time
+
+from ds.history import HistoryWriter
+from ds.history_index import HistoryIndex
+
+
+def _entry(query, response, timestamp="2024-05-01 12:00:00", model="deepseek-chat", mode="normal"):
+    return {
+        "timestamp": timestamp,
+        "messages": [{"role": "system", "content": "system prompt"}, {"role": "user", "content": query}],
+        "response": response,
+        "model": model,
+        "mode": mode,
+    }
+
+
+def _append(path, *entries):
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def test_search_matches_query_and_response_terms(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    _append(log_file,
+            _entry("how do I reverse a list", "Use list.reverse() or slicing"),
+            _entry("explain asyncio", "An event loop runs coroutines"),
+            _entry("翻译这段文字", "Translate this text", mode="trans"))
+    index = HistoryIndex(log_file, tmp_path / "index.sqlite3")
+
+    assert [r["query"] for r in index.search("reverse")] == ["how do I reverse a list"]
+    assert [r["query"] for r in index.search("EVENT loop")] == ["explain asyncio"]
+    assert [r["query"] for r in index.search("这段")] == ["翻译这段文字"]
+    assert index.search("reverse asyncio") == []
+    assert index.search("system prompt") == []
+
+
+def test_update_indexes_only_appended_lines(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    _append(log_file, _entry("first question", "first answer"))
+    index = HistoryIndex(log_file, tmp_path / "index.sqlite3")
+    assert index.update() == 1
+    assert index.update() == 0
+
+    _append(log_file, _entry("second question", "second answer"))
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write('{"timestamp": "2024-05-0')  # a write still in progress
+    assert index.update() == 1
+    assert len(index.search("question", update=False)) == 2
+
+
+def test_filters_on_model_mode_and_date(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    _append(log_file,
+            _entry("alpha one", "x", timestamp="2024-04-30 23:59:59"),
+            _entry("alpha two", "x", timestamp="2024-05-01 00:00:00", mode="spell"),
+            _entry("alpha three", "x", timestamp="2024-05-02 08:00:00", model="deepseek-reasoner"))
+    index = HistoryIndex(log_file, tmp_path / "index.sqlite3")
+
+    assert [r["query"] for r in index.search("alpha", since="2024-05-01")] == ["alpha three", "alpha two"]
+    assert [r["query"] for r in index.search("alpha", until="2024-05-01")] == ["alpha two", "alpha one"]
+    assert [r["query"] for r in index.search("alpha", mode="spell")] == ["alpha two"]
+    assert [r["query"] for r in index.search(model="deepseek-reasoner")] == ["alpha three"]
+
+
+def test_rotation_and_compression_are_not_reindexed(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    index = HistoryIndex(log_file, tmp_path / "index.sqlite3")
+    writer = HistoryWriter(log_file, max_bytes=300, max_age=0)
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    for i in range(3):
+        writer.append(_entry(f"question {i}", "answer", timestamp=stamp))
+        writer.flush()
+        index.update()
+    for i in range(3, 6):
+        writer.append(_entry(f"question {i}", "answer", timestamp=stamp))
+    writer.close()
+
+    assert index.update() == 3
+    queries = sorted(r["query"] for r in index.search("question", update=False))
+    assert queries == [f"question {i}" for i in range(6)]
+
+    segment = next(tmp_path.glob("chat_history.*.jsonl.gz"))
+    with gzip.open(segment, "rt", encoding="utf-8") as f:
+        assert f.readline()
+
+
+def test_short_terms_match_wildcard_characters_literally(tmp_path):
+    log_file = tmp_path / "chat_history.jsonl"
+    _append(log_file,
+            _entry("what is 5% of 80", "4"),
+            _entry("snake_case or camel", "snake_case"),
+            _entry("plain question", "plain answer"))
+    index = HistoryIndex(log_file, tmp_path / "index.sqlite3")
+
+    assert [r["query"] for r in index.search("_")] == ["snake_case or camel"]
+    assert [r["query"] for r in index.search("%")] == ["what is 5% of 80"]
+    assert index.search("\\") == []
@@ -0,0 +1,72 @@
+"""
+Tests for streamed `ds -` / `ds --file` input.
+"""
+
+import importlib
+import io
+
+import pytest
+
+from ds import config
+from ds.__main__ import main
+from ds.chat import ChatResult
+from ds.inputs import InputTooLarge, iter_chunks, iter_input_queries, read_blocks
+
+
+def test_chunks_are_ordered_bounded_and_lossless():
+    text = "".join(f"Paragraph {i}. " + "word " * (i % 7 + 3) + "\n\n" for i in range(200))
+    blocks = [text[i:i + 37] for i in range(0, len(text), 37)]
+
+    chunks = list(iter_chunks(blocks, chunk_chars=300))
+
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 300 for chunk in chunks)
+    assert all(chunk.endswith("\n\n") for chunk in chunks[:-1])
+
+
+def test_chunks_cut_hard_without_separators():
+    assert list(iter_chunks(["x" * 25], chunk_chars=10)) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_read_blocks_decodes_characters_split_across_blocks(monkeypatch):
+    monkeypatch.setattr("ds.inputs.BLOCK_SIZE", 1)
+    assert "".join(read_blocks(io.BytesIO("héllo 世界".encode("utf-8")), max_bytes=0)) == "héllo 世界"
+
+
+def test_size_cap_applies_to_pipes_and_files(tmp_path):
+    with pytest.raises(InputTooLarge):
+        list(read_blocks(io.BytesIO(b"x" * 100), max_bytes=50))
+
+    path = tmp_path / "big.txt"
+    path.write_bytes(b"x" * 100)
+    with open(path, "rb") as f, pytest.raises(InputTooLarge):
+        next(read_blocks(f, max_bytes=50))
+
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"\n")
+    with pytest.raises(ValueError, match="empty"):
+        list(iter_input_queries(str(empty)))
+
+
+def test_ds_dash_and_file_send_one_query_per_chunk(tmp_path, monkeypatch, capsys):
+    sent = []
+    monkeypatch.setattr(config, "USE_DAEMON", False)
+    monkeypatch.setattr(importlib.import_module("ds.chat"), "chat", lambda query, mode, language, **kwargs: sent.append((query, mode)) or ChatResult("ok"))
+    monkeypatch.setattr(config, "INPUT_CHUNK_CHARS", 12)
+    monkeypatch.setattr(config, "STREAM", False)
+
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(b"first line\nsecond line\n")))
+    main(["-s", "-"])
+    assert sent == [("first line\n", "spell"), ("second line\n", "spell")]
+
+    sent.clear()
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(b"hi")))
+    main(["-"])
+    assert sent == [("hi", "normal")]
+
+    sent.clear()
+    path = tmp_path / "doc.txt"
+    path.write_text("hello world", encoding="utf-8")
+    main(["--file", str(path), "Summarize:"])
+    assert sent == [("Summarize:\n\nhello world", "normal")]
+    assert capsys.readouterr().out == "ok\n" * 4
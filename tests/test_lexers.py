@@ -0,0 +1,103 @@
+"""
+Tests for the per-language lexer registry.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from ds.highlighter import SyntaxHighlighter, render_content, split_blocks, strip_ansi
+from ds.lexers import get_lexer, guess_language, resolve_language
+from test_highlighter import assert_flat_escapes
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SAMPLES = {
+    "shell": 'echo "$HOME" && ls -la ${DIR} # list files\nif [ -f x ]; then exit 1; fi\n',
+    "json": '{"name": "ds", "tags": ["cli", 2, -1.5e3], "ok": true, "none": null}',
+    "rust": ('#[derive(Debug)]\nstruct Point { x: i32 }\n'
+             'fn main() {\n    let mut v: Vec<u8> = vec![1_000u32 as u8];\n    println!("{}", v.len()); // done\n}\n'),
+    "javascript": 'const add = (a, b) => a + b; // sum\nfunction greet(name) {\n  return `hi ${name}`;\n}\n',
+    "sql": "SELECT id, count(*) FROM users u WHERE name = 'O''Neil' -- comment\nGROUP BY id;\n",
+}
+
+
+def colored(output, theme_ansi, style):
+    """
+    Return the tokens wrapped in the escape of the given theme style.
+    """
+    escape = theme_ansi[style]
+    return [part.split("\033[0m", 1)[0] for part in output.split(escape)[1:]]
+
+
+@pytest.mark.parametrize("language", sorted(SAMPLES))
+def test_lexers_preserve_text_and_never_nest_escapes(language):
+    highlighter = SyntaxHighlighter("dracula", True, color_depth="256")
+    output = highlighter.highlight_block(SAMPLES[language], language)
+
+    assert output != SAMPLES[language]
+    assert strip_ansi(output) == SAMPLES[language]
+    assert_flat_escapes(output)
+
+
+def test_tokens_get_language_specific_styles():
+    highlighter = SyntaxHighlighter("dracula", True, color_depth="256")
+    ansi = highlighter.theme_ansi
+
+    shell = highlighter.highlight_block(SAMPLES["shell"], "bash")
+    assert colored(shell, ansi, "class") == ["${DIR}"]
+    assert "# list files" in colored(shell, ansi, "comment")
+
+    rust = highlighter.highlight_block(SAMPLES["rust"], "rs")
+    assert {"println!", "vec!", "len"} <= set(colored(rust, ansi, "function"))
+    assert {"Point", "Vec"} <= set(colored(rust, ansi, "class"))
+
+    sql = highlighter.highlight_block(SAMPLES["sql"], "sql")
+    assert {"SELECT", "FROM", "WHERE", "GROUP", "BY"} <= set(colored(sql, ansi, "keyword"))
+    assert colored(sql, ansi, "string") == ["'O''Neil'"]
+
+
+def test_language_tags_are_split_off_and_resolved():
+    content = "Run:\n```bash\necho hi\n```\n```go\nfunc main() {}\n```"
+
+    assert split_blocks(content)[1] == ("echo hi", True)
+    rendered = render_content(content)
+    assert "bash" not in rendered
+    # No lexer for Go: the block is shown as is
+    assert "\nfunc main() {}\n" in rendered
+
+    assert resolve_language("Bash") == resolve_language("zsh") == "shell"
+    assert resolve_language("ts") == "javascript"
+    assert resolve_language("go") is None
+    assert get_lexer("python") is None
+
+
+@pytest.mark.parametrize("code, language", [
+    ("#!/bin/bash\nset -e\necho done\n", "shell"),
+    ("sudo apt-get install jq\ncd /tmp && make\n", "shell"),
+    ('[{"a": 1}, {"b": [true, null]}]', "json"),
+    ("fn main() {\n    let mut x = 1;\n    println!(\"{}\", x);\n}", "rust"),
+    ("const x = require('fs');\nconsole.log(x);", "javascript"),
+    ("SELECT a, b FROM t WHERE a > 1 ORDER BY b", "sql"),
+    ("def f(x):\n    return None", "python"),
+    ("just some words", "python"),
+])
+def test_guess_language(code, language):
+    assert guess_language(code) == language
+
+
+def test_lexers_load_only_when_their_language_appears():
+    script = (
+        "import sys\n"
+        "from ds.highlighter import render_content\n"
+        "render_content('```python\\nx = 1\\n```')\n"
+        "before = sorted(m for m in sys.modules if m.startswith('ds.lexers.'))\n"
+        "render_content('```sh\\necho hi\\n```')\n"
+        "after = sorted(m for m in sys.modules if m.startswith('ds.lexers.'))\n"
+        "print(before, after)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[] ['ds.lexers.shell']"
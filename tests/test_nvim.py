@@ -0,0 +1,33 @@
+"""
+Tests for the ds-nvim helpers.
+"""
+
+import sys
+
+import pytest
+
+from ds import nvim
+from ds.chat import ChatResult
+
+DOCTEST = "Doctest:\n```python\n>>> add(1, 2)\n3\n```\n"
+
+
+@pytest.fixture
+def answer(monkeypatch):
+    def factory(text):
+        monkeypatch.setattr(nvim, "_send", lambda query: ChatResult(text))
+    return factory
+
+
+def test_doctest_output_has_no_fences(answer, monkeypatch, capsys):
+    answer(DOCTEST)
+    monkeypatch.setattr(sys, "argv", ["ds-nvim", "doctest", "--code", "def add(a, b): return a + b"])
+    nvim.main()
+    assert capsys.readouterr().out == "Doctest:\n>>> add(1, 2)\n3\n"
+
+
+def test_helpers_return_rendered_text(answer):
+    answer(DOCTEST)
+    assert nvim.ds_generate_doctest("code") == ChatResult(DOCTEST).rendered
+    assert isinstance(nvim.ds_ask("q"), str) and isinstance(nvim.ds_review_code("code"), str)
+    assert nvim.ds_ask_result("q").text == DOCTEST
@@ -0,0 +1,204 @@
+"""
+Tests for timeouts, retries and hedged requests.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from ds import config, retry
+from ds.aretry import arequest
+from ds.retry import FirstTokenTimeout, TotalTimeout, backoff_delay, hedge_threshold, request, retry_after
+
+from conftest import make_chunk, read_log
+
+
+def _status_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers or {},
+                              request=httpx.Request("POST", "https://api.deepseek.com/chat/completions"))
+    return cls("failed", response=response, body=None)
+
+
+def _slow_stream(delay, pieces=("a", "b")):
+    time.sleep(delay)
+    for piece in pieces:
+        yield make_chunk(piece)
+
+
+def test_retry_after_parses_seconds_milliseconds_and_dates():
+    assert retry_after(_status_error(openai.RateLimitError, 429, {"retry-after": "3"})) == 3.0
+    assert retry_after(_status_error(openai.RateLimitError, 429, {"retry-after-ms": "250"})) == 0.25
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 < retry_after(_status_error(openai.RateLimitError, 429, {"retry-after": date})) <= 30
+    assert retry_after(_status_error(openai.RateLimitError, 429)) is None
+    assert retry_after(ValueError("no response")) is None
+
+
+def test_backoff_delay_is_jittered_capped_and_honors_server_delay():
+    delays = [backoff_delay(3, base=0.5, cap=2.0) for _ in range(200)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) > 100
+    assert backoff_delay(0, base=0.5, cap=2.0, server_delay=5.0) == 5.0
+
+
+def test_request_retries_rate_limits_then_succeeds():
+    calls = []
+
+    def create():
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise _status_error(openai.RateLimitError, 429, {"retry-after-ms": "20"})
+        return _slow_stream(0)
+
+    result = request(create, stream=True, max_retries=2, first_token_timeout=1, total_timeout=5)
+
+    assert result.retries == 2
+    assert "".join(chunk.choices[0].delta.content for chunk in result.iter_chunks()) == "ab"
+    assert calls[1] - calls[0] >= 0.02
+
+
+def test_request_does_not_retry_client_errors():
+    calls = []
+
+    def create():
+        calls.append(1)
+        raise _status_error(openai.BadRequestError, 400)
+
+    with pytest.raises(openai.BadRequestError):
+        request(create, stream=False, max_retries=3, total_timeout=5)
+    assert calls == [1]
+
+
+def test_first_token_timeout_retries_and_gives_up(monkeypatch):
+    monkeypatch.setattr(retry, "backoff_delay", lambda *args, **kwargs: 0)
+    calls = []
+
+    def create():
+        calls.append(1)
+        return _slow_stream(0.5)
+
+    started = time.monotonic()
+    with pytest.raises(FirstTokenTimeout):
+        request(create, stream=True, max_retries=1, first_token_timeout=0.05, total_timeout=5)
+    assert len(calls) == 2
+    assert time.monotonic() - started < 0.4
+
+
+def test_hedge_wins_when_first_attempt_is_slow():
+    calls = []
+    lock = threading.Lock()
+
+    def create():
+        with lock:
+            calls.append(1)
+            first = len(calls) == 1
+        return _slow_stream(1.0 if first else 0, ("slow",) if first else ("fast",))
+
+    started = time.monotonic()
+    result = request(create, stream=True, hedge_after=0.05, max_retries=0, first_token_timeout=5, total_timeout=5)
+
+    assert result.hedged
+    assert [chunk.choices[0].delta.content for chunk in result.iter_chunks()] == ["fast"]
+    assert time.monotonic() - started < 0.5
+
+
+def test_total_timeout_closes_a_stalled_stream():
+    closed = threading.Event()
+
+    class Stalled:
+        def __iter__(self):
+            yield make_chunk("a")
+            closed.wait(5)
+            raise httpx.ReadError("closed")
+
+        def close(self):
+            closed.set()
+
+    result = request(Stalled, stream=True, max_retries=0, first_token_timeout=1, total_timeout=0.1)
+    with pytest.raises(TotalTimeout):
+        list(result.iter_chunks())
+    assert closed.is_set()
+
+
+def test_hedge_threshold_uses_streamed_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(retry, "_hedge_thresholds", {})
+    log_file = tmp_path / "chat_history.jsonl"
+    entries = [{"model": "m", "stream": True, "ttft_ms": float(ms)} for ms in range(100, 2100, 100)]
+    entries.append({"model": "m", "stream": False, "ttft_ms": 99999.0})
+    log_file.write_text("".join(json.dumps(entry) + "\n" for entry in entries), encoding="utf-8")
+
+    assert hedge_threshold(log_file, "m", 90, 0.5) == pytest.approx(1.9)
+    assert hedge_threshold(log_file, "m", 10, 0.5) == 0.5
+    assert hedge_threshold(log_file, "other", 90, 0.5) is None
+
+
+def test_chat_retries_connection_errors_and_logs_retries(fake_chat, monkeypatch):
+    monkeypatch.setattr(retry, "backoff_delay", lambda *args, **kwargs: 0)
+    instance = fake_chat(["Hel", "lo"])
+    completions = instance.client.chat.completions
+    create = completions.create
+    failures = [openai.APIConnectionError(request=httpx.Request("POST", "http://localhost"))]
+
+    def flaky(**kwargs):
+        if failures:
+            raise failures.pop()
+        return create(**kwargs)
+
+    monkeypatch.setattr(completions, "create", flaky)
+
+    assert instance.chat("hi", stream=True, use_cache=False).text == "Hello"
+    entry = read_log(instance.log_file)[-1]
+    assert entry["retries"] == 1 and entry["stream"] is True
+
+
+def test_arequest_hedge_wins_when_first_attempt_is_slow():
+    calls = []
+
+    async def slow_stream(delay, piece):
+        await asyncio.sleep(delay)
+        yield make_chunk(piece)
+
+    async def create():
+        calls.append(1)
+        return slow_stream(1.0, "slow") if len(calls) == 1 else slow_stream(0, "fast")
+
+    async def run():
+        result = await arequest(create, stream=True, hedge_after=0.05, max_retries=0, first_token_timeout=5,
+                                total_timeout=5)
+        return result, [chunk.choices[0].delta.content async for chunk in result.iter_chunks()]
+
+    started = time.monotonic()
+    result, pieces = asyncio.run(run())
+    assert result.hedged
+    assert pieces == ["fast"]
+    assert time.monotonic() - started < 0.5
+
+
+def test_hedge_threshold_is_saved_for_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(retry, "_hedge_thresholds", {})
+    log_file = tmp_path / "chat_history.jsonl"
+    entries = [{"model": "m", "stream": True, "ttft_ms": float(ms)} for ms in range(100, 2100, 100)]
+    log_file.write_text("".join(json.dumps(entry) + "\n" for entry in entries), encoding="utf-8")
+    assert hedge_threshold(log_file, "m", 90, 0.5) == pytest.approx(1.9)
+
+    # A new process reuses the saved threshold instead of scanning the history
+    monkeypatch.setattr(retry, "_hedge_thresholds", {})
+    monkeypatch.setattr(retry, "_scan_hedge_threshold", lambda *args: pytest.fail("history scanned"))
+    assert hedge_threshold(log_file, "m", 90, 0.5) == pytest.approx(1.9)
+
+    # Once the saved value is stale, the history is scanned again
+    monkeypatch.setattr(retry, "_hedge_thresholds", {})
+    monkeypatch.setattr(retry, "HEDGE_REFRESH", 0)
+    monkeypatch.setattr(retry, "_scan_hedge_threshold", lambda *args: 3.0)
+    assert hedge_threshold(log_file, "m", 90, 0.5) == 3.0
+
+
+def test_chat_skips_the_history_scan_without_hedging(fake_chat, monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_PERCENTILE", None)
+    monkeypatch.setattr(retry, "_scan_hedge_threshold", lambda *args: pytest.fail("history scanned"))
+    assert fake_chat(["a"]).chat("q", stream=True).text == "a"
@@ -0,0 +1,63 @@
+"""
+Tests for the spell-mode local dictionary fast path.
+"""
+
+import random
+import string
+
+import pytest
+
+from ds import config
+from ds.spell import BloomFilter, read_stats
+
+WORDS = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "a", "is", "this", "sentence", "fine"]
+
+
+@pytest.fixture
+def wordlist(tmp_path, monkeypatch):
+    path = tmp_path / "words"
+    path.write_text("\n".join(WORDS) + "\n", encoding="utf-8")
+    monkeypatch.setattr(config, "SPELL_WORDLIST", path)
+    return path
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives(tmp_path):
+    rng = random.Random(7)
+    words = {"".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(5000)}
+    path = tmp_path / "words.bloom"
+    assert BloomFilter.build(words, path) == len(words)
+
+    bloom = BloomFilter(path)
+    assert all(word in bloom for word in words)
+    others = ["".join(rng.choices(string.ascii_lowercase, k=9)) for _ in range(20000)]
+    assert sum(word in bloom for word in others) / len(others) < 0.005
+
+
+def test_clean_text_is_answered_without_the_api(fake_chat, wordlist):
+    instance = fake_chat(["should not be used"])
+    query = "The quick brown fox jumps over the lazy dog.\nThis sentence is fine!"
+
+    assert instance.chat(query, mode="spell", stream=False).text == query
+    assert instance.client.chat.completions.calls == []
+    assert read_stats() == {"local": 2, "api": 0}
+
+
+def test_only_dirty_sentences_go_to_the_api(fake_chat, wordlist):
+    instance = fake_chat(["The lazy dog."])
+    response = instance.chat("The quick fox.  Teh lazzy dog. This is fine.", mode="spell", stream=False)
+
+    calls = instance.client.chat.completions.calls
+    assert [call["messages"][1]["content"] for call in calls] == ["Teh lazzy dog."]
+    assert response.text == "The quick fox.  The lazy dog. This is fine."
+    assert read_stats() == {"local": 2, "api": 1}
+
+
+def test_user_dictionary_and_all_dirty_input(fake_chat, wordlist, tmp_path, monkeypatch):
+    user_dict = tmp_path / "user-words.txt"
+    user_dict.write_text("# project words\ndeepseek\n", encoding="utf-8")
+    monkeypatch.setattr(config, "SPELL_USER_DICT", user_dict)
+    instance = fake_chat(["fixed"])
+
+    assert instance.chat("The DeepSeek fox.", mode="spell", stream=False).text == "The DeepSeek fox."
+    instance.chat("Zzyzx qwop.", mode="spell", stream=False, use_cache=False)
+    assert [call["messages"][1]["content"] for call in instance.client.chat.completions.calls] == ["Zzyzx qwop."]
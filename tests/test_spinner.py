@@ -0,0 +1,95 @@
+"""
+Tests for the event-driven spinner.
+"""
+
+import io
+import statistics
+import threading
+import time
+
+from ds import config
+from ds.spinner import CLEAR_LINE, Spinner
+
+
+class FakeTerminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_stop_adds_under_a_millisecond():
+    durations = []
+    for _ in range(20):
+        spinner = Spinner(stream=FakeTerminal(), interval=0.1)
+        spinner.start()
+        # Stop mid-interval, where the old sleep loop made stop() wait for the next wake-up
+        time.sleep(0.02)
+        start = time.perf_counter()
+        spinner.stop()
+        durations.append(time.perf_counter() - start)
+
+    assert statistics.median(durations) < 0.001
+
+
+def test_no_output_when_stream_is_not_a_tty(capsys):
+    stream = io.StringIO()
+    spinner = Spinner(stream=stream, interval=0.001)
+    spinner.start()
+    time.sleep(0.01)
+    spinner.stop()
+
+    assert not spinner.enabled
+    assert stream.getvalue() == ""
+    assert capsys.readouterr() == ("", "")
+
+
+def test_stop_clears_line_and_no_frames_follow():
+    terminal = FakeTerminal()
+    spinner = Spinner(stream=terminal, interval=0.001)
+    spinner.start()
+    time.sleep(0.01)
+    spinner.stop()
+    spinner.stop()
+    written = terminal.getvalue()
+    time.sleep(0.01)
+
+    assert "Thinking..." in written
+    assert written.endswith(CLEAR_LINE)
+    assert terminal.getvalue() == written
+
+
+def test_chat_ttft_is_not_delayed_by_spinner(fake_chat, monkeypatch):
+    terminal = FakeTerminal()
+    monkeypatch.setattr(config, "SPINNER", True)
+    monkeypatch.setattr("sys.stderr", terminal)
+
+    first_delta = threading.Event()
+    sent_at = []
+    terminal_at_first_delta = []
+
+    class Output(io.StringIO):
+        def write(self, text):
+            if not first_delta.is_set():
+                sent_at.append(time.perf_counter() - sent_at[0])
+                terminal_at_first_delta.append(terminal.getvalue())
+                first_delta.set()
+            return super().write(text)
+
+    chat_instance = fake_chat(["Hello", " world"])
+    completions = chat_instance.client.chat.completions
+    original_stream = completions._stream
+
+    def timed_stream():
+        time.sleep(0.05)  # let the spinner draw and go back to sleep
+        for i, chunk in enumerate(original_stream()):
+            if i == 0:
+                sent_at.append(time.perf_counter())
+            yield chunk
+
+    completions._stream = timed_stream
+    chat_instance.chat("hi", stream=True, output=Output())
+
+    # The spinner's line is already cleared when the first delta is written...
+    assert "Thinking..." in terminal_at_first_delta[0]
+    assert terminal_at_first_delta[0].endswith(CLEAR_LINE)
+    # ...and stopping it did not wait for its next wake-up, which was half an interval away.
+    assert sent_at[1] < Spinner().interval / 4
@@ -0,0 +1,54 @@
+"""
+Tests that the CLI entry points do not import heavy dependencies at startup.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def imported_modules(*args):
+    """
+    Run Python with -X importtime and return the names of every imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+@pytest.mark.parametrize("args", [
+    ("-c", "import ds"),
+    ("-c", "import ds.nvim"),
+    ("-m", "ds", "--version"),
+    ("-m", "ds.nvim", "--help"),
+])
+def test_entry_points_do_not_import_openai(args):
+    modules = imported_modules(*args)
+    assert "ds.config" in modules
+    assert "openai" not in modules
+    assert "httpx" not in modules
+    # The async client, history index and history writer are loaded on demand
+    assert "asyncio" not in modules
+    assert "sqlite3" not in modules
+    assert "ds.history" not in modules
+
+
+def test_lazy_exports_resolve():
+    import ds
+
+    assert callable(ds.chat)
+    assert ds.ChatResult("x").text == "x"
+    assert ds.DeepSeekChat.__name__ == "DeepSeekChat"
+    assert callable(ds.ds_ask)
+    with pytest.raises(AttributeError):
+        ds.not_an_export
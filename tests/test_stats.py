@@ -0,0 +1,92 @@
+"""
+Tests for history metrics and ds stats aggregation.
+"""
+
+import io
+import random
+
+import pytest
+
+from ds import config
+from ds.history import iter_entries
+from ds.stats import GroupStats, QuantileSketch, aggregate, format_table
+
+from conftest import read_log
+
+
+def test_chat_records_usage_and_latency(fake_chat, monkeypatch):
+    monkeypatch.setitem(config.CACHE_TTLS, "spell", 60)
+    chat_instance = fake_chat(["Hello", " world"])
+    chat_instance.chat("hi", stream=True, output=io.StringIO())
+    chat_instance.chat("teh", mode="spell", stream=False)
+    chat_instance.chat("teh", mode="spell", stream=False)
+
+    streamed, fresh, cached = read_log(chat_instance.log_file)
+    assert chat_instance.client.chat.completions.calls[0]["stream_options"] == {"include_usage": True}
+    assert streamed["usage"] == {"prompt_tokens": 10, "completion_tokens": 2, "cache_hit_tokens": 4}
+    assert 0 <= streamed["ttft_ms"] <= streamed["latency_ms"]
+    assert fresh["mode"] == "spell" and fresh["ttft_ms"] == fresh["latency_ms"]
+    assert cached["cached"] is True and "latency_ms" not in cached
+
+
+def test_params_override_stream_options(fake_chat):
+    chat_instance = fake_chat(["Hello"])
+    chat_instance.params = {"stream_options": {"include_usage": False}, "temperature": 0.2}
+    chat_instance.chat("hi", stream=True, output=io.StringIO())
+
+    call = chat_instance.client.chat.completions.calls[0]
+    assert call["stream_options"] == {"include_usage": False} and call["temperature"] == 0.2
+    assert "usage" not in read_log(chat_instance.log_file)[0]
+
+
+def test_quantile_sketch_relative_error_and_bounded_size():
+    rng = random.Random(0)
+    values = [rng.lognormvariate(6, 1.5) for _ in range(100000)]
+    sketch = QuantileSketch(relative_error=0.01)
+    for value in values:
+        sketch.add(value)
+
+    values.sort()
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.02)
+    assert len(sketch.buckets) < 1000
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_aggregate_groups_and_filters():
+    entries = [
+        {"timestamp": "2024-05-01 10:00:00", "model": "deepseek-chat", "mode": "normal", "latency_ms": 1000.0,
+         "ttft_ms": 200.0, "usage": {"prompt_tokens": 10, "completion_tokens": 80, "cache_hit_tokens": 8}},
+        {"timestamp": "2024-05-01 11:00:00", "model": "deepseek-chat", "mode": "normal", "latency_ms": 3000.0,
+         "ttft_ms": 1000.0, "usage": {"prompt_tokens": 20, "completion_tokens": 120, "cache_hit_tokens": 0}},
+        {"timestamp": "2024-05-01 12:00:00", "model": "deepseek-chat", "mode": "spell", "cached": True},
+        {"timestamp": "2024-05-02 09:00:00", "model": "deepseek-chat", "mode": "normal", "latency_ms": 500.0},
+        {"timestamp": "2024-04-30 09:00:00", "model": "deepseek-chat", "mode": "normal", "latency_ms": 9.0},
+    ]
+    groups, total = aggregate(entries, by=("mode", "day"), since="2024-05-01")
+
+    assert set(groups) == {("normal", "2024-05-01"), ("spell", "2024-05-01"), ("normal", "2024-05-02")}
+    normal = groups[("normal", "2024-05-01")].as_dict()
+    assert normal["requests"] == 2
+    assert normal["tokens_per_sec"] == round(200 / 2.8, 1)
+    assert (normal["prompt_tokens"], normal["completion_tokens"], normal["cache_hit_tokens"]) == (30, 200, 8)
+    assert normal["latency_p50_ms"] == pytest.approx(1000, rel=0.01)
+    assert groups[("spell", "2024-05-01")].as_dict()["latency_p50_ms"] is None
+    assert total.requests == 4 and total.cached == 1
+
+    table = format_table(groups, total, ("mode", "day"))
+    assert table.splitlines()[0].split()[:3] == ["mode", "day", "requests"]
+    assert table.splitlines()[-1].startswith("total")
+
+
+def test_iter_entries_streams_the_log(fake_chat):
+    chat_instance = fake_chat(["ok"])
+    for query in ("a", "b", "c"):
+        chat_instance.chat(query, stream=False)
+    read_log(chat_instance.log_file)
+
+    groups, total = aggregate(iter_entries(chat_instance.log_file), by=("model",))
+    assert list(groups) == [("deepseek-chat",)]
+    assert total.requests == 3
+    assert isinstance(groups[("deepseek-chat",)], GroupStats)
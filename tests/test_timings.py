@@ -0,0 +1,63 @@
+"""
+Tests for the --timings per-phase breakdown.
+"""
+
+import io
+import json
+
+from ds import config
+from ds.timings import Timings
+
+PHASES = ["chat_start", "client_start", "client_ready", "request_sent", "first_byte", "first_token",
+          "last_token", "render_start", "render_end", "log_start", "log_end"]
+
+
+def test_streamed_chat_marks_every_phase_in_order(fake_chat):
+    timings = Timings()
+    timings.mark_process_start()
+    fake_chat(["Hello", " ", "world"]).chat("hi", stream=True, output=io.StringIO(), timings=timings)
+
+    marks = [timings.marks[name] for name in PHASES]
+    assert marks == sorted(marks)
+    assert timings.marks["process_start"] <= timings.marks["imported"]
+
+    data = timings.as_dict()
+    assert data["tokens"] == 3
+    assert data["tokens_per_sec"] > 0
+    assert set(data) >= {"import_ms", "client_ms", "request_sent_ms", "first_byte_ms", "first_token_ms",
+                         "last_token_ms", "render_ms", "log_ms"}
+
+
+def test_cached_chat_reports_render_and_log_only(fake_chat, monkeypatch):
+    monkeypatch.setitem(config.CACHE_TTLS, "spell", 60)
+    chat_instance = fake_chat(["fixed"])
+    chat_instance.chat("teh", mode="spell", stream=False)
+
+    timings = Timings()
+    chat_instance.chat("teh", mode="spell", stream=False, output=io.StringIO(), timings=timings)
+
+    data = timings.as_dict()
+    assert data["cached"] is True
+    assert "first_byte_ms" not in data
+    assert {"render_ms", "log_ms"} <= data.keys()
+
+    # Nothing is rendered when the caller only wants the text
+    timings = Timings()
+    chat_instance.chat("teh", mode="spell", stream=False, timings=timings)
+    assert "render_ms" not in timings.as_dict()
+
+
+def test_report_formats():
+    timings = Timings()
+    timings.mark("request_sent", 1.0)
+    timings.mark("first_token", 1.25)
+    timings.mark("last_token", 2.25)
+    timings.values["tokens"] = 50
+
+    stream = io.StringIO()
+    timings.report("json", stream)
+    assert json.loads(stream.getvalue()) == {"first_token_ms": 250.0, "last_token_ms": 1250.0,
+                                            "tokens_per_sec": 50.0, "tokens": 50}
+
+    text = timings.format_text()
+    assert "first token" in text and "250.0 ms" in text and "50.0 tokens/s" in text
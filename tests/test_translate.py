@@ -0,0 +1,102 @@
+"""
+Tests for the paragraph-level document translation pipeline.
+"""
+
+import io
+import threading
+import time
+
+from ds.chat import DeepSeekChat
+from ds.translate import DocumentTranslator, TranslationMemory, split_segments
+
+DOCUMENT = """# Title
+
+First paragraph
+spans two lines.
+
+```python
+def f():
+
+    return 1
+```
+
+  Indented paragraph.
+"""
+
+
+class UpperChat(DeepSeekChat):
+    """
+    DeepSeekChat whose translations upper-case the text, with a per-paragraph delay.
+    """
+
+    def __init__(self, delays=None, fail=()):
+        super().__init__(api_key="sk-test", base_url="http://localhost", model="deepseek-chat")
+        self.delays = delays or {}
+        self.fail = fail
+        self.queries = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def chat(self, query, mode="normal", language="English", stream=None, output=None, use_cache=True,
+             refresh=False, timings=None, render=True):
+        assert mode == "trans"
+        with self._lock:
+            self.queries.append(query)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delays.get(query, 0.01))
+            if query in self.fail:
+                raise RuntimeError("boom")
+            return self.result(query.upper())
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_split_keeps_code_blocks_whole_and_is_lossless():
+    segments = split_segments(DOCUMENT)
+
+    assert "".join(segment.text for segment in segments) == DOCUMENT
+    assert [segment.text for segment in segments if segment.translate] == [
+        "# Title\n", "First paragraph\nspans two lines.\n", "  Indented paragraph.\n",
+    ]
+    assert any("```python\ndef f():\n\n    return 1\n```\n" in segment.text
+               for segment in segments if not segment.translate)
+
+
+def test_translates_concurrently_and_reassembles_in_order(tmp_path):
+    chat = UpperChat(delays={"# Title": 0.2})
+    output = io.StringIO()
+    translator = DocumentTranslator(chat, concurrency=3, memory=TranslationMemory(tmp_path / "tm.sqlite3"))
+
+    summary = translator.translate(DOCUMENT, output)
+
+    expected = DOCUMENT.replace("# Title", "# TITLE").replace("First paragraph\nspans two lines.",
+                                                               "FIRST PARAGRAPH\nSPANS TWO LINES.")
+    expected = expected.replace("Indented paragraph.", "INDENTED PARAGRAPH.")
+    assert summary["text"] == output.getvalue() == expected
+    assert chat.max_in_flight == 3
+    assert summary["translated"] == 3 and summary["from_memory"] == 0
+
+
+def test_memory_only_sends_changed_paragraphs(tmp_path):
+    memory = TranslationMemory(tmp_path / "tm.sqlite3")
+    DocumentTranslator(UpperChat(), memory=memory).translate(DOCUMENT)
+
+    chat = UpperChat()
+    edited = DOCUMENT.replace("Indented paragraph.", "Edited paragraph.")
+    summary = DocumentTranslator(chat, memory=memory).translate(edited)
+
+    assert chat.queries == ["Edited paragraph."]
+    assert summary["from_memory"] == 2
+    assert "  EDITED PARAGRAPH.\n" in summary["text"]
+
+
+def test_failed_paragraph_keeps_source_text(tmp_path):
+    chat = UpperChat(fail=("# Title",))
+    summary = DocumentTranslator(chat, memory=TranslationMemory(tmp_path / "tm.sqlite3")).translate(DOCUMENT)
+
+    assert summary["failed"] == 1 and summary["errors"][0]["segment"] == 0
+    assert summary["text"].startswith("# Title\n\nFIRST PARAGRAPH")